@@ -0,0 +1,158 @@
+"""End-to-end benchmark of query execution and result retrieval.
+
+Runs queries against an in-process :class:`fake_session.FakeSqlSession` through
+:func:`wherobots.db.connect_direct` and the DB-API cursor, at each of the given
+concurrency levels (the number of threads sharing the connection, each with its
+own cursor), and reports:
+
+- the throughput, in queries per second;
+- the p50 and p99 latencies, from ``execute()`` until all rows are fetched;
+- the p50 time to first row, from ``execute()`` until ``fetchone()`` returns;
+- the peak resident set size of the process, which includes the server.
+
+Usage: python benchmarks/bench_queries.py [--rows N] [--format arrow|json]
+    [--codec brotli|zstd|lz4] [--geometry wkb|ewkt|...] [--concurrency 1,4,16]
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import List
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore[assignment]
+
+from fake_session import FakeSqlSession
+from wherobots.db import connect_direct
+from wherobots.db.types import DataCompression, GeometryRepresentation, ResultsFormat
+
+
+@dataclass
+class Measurement:
+    concurrency: int
+    queries: int
+    elapsed: float
+    qps: float
+    p50: float
+    p99: float
+    ttfr_p50: float
+    peak_rss_mb: float | None
+
+
+def _percentile(samples: List[float], p: float) -> float:
+    if len(samples) < 2:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method="inclusive")[p - 1]
+
+
+def _peak_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS.
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def run(session: FakeSqlSession, args: argparse.Namespace, concurrency: int):
+    conn = connect_direct(
+        session.uri,
+        results_format=args.format,
+        data_compression=args.codec,
+        geometry_representation=args.geometry,
+        stream_results=args.stream,
+    )
+    if args.progress_events:
+        conn.set_progress_handler(lambda progress: None)
+
+    latencies: List[float] = []
+    first_rows: List[float] = []
+    lock = threading.Lock()
+    per_thread = max(1, args.queries // concurrency)
+
+    def worker() -> None:
+        with conn.cursor() as cursor:
+            for _ in range(per_thread):
+                started = time.perf_counter()
+                cursor.execute("SELECT * FROM synthetic")
+                cursor.fetchone()
+                first_row = time.perf_counter() - started
+                cursor.fetchall()
+                latency = time.perf_counter() - started
+                with lock:
+                    latencies.append(latency)
+                    first_rows.append(first_row)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    conn.close()
+
+    return Measurement(
+        concurrency=concurrency,
+        queries=len(latencies),
+        elapsed=elapsed,
+        qps=len(latencies) / elapsed,
+        p50=_percentile(latencies, 50),
+        p99=_percentile(latencies, 99),
+        ttfr_p50=_percentile(first_rows, 50),
+        peak_rss_mb=_peak_rss_mb(),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--format", type=ResultsFormat, default=ResultsFormat.ARROW)
+    parser.add_argument("--codec", type=DataCompression, default=None)
+    parser.add_argument(
+        "--geometry", type=GeometryRepresentation, default=GeometryRepresentation.WKB
+    )
+    parser.add_argument("--no-geometry", action="store_true")
+    parser.add_argument(
+        "--concurrency",
+        type=lambda s: [int(c) for c in s.split(",")],
+        default=[1, 4, 16],
+    )
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--execution-time", type=float, default=0.0)
+    parser.add_argument("--progress-events", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print JSON lines")
+    args = parser.parse_args()
+
+    with FakeSqlSession(
+        rows=args.rows,
+        geometry=not args.no_geometry,
+        execution_time=args.execution_time,
+        progress_events=args.progress_events,
+    ) as session:
+        if not args.json:
+            print(
+                f"{'threads':>7} {'queries':>7} {'qps':>9} {'p50 (ms)':>9} "
+                f"{'p99 (ms)':>9} {'ttfr (ms)':>9} {'rss (MB)':>9}"
+            )
+        for concurrency in args.concurrency:
+            m = run(session, args, concurrency)
+            if args.json:
+                print(json.dumps(asdict(m)))
+                continue
+            rss = f"{m.peak_rss_mb:>9.1f}" if m.peak_rss_mb is not None else "-"
+            print(
+                f"{m.concurrency:>7} {m.queries:>7} {m.qps:>9.1f} "
+                f"{m.p50 * 1e3:>9.2f} {m.p99 * 1e3:>9.2f} "
+                f"{m.ttfr_p50 * 1e3:>9.2f} {rss:>9}"
+            )
+
+
+if __name__ == "__main__":
+    main()
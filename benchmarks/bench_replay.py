@@ -0,0 +1,89 @@
+"""Replay of a recorded workload against the current driver.
+
+Replays a recording made with :class:`wherobots.db.recording.TrafficRecorder`
+through :func:`wherobots.db.connect_direct`: each recorded query is executed on
+its own cursor at its recorded submission time (divided by ``--speed``), and
+its latency, from ``execute()`` until all rows are fetched, is compared with
+the latency recorded for it.
+
+Usage: python benchmarks/bench_replay.py RECORDING [--speed N] [--stream]
+"""
+
+import argparse
+import statistics
+import threading
+import time
+from typing import Dict, List
+
+from wherobots.db import connect_direct
+from wherobots.db.recording import RECEIVED, ReplayServer, load_recording
+
+
+def _percentile(samples: List[float], p: int) -> float:
+    if len(samples) < 2:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method="inclusive")[p - 1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("recording")
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--stream", action="store_true")
+    args = parser.parse_args()
+
+    frames = load_recording(args.recording)
+    submitted: Dict[str, float] = {}
+    statements: Dict[str, str] = {}
+    finished: Dict[str, float] = {}
+    for frame in frames:
+        execution_id = frame.message.get("execution_id")
+        if frame.message.get("kind") == "execute_sql":
+            submitted[execution_id] = frame.at
+            statements[execution_id] = frame.message.get("statement")
+        elif frame.direction == RECEIVED and execution_id in submitted:
+            finished[execution_id] = frame.at
+    recorded = [finished[e] - submitted[e] for e in submitted if e in finished]
+
+    latencies: List[float] = []
+    lock = threading.Lock()
+    with ReplayServer(frames, speed=args.speed) as server:
+        conn = connect_direct(server.uri, stream_results=args.stream)
+
+        def run(i: int, statement: str | None) -> None:
+            with conn.cursor() as cursor:
+                started = time.perf_counter()
+                # Statements redacted from the recording are matched in order.
+                cursor.execute(statement or f"-- recorded query {i}")
+                cursor.fetchall()
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+
+        threads = []
+        started = time.perf_counter()
+        start = min(submitted.values(), default=0.0)
+        for i, (execution_id, at) in enumerate(submitted.items()):
+            if args.speed:
+                delay = (at - start) / args.speed - (time.perf_counter() - started)
+                if delay > 0:
+                    time.sleep(delay)
+            thread = threading.Thread(target=run, args=(i, statements[execution_id]))
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        conn.close()
+
+    print(f"{len(latencies)} queries replayed in {elapsed:.2f}s at {args.speed}x")
+    print(f"{'':<10} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for name, samples in (("recorded", recorded), ("replayed", latencies)):
+        if samples:
+            print(
+                f"{name:<10} {_percentile(samples, 50) * 1e3:>9.2f} "
+                f"{_percentile(samples, 99) * 1e3:>9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""An in-process stand-in for a Wherobots SQL session, for benchmarks.
+
+:class:`FakeSqlSession` is a WebSocket server speaking the Wherobots SQL
+session protocol: it answers ``execute_sql`` requests with ``state_updated``
+(and optionally ``execution_progress``) events, ``retrieve_results`` requests
+with an ``execution_result`` event or a stream of ``execution_result_chunk``
+events, and ``cancel`` requests with a ``cancelled`` state update.
+
+Results are synthetic: ``rows`` rows of an integer, a floating-point and a
+string column, and, unless ``geometry`` is False, a column of point geometries
+in the representation requested by the client. They are encoded once per
+combination of format, codec and geometry representation, so that the server
+costs as little as possible to the client being measured.
+"""
+
+import functools
+import json
+import struct
+import threading
+import time
+from typing import Any, Dict
+
+import cbor2
+import pyarrow
+import pyarrow.ipc
+import websockets.exceptions
+import websockets.sync.server
+
+from wherobots.db.types import GeometryRepresentation
+
+
+def _geometries(rows: int, representation: str) -> pyarrow.Array:
+    xs = [i % 360 - 180.0 for i in range(rows)]
+    ys = [i % 180 - 90.0 for i in range(rows)]
+    if representation == GeometryRepresentation.WKB:
+        return pyarrow.array(
+            [struct.pack("<bIdd", 1, 1, x, y) for x, y in zip(xs, ys)],
+            pyarrow.binary(),
+        )
+    if representation == GeometryRepresentation.EWKB:
+        return pyarrow.array(
+            [struct.pack("<bIidd", 1, 0x20000001, 4326, x, y) for x, y in zip(xs, ys)],
+            pyarrow.binary(),
+        )
+    if representation == GeometryRepresentation.GEOJSON:
+        return pyarrow.array(
+            [
+                json.dumps({"type": "Point", "coordinates": [x, y]})
+                for x, y in zip(xs, ys)
+            ]
+        )
+    prefix = "SRID=4326;" if representation == GeometryRepresentation.EWKT else ""
+    return pyarrow.array([f"{prefix}POINT ({x} {y})" for x, y in zip(xs, ys)])
+
+
+def synthetic_table(
+    rows: int, geometry: str | None = GeometryRepresentation.EWKT
+) -> pyarrow.Table:
+    """A table of ``rows`` rows, with a geometry column unless ``geometry`` is None."""
+    columns = {
+        "id": pyarrow.array(range(rows), pyarrow.int64()),
+        "value": pyarrow.array([i * 0.5 for i in range(rows)], pyarrow.float64()),
+        "name": pyarrow.array([f"feature-{i}" for i in range(rows)]),
+    }
+    if geometry is not None:
+        columns["geom"] = _geometries(rows, geometry)
+    return pyarrow.table(columns)
+
+
+class FakeSqlSession:
+    """A local WebSocket server speaking the Wherobots SQL session protocol.
+
+    Each query "runs" for ``execution_time`` seconds, during which
+    ``progress_events`` progress events are sent, without holding up the other
+    queries of the connection. Streamed results are sent in ``chunk_size``
+    byte chunks.
+    """
+
+    def __init__(
+        self,
+        rows: int = 1000,
+        geometry: bool = True,
+        execution_time: float = 0.0,
+        progress_events: int = 0,
+        chunk_size: int = 1024 * 1024,
+        batch_size: int = 64 * 1024,
+    ) -> None:
+        self.rows = rows
+        self.geometry = geometry
+        self.execution_time = execution_time
+        self.progress_events = progress_events
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+
+        self.server = websockets.sync.server.serve(
+            self.__handle, "127.0.0.1", 0, compression=None, max_size=None
+        )
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def uri(self) -> str:
+        host, port = self.server.socket.getsockname()
+        return f"ws://{host}:{port}"
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.thread.join()
+
+    def __enter__(self) -> "FakeSqlSession":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    @functools.lru_cache(maxsize=None)
+    def results(
+        self, format: str | None, compression: str | None, geometry: str | None
+    ) -> bytes:
+        """The encoded results, for the given request parameters."""
+        table = synthetic_table(
+            self.rows,
+            (geometry or GeometryRepresentation.EWKT) if self.geometry else None,
+        )
+        if format == "json":
+            rows = [list(row.values()) for row in table.to_pylist()]
+            for row in rows:
+                # Binary geometries are sent as hexadecimal strings.
+                row[:] = [v.hex() if isinstance(v, bytes) else v for v in row]
+            return json.dumps(rows).encode("utf-8")
+
+        sink = pyarrow.BufferOutputStream()
+        stream = (
+            pyarrow.CompressedOutputStream(sink, compression) if compression else sink
+        )
+        with pyarrow.ipc.new_stream(stream, table.schema) as writer:
+            writer.write_table(table, max_chunksize=self.batch_size)
+        if compression:
+            stream.close()
+        return sink.getvalue().to_pybytes()
+
+    def __handle(self, ws: websockets.sync.server.ServerConnection) -> None:
+        for frame in ws:
+            request = json.loads(frame)
+            handler = getattr(self, f"on_{request['kind']}", None)
+            if handler is not None:
+                handler(ws, request)
+
+    def send(self, ws: websockets.sync.server.ServerConnection, **event: Any) -> None:
+        if any(isinstance(v, (bytes, dict)) for v in event.values()):
+            ws.send(cbor2.dumps(event))
+        else:
+            ws.send(json.dumps(event))
+
+    def on_execute_sql(self, ws, request: Dict[str, Any]) -> None:
+        execution_id = request["execution_id"]
+        self.send(ws, kind="state_updated", execution_id=execution_id, state="running")
+        if not self.execution_time and not self.progress_events:
+            self.__succeed(ws, execution_id)
+            return
+        threading.Thread(
+            target=self.__run,
+            args=(ws, execution_id, request.get("enable_progress_events")),
+            daemon=True,
+        ).start()
+
+    def __run(self, ws, execution_id: str, progress: bool) -> None:
+        steps = self.progress_events if progress else 0
+        for step in range(steps):
+            time.sleep(self.execution_time / (steps + 1))
+            self.send(
+                ws,
+                kind="execution_progress",
+                execution_id=execution_id,
+                tasks_total=steps,
+                tasks_completed=step + 1,
+                tasks_active=1,
+            )
+        time.sleep(self.execution_time / (steps + 1))
+        try:
+            self.__succeed(ws, execution_id)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+    def __succeed(self, ws, execution_id: str) -> None:
+        self.send(
+            ws, kind="state_updated", execution_id=execution_id, state="succeeded"
+        )
+
+    def on_retrieve_results(self, ws, request: Dict[str, Any]) -> None:
+        execution_id = request["execution_id"]
+        format = request.get("format") or "arrow"
+        compression = request.get("compression") if format == "arrow" else None
+        data = self.results(format, compression, request.get("geometry"))
+        if request.get("stream") and format == "arrow":
+            for offset in range(0, len(data), self.chunk_size):
+                self.send(
+                    ws,
+                    kind="execution_result_chunk",
+                    execution_id=execution_id,
+                    results={
+                        "result_bytes": data[offset : offset + self.chunk_size],
+                        "format": format,
+                        "compression": compression,
+                    },
+                    last=offset + self.chunk_size >= len(data),
+                )
+            return
+
+        self.send(
+            ws,
+            kind="execution_result",
+            execution_id=execution_id,
+            state="succeeded",
+            results={
+                "result_bytes": data,
+                "format": format,
+                "compression": compression,
+            },
+        )
+
+    def on_cancel(self, ws, request: Dict[str, Any]) -> None:
+        self.send(
+            ws,
+            kind="state_updated",
+            execution_id=request["execution_id"],
+            state="cancelled",
+        )
@@ -0,0 +1,163 @@
+"""Shared test fixtures, including a local stand-in for a Wherobots SQL session."""
+
+import json
+import threading
+from typing import Any, Dict
+
+import cbor2
+import pyarrow
+import pytest
+import websockets.sync.server
+
+
+def encode_arrow(
+    table: pyarrow.Table,
+    compression: str | None = None,
+    batch_size: int | None = None,
+) -> bytes:
+    """Encodes a table as an (optionally compressed) Arrow IPC stream."""
+    sink = pyarrow.BufferOutputStream()
+    stream = pyarrow.CompressedOutputStream(sink, compression) if compression else sink
+    with pyarrow.ipc.new_stream(stream, table.schema) as writer:
+        writer.write_table(table, max_chunksize=batch_size)
+    if compression:
+        stream.close()
+    return sink.getvalue().to_pybytes()
+
+
+class FakeSession:
+    """A local WebSocket server speaking the Wherobots SQL session protocol.
+
+    Every statement succeeds immediately and returns ``table`` (or the table
+    registered for that statement in ``tables``) as Arrow results. Streamed
+    results are sent in ``chunk_size`` byte chunks of the Arrow stream, written
+    in record batches of ``batch_size`` rows. The ``on_<request kind>`` methods
+    can be overridden to simulate other behaviors, and :meth:`drop` simulates
+    the loss of the client connections.
+    """
+
+    def __init__(self, table: pyarrow.Table | None = None) -> None:
+        self.table = (
+            table
+            if table is not None
+            else pyarrow.table({"id": [1, 2, 3], "name": ["a", "b", "c"]})
+        )
+        self.tables: Dict[str, pyarrow.Table] = {}
+        self.requests: list[Dict[str, Any]] = []
+        self.statements: Dict[str, str] = {}
+        self.chunk_size = 64 * 1024
+        self.batch_size: int | None = None
+        self.connections: set[websockets.sync.server.ServerConnection] = set()
+
+        self.server = websockets.sync.server.serve(self.__handle, "127.0.0.1", 0)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def uri(self) -> str:
+        host, port = self.server.socket.getsockname()
+        return f"ws://{host}:{port}"
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.thread.join()
+
+    def drop(self) -> None:
+        """Closes all client connections."""
+        for ws in list(self.connections):
+            ws.close()
+
+    def kinds(self) -> list[str]:
+        """The kinds of the requests received so far."""
+        return [request["kind"] for request in self.requests]
+
+    def __handle(self, ws: websockets.sync.server.ServerConnection) -> None:
+        self.connections.add(ws)
+        try:
+            for frame in ws:
+                request = json.loads(frame)
+                self.requests.append(request)
+                getattr(self, f"on_{request['kind']}")(ws, request)
+        finally:
+            self.connections.discard(ws)
+
+    def send(self, ws: websockets.sync.server.ServerConnection, **event: Any) -> None:
+        if any(isinstance(v, (bytes, dict)) for v in event.values()):
+            ws.send(cbor2.dumps(event))
+        else:
+            ws.send(json.dumps(event))
+
+    def on_execute_sql(self, ws, request: Dict[str, Any]) -> None:
+        execution_id = request["execution_id"]
+        self.statements[execution_id] = request["statement"]
+        self.send(ws, kind="state_updated", execution_id=execution_id, state="running")
+        self.send(
+            ws, kind="state_updated", execution_id=execution_id, state="succeeded"
+        )
+
+    def on_retrieve_results(self, ws, request: Dict[str, Any]) -> None:
+        execution_id = request["execution_id"]
+        table = self.tables.get(self.statements.get(execution_id), self.table)
+        compression = request.get("compression")
+        if request.get("stream"):
+            data = encode_arrow(table, compression, self.batch_size)
+            for offset in range(0, len(data), self.chunk_size):
+                self.send_chunk(
+                    ws,
+                    execution_id,
+                    data[offset : offset + self.chunk_size],
+                    compression,
+                    last=offset + self.chunk_size >= len(data),
+                )
+            return
+
+        self.send(
+            ws,
+            kind="execution_result",
+            execution_id=execution_id,
+            state="succeeded",
+            results={
+                "result_bytes": encode_arrow(table, compression, self.batch_size),
+                "format": "arrow",
+                "compression": compression,
+            },
+        )
+
+    def send_chunk(self, ws, execution_id, data, compression, last) -> None:
+        self.send(
+            ws,
+            kind="execution_result_chunk",
+            execution_id=execution_id,
+            results={
+                "result_bytes": data,
+                "format": "arrow",
+                "compression": compression,
+            },
+            last=last,
+        )
+
+    def on_reattach(self, ws, request: Dict[str, Any]) -> None:
+        execution_id = request["execution_id"]
+        if execution_id not in self.statements:
+            self.send(
+                ws, kind="error", execution_id=execution_id, message="Unknown query"
+            )
+            return
+        self.send(
+            ws, kind="state_updated", execution_id=execution_id, state="succeeded"
+        )
+
+    def on_cancel(self, ws, request: Dict[str, Any]) -> None:
+        self.send(
+            ws,
+            kind="state_updated",
+            execution_id=request["execution_id"],
+            state="cancelled",
+        )
+
+
+@pytest.fixture
+def fake_session():
+    session = FakeSession()
+    yield session
+    session.close()
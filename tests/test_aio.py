@@ -0,0 +1,228 @@
+"""Tests for the asyncio interface (wherobots.db.aio)."""
+
+import asyncio
+import os
+import threading
+
+import pyarrow
+import pytest
+
+from wherobots.db.aio import AsyncConnection, connect_direct_async
+from wherobots.db.cache import ResultCache
+from wherobots.db.constants import REATTACH_PROTOCOL_VERSION
+from wherobots.db.errors import (
+    InterfaceError,
+    NotSupportedError,
+    OperationalError,
+    QueryTimeoutError,
+)
+from wherobots.db.models import ReconnectPolicy
+from wherobots.db.types import DataCompression, ExecutionState
+
+
+class TestAsyncConnection:
+    def test_execute_and_fetchall(self, fake_session):
+        async def main():
+            async with await connect_direct_async(fake_session.uri) as conn:
+                assert isinstance(conn, AsyncConnection)
+                async with conn.cursor() as cursor:
+                    await cursor.execute("SELECT %(x)s", parameters={"x": 1})
+                    df = await cursor.fetchall()
+                    return df, cursor.rowcount, cursor.description
+
+        df, rowcount, description = asyncio.run(main())
+        assert list(df["id"]) == [1, 2, 3]
+        assert rowcount == 3
+        assert [d[0] for d in description] == ["id", "name"]
+        assert fake_session.requests[0]["statement"] == "SELECT 1"
+
+    def test_description_before_fetch(self, fake_session):
+        async def main():
+            async with await connect_direct_async(fake_session.uri) as conn:
+                cursor = conn.cursor()
+                await cursor.execute("SELECT 1")
+                while cursor.last_query_stats is None:
+                    await asyncio.sleep(0.01)
+                return cursor.description
+
+        description = asyncio.run(main())
+        assert [d[0] for d in description] == ["id", "name"]
+
+    def test_compressed_results(self, fake_session):
+        async def main():
+            conn = await connect_direct_async(
+                fake_session.uri, data_compression=DataCompression.BROTLI
+            )
+            cursor = conn.cursor()
+            await cursor.execute("SELECT 1")
+            df = await cursor.fetchall()
+            await conn.close()
+            return df
+
+        assert list(asyncio.run(main())["name"]) == ["a", "b", "c"]
+        assert fake_session.requests[-1]["compression"] == "brotli"
+
+    def test_concurrent_queries_dont_use_a_thread_each(self, fake_session):
+        """Many concurrent queries are awaited without a thread per query; only
+        the default executor's bounded pool is used to decode results."""
+        for i in range(100):
+            fake_session.tables[f"SELECT {i}"] = pyarrow.table({"v": [i]})
+
+        async def run(conn, i):
+            cursor = conn.cursor()
+            await cursor.execute(f"SELECT {i}")
+            return (await cursor.fetchall())["v"][0]
+
+        async def main():
+            async with await connect_direct_async(fake_session.uri) as conn:
+                # Warm up so the server's own per-connection thread is running.
+                await run(conn, 0)
+                threads = threading.active_count()
+                values = await asyncio.gather(*(run(conn, i) for i in range(100)))
+                assert threading.active_count() - threads <= min(32, os.cpu_count() + 4)
+                return values
+
+        assert asyncio.run(main()) == list(range(100))
+
+    def test_close_fails_pending_queries(self, fake_session):
+        fake_session.on_execute_sql = lambda ws, request: None
+
+        async def main():
+            conn = await connect_direct_async(fake_session.uri)
+            cursor = conn.cursor()
+            await cursor.execute("SELECT 1")
+            await conn.close()
+            await cursor.fetchall()
+
+        with pytest.raises(OperationalError):
+            asyncio.run(main())
+
+    def test_query_timeout(self, fake_session):
+        fake_session.on_execute_sql = lambda ws, request: None
+
+        async def main():
+            async with await connect_direct_async(
+                fake_session.uri, query_timeout=0.1
+            ) as conn:
+                cursor = conn.cursor()
+                await cursor.execute("SELECT 1")
+                with pytest.raises(QueryTimeoutError):
+                    await cursor.fetchall()
+                await asyncio.sleep(0.1)
+                with pytest.raises(QueryTimeoutError):
+                    await cursor.fetchone()
+                assert conn.queries_in_flight == 0
+                (record,) = conn.query_history
+                assert record.state == ExecutionState.CANCELLED
+                assert record.timed_out
+
+        asyncio.run(main())
+        assert fake_session.kinds() == ["execute_sql", "cancel"]
+
+    def test_query_is_cancelled_without_awaiting(self, fake_session):
+        fake_session.on_execute_sql = lambda ws, request: None
+
+        async def main():
+            async with await connect_direct_async(fake_session.uri) as conn:
+                cursor = conn.cursor()
+                await cursor.execute("SELECT 1", timeout=0.05)
+                await asyncio.sleep(0.2)
+                assert conn.queries_in_flight == 0
+                assert conn.metrics().queries_timed_out == 1
+                with pytest.raises(QueryTimeoutError):
+                    await cursor.fetchall()
+
+        asyncio.run(main())
+        assert fake_session.kinds() == ["execute_sql", "cancel"]
+
+    def test_progress_handlers(self, fake_session):
+        on_execute_sql = fake_session.on_execute_sql
+
+        def with_progress(ws, request):
+            for completed in (1, 2):
+                fake_session.send(
+                    ws,
+                    kind="execution_progress",
+                    execution_id=request["execution_id"],
+                    tasks_total=2,
+                    tasks_completed=completed,
+                    tasks_active=1,
+                )
+            on_execute_sql(ws, request)
+
+        fake_session.on_execute_sql = with_progress
+        received = threading.Event()
+        threads = set()
+
+        def handler(info):
+            threads.add(threading.current_thread())
+            if info.tasks_completed == 2:
+                received.set()
+
+        async def main():
+            async with await connect_direct_async(fake_session.uri) as conn:
+                cursor = conn.cursor()
+                await cursor.execute("SELECT 1", progress_handler=handler)
+                await cursor.fetchall()
+                await asyncio.to_thread(received.wait, 1)
+
+        asyncio.run(main())
+        assert received.is_set()
+        # Handlers are called on the event loop, not the dispatcher's thread.
+        assert threads == {threading.main_thread()}
+        assert fake_session.requests[0]["enable_progress_events"] is True
+
+    def test_connect_failure(self):
+        with pytest.raises(InterfaceError):
+            asyncio.run(connect_direct_async("ws://127.0.0.1:1"))
+
+    def test_sync_only_features_are_rejected(self, fake_session):
+        with pytest.raises(NotSupportedError):
+            asyncio.run(connect_direct_async(fake_session.uri, stream_results=True))
+        with pytest.raises(NotSupportedError):
+            asyncio.run(
+                connect_direct_async(fake_session.uri, result_cache=ResultCache())
+            )
+        # The requests are rejected before connecting.
+        assert fake_session.requests == []
+
+    def test_running_query_is_reattached(self, fake_session):
+        def on_execute_sql(ws, request):
+            fake_session.statements[request["execution_id"]] = request["statement"]
+            ws.close()
+
+        fake_session.on_execute_sql = on_execute_sql
+
+        async def main():
+            async with await connect_direct_async(
+                fake_session.uri,
+                reconnect=ReconnectPolicy(min_delay=0.01),
+                protocol=REATTACH_PROTOCOL_VERSION,
+            ) as conn:
+                cursor = conn.cursor()
+                await cursor.execute("SELECT 1")
+                return await cursor.fetchall()
+
+        assert list(asyncio.run(main())["id"]) == [1, 2, 3]
+        assert fake_session.kinds() == ["execute_sql", "reattach", "retrieve_results"]
+
+    def test_unanswered_reattach_fails(self, fake_session):
+        def on_execute_sql(ws, request):
+            fake_session.statements[request["execution_id"]] = request["statement"]
+            ws.close()
+
+        fake_session.on_execute_sql = on_execute_sql
+        fake_session.on_reattach = lambda ws, request: None
+
+        async def main():
+            async with await connect_direct_async(
+                fake_session.uri,
+                reconnect=ReconnectPolicy(min_delay=0.01, reattach_timeout=0.3),
+                protocol=REATTACH_PROTOCOL_VERSION,
+            ) as conn:
+                cursor = conn.cursor()
+                await cursor.execute("SELECT 1")
+                await cursor.fetchall()
+
+        with pytest.raises(OperationalError, match="No response"):
+            asyncio.run(main())
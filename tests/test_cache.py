@@ -0,0 +1,290 @@
+"""Tests of the query result caches."""
+
+import os
+import time
+from unittest.mock import patch
+
+import pyarrow
+import pytest
+
+from wherobots.db import Store, connect_direct
+from wherobots.db.cache import DiskResultCache, ResultCache, is_read_only
+from wherobots.db.types import GeometryRepresentation
+
+
+def table(n: int) -> pyarrow.Table:
+    return pyarrow.table({"id": list(range(n))})
+
+
+def wait_for(predicate, timeout: float = 5) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "Timed out"
+        time.sleep(0.01)
+
+
+class TestResultCache:
+    def test_hit_and_miss(self):
+        cache = ResultCache()
+        assert cache.get("q") is None
+        cache.put("q", table(3))
+        cached, fresh = cache.get("q")
+        assert cached.num_rows == 3 and fresh
+        stats = cache.stats()
+        assert (stats.hits, stats.misses, stats.entries) == (1, 1, 1)
+        assert stats.size == table(3).nbytes
+
+    def test_lru_eviction_within_byte_budget(self):
+        size = table(100).nbytes
+        cache = ResultCache(max_bytes=2 * size)
+        cache.put("a", table(100))
+        cache.put("b", table(100))
+        cache.get("a")  # Makes "b" the least recently used.
+        cache.put("c", table(100))
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get("c") is not None
+        stats = cache.stats()
+        assert stats.evictions == 1
+        assert stats.size == 2 * size
+
+    def test_results_larger_than_budget_are_not_cached(self):
+        cache = ResultCache(max_bytes=10)
+        cache.put("a", table(100))
+        assert cache.stats().entries == 0
+
+    def test_ttl_and_stale_results(self):
+        cache = ResultCache(ttl=10, stale_ttl=10)
+        cache.put("a", table(1))
+        cache.put("b", table(1), ttl=100)
+        now = time.monotonic()
+        with patch("time.monotonic", return_value=now + 15):
+            assert cache.get("a")[1] is False
+            assert cache.get("b")[1] is True
+        with patch("time.monotonic", return_value=now + 25):
+            assert cache.get("a") is None
+        stats = cache.stats()
+        assert (stats.stale_hits, stats.expirations) == (1, 1)
+
+    def test_invalidate_and_clear(self):
+        cache = ResultCache()
+        cache.put("a", table(1))
+        cache.put("b", table(1))
+        cache.invalidate("a")
+        assert cache.get("a") is None
+        cache.clear()
+        assert cache.stats().entries == 0
+        assert cache.stats().size == 0
+
+
+class TestDiskResultCache:
+    def test_hit_is_memory_mapped(self, tmp_path):
+        cache = DiskResultCache(tmp_path)
+        cache.put(("q", None), table(1000))
+        allocated = pyarrow.total_allocated_bytes()
+        cached, fresh = cache.get(("q", None))
+        assert fresh and cached.equals(table(1000))
+        # Zero-copy: the table's buffers are backed by the mapped file.
+        assert pyarrow.total_allocated_bytes() == allocated
+        assert [p.suffix for p in tmp_path.iterdir()] == [".arrow"]
+
+    def test_shared_between_instances(self, tmp_path):
+        DiskResultCache(tmp_path).put("q", table(3))
+        other = DiskResultCache(tmp_path)
+        assert other.get("q")[0].num_rows == 3
+        other.invalidate("q")
+        assert DiskResultCache(tmp_path).get("q") is None
+
+    def test_size_cap_evicts_least_recently_used(self, tmp_path):
+        cache = DiskResultCache(tmp_path)
+        cache.put("a", table(1000))
+        cache.max_bytes = 2 * cache.stats().size
+        cache.put("b", table(1000))
+        # Access times only have to be ordered, whatever the file system.
+        now = time.time()
+        os.utime(cache._DiskResultCache__path("b"), (now - 10, now + 300))
+        cache.get("a")
+        cache.put("c", table(1000))
+        assert cache.get("b") is None
+        assert cache.get("a") is not None and cache.get("c") is not None
+        stats = cache.stats()
+        assert stats.evictions == 1 and stats.entries == 2
+
+    def test_ttl_and_stale_results(self, tmp_path):
+        cache = DiskResultCache(tmp_path, ttl=10, stale_ttl=10)
+        cache.put("a", table(1))
+        now = time.time()
+        with patch("time.time", return_value=now + 15):
+            assert cache.get("a")[1] is False
+        with patch("time.time", return_value=now + 25):
+            assert cache.get("a") is None
+        assert cache.stats().expirations == 1
+        assert cache.stats().entries == 0
+
+    def test_files_are_private(self, tmp_path):
+        cache = DiskResultCache(tmp_path / "results")
+        cache.put("a", table(1))
+        assert (tmp_path / "results").stat().st_mode & 0o777 == 0o700
+        (path,) = (tmp_path / "results").iterdir()
+        assert path.stat().st_mode & 0o777 == 0o600
+
+    def test_clear(self, tmp_path):
+        cache = DiskResultCache(tmp_path)
+        cache.put("a", table(1))
+        cache.put("b", table(1))
+        cache.clear()
+        assert cache.stats().entries == 0
+
+
+class TestIsReadOnly:
+    @pytest.mark.parametrize(
+        "sql",
+        [
+            "SELECT 1",
+            "  select * from t;",
+            "-- comment\nSELECT 1",
+            "/* hint */ (SELECT 1) UNION (SELECT 2)",
+            "WITH a AS (SELECT 1) SELECT * FROM a",
+            "SHOW TABLES",
+            "DESCRIBE t",
+        ],
+    )
+    def test_read_only(self, sql):
+        assert is_read_only(sql)
+
+    @pytest.mark.parametrize(
+        "sql",
+        [
+            "INSERT INTO t VALUES (1)",
+            "UPDATE t SET a = 1",
+            "CREATE TABLE t AS SELECT 1",
+            "DROP TABLE t",
+            "WITH a AS (SELECT 1) INSERT INTO t SELECT * FROM a",
+            "SELECT 1; DROP TABLE t",
+        ],
+    )
+    def test_not_read_only(self, sql):
+        assert not is_read_only(sql)
+
+
+class TestConnectionResultCache:
+    @pytest.mark.parametrize(
+        "sql",
+        [
+            "INSERT INTO t VALUES (1)",
+            "CREATE TABLE u AS SELECT * FROM t",
+            "DROP TABLE u",
+        ],
+    )
+    def test_writes_are_never_cached(self, fake_session, sql):
+        cache = ResultCache(ttl=0, stale_ttl=60)
+        with connect_direct(fake_session.uri, result_cache=cache) as conn:
+            with conn.cursor() as cursor:
+                for _ in range(3):
+                    cursor.execute(sql)
+                    cursor.fetchall()
+        assert fake_session.kinds().count("execute_sql") == 3
+        assert cache.stats().entries == 0
+        assert cache.stats().misses == 0
+
+    def test_disk_cache_hit_across_connections(self, fake_session, tmp_path):
+        for _ in range(2):
+            with connect_direct(
+                fake_session.uri, result_cache=DiskResultCache(tmp_path)
+            ) as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT * FROM t")
+                    assert cursor.fetch_arrow_table().equals(fake_session.table)
+        assert fake_session.kinds().count("execute_sql") == 1
+
+    def test_results_are_scoped_to_credentials(self, fake_session, tmp_path):
+        for api_key in ("a", "a", "b"):
+            with connect_direct(
+                fake_session.uri,
+                headers={"X-API-Key": api_key},
+                result_cache=DiskResultCache(tmp_path),
+            ) as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT * FROM t")
+                    cursor.fetchall()
+        assert fake_session.kinds().count("execute_sql") == 2
+
+    def test_repeated_query_is_served_from_cache(self, fake_session):
+        with connect_direct(fake_session.uri, result_cache=ResultCache()) as conn:
+            with conn.cursor() as cursor:
+                for _ in range(3):
+                    cursor.execute("SELECT * FROM t WHERE id > %(id)s", {"id": 0})
+                    assert list(cursor.fetchall()["id"]) == [1, 2, 3]
+                    assert cursor.rowcount == 3
+                    assert [d[0] for d in cursor.description] == ["id", "name"]
+            stats = conn.result_cache.stats()
+        assert fake_session.kinds().count("execute_sql") == 1
+        assert (stats.hits, stats.misses) == (2, 1)
+
+    def test_key_includes_substituted_sql_and_format(self, fake_session):
+        cache = ResultCache()
+        with connect_direct(fake_session.uri, result_cache=cache) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT %(x)s", {"x": 1})
+                cursor.fetchall()
+                cursor.execute("SELECT %(x)s", {"x": 2})
+                cursor.fetchall()
+        with connect_direct(
+            fake_session.uri,
+            result_cache=cache,
+            geometry_representation=GeometryRepresentation.WKB,
+        ) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT %(x)s", {"x": 1})
+                cursor.fetchall()
+        assert fake_session.kinds().count("execute_sql") == 3
+
+    def test_invalidation(self, fake_session):
+        with connect_direct(fake_session.uri, result_cache=ResultCache()) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT %(x)s", {"x": 1})
+                cursor.fetchall()
+                conn.invalidate_cached_results("SELECT %(x)s", {"x": 1})
+                cursor.execute("SELECT %(x)s", {"x": 1})
+                cursor.fetchall()
+        assert fake_session.kinds().count("execute_sql") == 2
+
+    def test_stale_results_are_revalidated(self, fake_session):
+        cache = ResultCache(ttl=0, stale_ttl=60)
+        with connect_direct(fake_session.uri, result_cache=cache) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT * FROM t")
+                cursor.fetchall()
+
+                fake_session.table = table(5)
+                size = cache.stats().size
+                cursor.execute("SELECT * FROM t")
+                # Stale results are served right away...
+                assert cursor.fetchall()["id"].tolist() == [1, 2, 3]
+                # ... and refreshed in the background.
+                wait_for(lambda: cache.stats().size != size)
+                cursor.execute("SELECT * FROM t")
+                assert cursor.fetchall()["id"].tolist() == [0, 1, 2, 3, 4]
+        assert cache.stats().stale_hits == 2
+
+    def test_streamed_revalidation_is_cancelled(self, fake_session):
+        cache = ResultCache(ttl=0, stale_ttl=60)
+        with connect_direct(fake_session.uri, result_cache=cache) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT * FROM t")
+                cursor.fetchall()
+        with connect_direct(
+            fake_session.uri, result_cache=cache, stream_results=True
+        ) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT * FROM t")
+                assert cursor.fetchall()["id"].tolist() == [1, 2, 3]
+                # Streamed results can't refresh the cache: the query is cancelled.
+                wait_for(lambda: "cancel" in fake_session.kinds())
+
+    def test_stored_results_are_not_cached(self, fake_session):
+        with connect_direct(fake_session.uri, result_cache=ResultCache()) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1", store=Store.for_download())
+                cursor.get_store_result()
+            assert conn.result_cache.stats().misses == 0
@@ -0,0 +1,116 @@
+"""Tests for result compression codecs and their adaptive selection."""
+
+import pyarrow
+import pytest
+import websockets.extensions.permessage_deflate
+
+from conftest import encode_arrow
+from wherobots.db import connect_direct
+from wherobots.db.compression import AdaptiveCompression
+from wherobots.db.driver import websocket_compression
+from wherobots.db.models import ResultsPayload
+from wherobots.db.results import decode_results
+from wherobots.db.types import DataCompression
+
+TABLE = pyarrow.table({"id": list(range(1000)), "name": ["x"] * 1000})
+
+
+@pytest.mark.parametrize("codec", list(DataCompression))
+def test_decodes_compressed_results(codec):
+    payload = ResultsPayload(
+        result_bytes=encode_arrow(TABLE, codec.value),
+        format="arrow",
+        compression=codec.value,
+    )
+    assert decode_results(payload).take().equals(TABLE)
+
+
+def test_decode_reports_measurements():
+    measured = []
+    payload = ResultsPayload(
+        result_bytes=encode_arrow(TABLE, "zstd"),
+        format="arrow",
+        compression="zstd",
+        on_decoded=lambda size, seconds: measured.append((size, seconds)),
+    )
+    decode_results(payload)
+    assert measured[0][0] == TABLE.nbytes
+    assert measured[0][1] > 0
+
+
+class TestAdaptiveCompression:
+    def test_slow_network_favors_ratio(self):
+        adaptive = AdaptiveCompression(bandwidth=1e6)
+        assert adaptive.select(100 * 2**20) == DataCompression.BROTLI
+
+    def test_fast_network_favors_throughput(self):
+        adaptive = AdaptiveCompression(bandwidth=10e9)
+        assert adaptive.select(100 * 2**20) == DataCompression.LZ4
+
+    def test_small_results_use_fastest_codec(self):
+        adaptive = AdaptiveCompression(bandwidth=1e6)
+        assert adaptive.select(1024) == DataCompression.LZ4
+
+    def test_unknown_size_uses_average(self):
+        adaptive = AdaptiveCompression(bandwidth=1e6)
+        adaptive.observe(DataCompression.LZ4, 100, 1000, 1e-6)
+        assert adaptive.select() == DataCompression.LZ4
+
+    def test_measurements_refine_estimates(self):
+        adaptive = AdaptiveCompression(bandwidth=1e6, smoothing=1.0)
+        # Brotli turns out to be slow and no better at compressing.
+        adaptive.observe(DataCompression.BROTLI, 500, 1000, 1.0)
+        estimate = adaptive.estimates()[DataCompression.BROTLI]
+        assert estimate.ratio == 0.5
+        assert estimate.throughput == 1000
+        assert estimate.observations == 1
+        assert adaptive.select(100 * 2**20) != DataCompression.BROTLI
+
+    def test_restricted_codecs(self):
+        adaptive = AdaptiveCompression(
+            bandwidth=10e9, codecs=[DataCompression.BROTLI, DataCompression.ZSTD]
+        )
+        assert adaptive.select(100 * 2**20) == DataCompression.ZSTD
+
+    def test_ignores_unknown_codecs(self):
+        adaptive = AdaptiveCompression()
+        adaptive.observe("gzip", 100, 1000, 1.0)
+        assert all(e.observations == 0 for e in adaptive.estimates().values())
+
+
+def test_connection_selects_and_measures_codec(fake_session):
+    adaptive = AdaptiveCompression(bandwidth=10e9)
+    with connect_direct(fake_session.uri, data_compression=adaptive) as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT * FROM t")
+            assert len(cursor.fetchall()) == 3
+
+    requests = [r for r in fake_session.requests if r["kind"] == "retrieve_results"]
+    assert requests[0]["compression"] == "lz4"
+    assert adaptive.estimates()[DataCompression.LZ4].observations == 1
+
+
+class TestPerMessageDeflate:
+    def test_options(self):
+        factory = (
+            websockets.extensions.permessage_deflate.ClientPerMessageDeflateFactory(
+                client_max_window_bits=10
+            )
+        )
+        assert websocket_compression(True) == {}
+        assert websocket_compression(False) == {"compression": None}
+        assert websocket_compression(factory) == {
+            "compression": None,
+            "extensions": [factory],
+        }
+
+    @pytest.mark.parametrize("permessage_deflate", [True, False])
+    def test_connect(self, fake_session, permessage_deflate):
+        with connect_direct(
+            fake_session.uri, permessage_deflate=permessage_deflate
+        ) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+                assert len(cursor.fetchall()) == 3
+            extensions = conn._Connection__ws.protocol.extensions
+            assert bool(extensions) == permessage_deflate
@@ -0,0 +1,351 @@
+"""End-to-end tests of Connection and Cursor against a local SQL session stand-in."""
+
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pyarrow
+import pytest
+
+from wherobots.db import OperationalError, QueryTimeoutError, connect_direct
+from wherobots.db.connection import QueryHistory
+from wherobots.db.results import decode_results
+from wherobots.db.types import DataCompression, ExecutionState
+
+
+class TestConnectDirect:
+    def test_execute_and_fetchall(self, fake_session):
+        with connect_direct(fake_session.uri) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT * FROM t")
+                df = cursor.fetchall()
+                assert list(df["id"]) == [1, 2, 3]
+                assert cursor.rowcount == 3
+
+
+class TestDeferredDecoding:
+    def test_listener_does_not_decode_results(self, fake_session):
+        """The listener thread hands the raw payload over to the cursor."""
+        with patch(
+            "wherobots.db.cursor.decode_results", wraps=decode_results
+        ) as mock_decode:
+            with connect_direct(fake_session.uri) as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT * FROM t")
+                df = cursor.fetchall()
+
+        assert list(df["name"]) == ["a", "b", "c"]
+        # Decoding happened exactly once, in this (the consumer's) thread.
+        mock_decode.assert_called_once()
+
+    def test_decoding_runs_in_consumer_thread(self, fake_session):
+        threads = []
+
+        def recording_decode(payload):
+            threads.append(threading.current_thread())
+            return decode_results(payload)
+
+        with patch("wherobots.db.cursor.decode_results", recording_decode):
+            with connect_direct(fake_session.uri) as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT * FROM t")
+                cursor.fetchall()
+
+        assert threads == [threading.current_thread()]
+
+
+class TestArrowFetch:
+    @pytest.fixture
+    def table(self, fake_session):
+        fake_session.table = pyarrow.table(
+            {"id": list(range(100)), "name": [str(i) for i in range(100)]}
+        )
+        fake_session.batch_size = 30
+        return fake_session.table
+
+    @pytest.mark.parametrize("stream_results", [False, True])
+    def test_fetch_arrow_table(self, fake_session, table, stream_results):
+        with connect_direct(fake_session.uri, stream_results=stream_results) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM t")
+            result = cursor.fetch_arrow_table()
+
+        assert isinstance(result, pyarrow.Table)
+        assert result.equals(table)
+        assert cursor.rowcount == 100
+
+    @pytest.mark.parametrize("stream_results", [False, True])
+    def test_fetch_record_batches(self, fake_session, table, stream_results):
+        with connect_direct(fake_session.uri, stream_results=stream_results) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM t")
+            reader = cursor.fetch_record_batches()
+            assert reader.schema == table.schema
+            batches = list(reader)
+
+        assert [b.num_rows for b in batches] == [30, 30, 30, 10]
+        assert pyarrow.Table.from_batches(batches).equals(table)
+
+    def test_fetch_arrow_after_fetchmany(self, fake_session, table):
+        with connect_direct(fake_session.uri) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM t")
+            assert len(cursor.fetchmany(45)) == 45
+            rest = cursor.fetch_arrow_table()
+
+        assert rest.column("id").to_pylist() == list(range(45, 100))
+
+
+class TestQueryTimeout:
+    @pytest.fixture(autouse=True)
+    def hang(self, fake_session):
+        """Queries keep running until cancelled."""
+        fake_session.on_execute_sql = lambda ws, request: None
+
+    def test_connection_timeout_cancels_query(self, fake_session):
+        with connect_direct(fake_session.uri, query_timeout=0.1) as conn:
+            assert conn.query_timeout == 0.1
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM t")
+            with pytest.raises(QueryTimeoutError, match="0.1 seconds"):
+                cursor.fetchall()
+            # The late cancellation event doesn't replace the timeout error.
+            time.sleep(0.1)
+            with pytest.raises(QueryTimeoutError):
+                cursor.fetchone()
+
+        assert fake_session.kinds() == ["execute_sql", "cancel"]
+
+    def test_execute_timeout_overrides_connection_timeout(self, fake_session):
+        with connect_direct(fake_session.uri, query_timeout=60) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM t", timeout=0.05)
+            started = time.monotonic()
+            with pytest.raises(QueryTimeoutError):
+                cursor.fetchall()
+            assert time.monotonic() - started < 5
+
+    def test_query_is_cancelled_without_fetching(self, fake_session):
+        with connect_direct(fake_session.uri) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM t", timeout=0.05)
+            deadline = time.monotonic() + 5
+            while (
+                conn.queries_in_flight or "cancel" not in fake_session.kinds()
+            ) and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+            assert fake_session.kinds() == ["execute_sql", "cancel"]
+            (record,) = conn.query_history
+            assert record.state == ExecutionState.CANCELLED
+            assert record.timed_out
+            assert conn.metrics().queries_timed_out == 1
+            with pytest.raises(QueryTimeoutError):
+                cursor.fetchall()
+
+    def test_next_query_is_not_affected(self, fake_session):
+        with connect_direct(fake_session.uri) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM t", timeout=0.05)
+            with pytest.raises(QueryTimeoutError):
+                cursor.fetchall()
+
+            del fake_session.on_execute_sql
+            cursor.execute("SELECT * FROM t")
+            assert list(cursor.fetchall()["id"]) == [1, 2, 3]
+
+
+class TestQueryHistory:
+    def test_finished_queries_are_not_retained(self, fake_session):
+        with connect_direct(fake_session.uri) as conn:
+            conn._Connection__history = QueryHistory(size=2)
+            cursor = conn.cursor()
+            for i in range(5):
+                cursor.execute(f"SELECT {i}")
+                cursor.fetchall()
+            assert conn.queries_in_flight == 0
+            history = conn.query_history
+
+        assert [record.sql for record in history] == ["SELECT 3", "SELECT 4"]
+        assert history[-1].state == ExecutionState.COMPLETED
+        assert history[-1].duration >= 0
+        assert history[-1].error is None
+
+    def test_failed_query_is_recorded(self, fake_session):
+        def on_execute_sql(ws, request):
+            fake_session.send(
+                ws, kind="error", execution_id=request["execution_id"], message="Boom"
+            )
+
+        fake_session.on_execute_sql = on_execute_sql
+        with connect_direct(fake_session.uri) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT oops")
+            with pytest.raises(OperationalError):
+                cursor.fetchall()
+            (record,) = conn.query_history
+
+        assert record.state == ExecutionState.FAILED
+        assert record.error == "Boom"
+
+    def test_in_flight_and_cancelled_queries(self, fake_session):
+        fake_session.on_execute_sql = lambda ws, request: None
+        with connect_direct(fake_session.uri) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1", timeout=0.1)
+            assert conn.queries_in_flight == 1
+            (execution_id,) = conn._Connection__queries
+            assert conn.query_record(execution_id).duration is None
+
+            with pytest.raises(QueryTimeoutError):
+                cursor.fetchall()
+            deadline = time.monotonic() + 5
+            while conn.queries_in_flight and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+            assert conn.queries_in_flight == 0
+            record = conn.query_record(execution_id)
+            assert record.state == ExecutionState.CANCELLED
+            assert record.sql == "SELECT 1"
+
+
+class TestQueryStats:
+    def test_stats_of_fetched_results(self, fake_session):
+        with connect_direct(
+            fake_session.uri, data_compression=DataCompression.ZSTD
+        ) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM t")
+            cursor.fetchall()
+            stats = cursor.last_query_stats
+
+        assert list(stats.states) == [
+            ExecutionState.EXECUTION_REQUESTED,
+            ExecutionState.RUNNING,
+            ExecutionState.SUCCEEDED,
+            ExecutionState.RESULTS_REQUESTED,
+            ExecutionState.COMPLETED,
+        ]
+        assert 0 <= stats.execution_time <= stats.total_time
+        assert 0 <= stats.transfer_time <= stats.total_time
+        assert stats.bytes_received > 0
+        assert stats.frames_received == 1
+        assert (stats.format, stats.compression) == ("arrow", "zstd")
+        assert stats.decompression_time >= 0
+        assert stats.decode_time >= 0
+        assert stats.pandas_time >= 0
+        assert stats.error is None
+
+    def test_stats_of_streamed_results(self, fake_session):
+        fake_session.table = pyarrow.table({"id": list(range(10_000))})
+        fake_session.chunk_size = 16 * 1024
+        with connect_direct(fake_session.uri, stream_results=True) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM t")
+            assert cursor.fetch_arrow_table().num_rows == 10_000
+            stats = cursor.last_query_stats
+
+        assert stats.frames_received > 1
+        assert stats.bytes_received >= 10_000 * 8
+        assert ExecutionState.COMPLETED in stats.states
+
+    def test_no_stats_before_completion(self, fake_session):
+        fake_session.on_execute_sql = lambda ws, request: None
+        with connect_direct(fake_session.uri) as conn:
+            cursor = conn.cursor()
+            assert cursor.last_query_stats is None
+            cursor.execute("SELECT 1")
+            assert cursor.last_query_stats is None
+
+
+class TestTracing:
+    @pytest.fixture
+    def otel(self):
+        def inject(carrier, context):
+            carrier["traceparent"] = "00-0af7651916cd43dd8448eb211c80319c-01"
+
+        with (
+            patch("wherobots.db.tracing.trace") as trace,
+            patch("wherobots.db.tracing.propagate") as propagate,
+        ):
+            propagate.inject.side_effect = inject
+            yield trace
+
+    def test_query_span(self, fake_session, otel):
+        with connect_direct(fake_session.uri) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM t")
+            cursor.fetchall()
+
+        tracer = otel.get_tracer.return_value
+        names = [call.args[0] for call in tracer.start_span.call_args_list]
+        assert names == ["wherobots.query", "wherobots.decode", "wherobots.to_pandas"]
+        span = tracer.start_span.return_value
+        events = [call.args[0] for call in span.add_event.call_args_list]
+        assert events == [
+            "wherobots.running",
+            "wherobots.succeeded",
+            "wherobots.results_requested",
+            "wherobots.completed",
+        ]
+        assert span.end.call_count == 3
+        assert fake_session.requests[0]["trace_context"] == {
+            "traceparent": "00-0af7651916cd43dd8448eb211c80319c-01"
+        }
+
+    def test_query_span_ends_after_decoding(self, fake_session, otel):
+        ended = []
+
+        def start_span(name, **kwargs):
+            span = MagicMock()
+            span.end.side_effect = lambda: ended.append(name)
+            return span
+
+        otel.get_tracer.return_value.start_span.side_effect = start_span
+        with connect_direct(fake_session.uri) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM t")
+            # Received, but not decoded yet.
+            deadline = time.monotonic() + 5
+            while cursor.last_query_stats is None:
+                assert time.monotonic() < deadline, "Timed out"
+                time.sleep(0.01)
+            assert ended == []
+            cursor.fetch_arrow_table()
+
+        assert ended == ["wherobots.decode", "wherobots.query"]
+
+    def test_query_span_ends_without_results(self, fake_session, otel):
+        ended = []
+
+        def start_span(name, **kwargs):
+            span = MagicMock()
+            span.end.side_effect = lambda: ended.append(name)
+            return span
+
+        otel.get_tracer.return_value.start_span.side_effect = start_span
+
+        def on_execute_sql(ws, request):
+            fake_session.send(
+                ws,
+                kind="state_updated",
+                execution_id=request["execution_id"],
+                state="succeeded",
+                result_uri="s3://bucket/results.parquet",
+            )
+
+        fake_session.on_execute_sql = on_execute_sql
+        with connect_direct(fake_session.uri) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM t")
+            assert cursor.get_store_result().result_uri.endswith("results.parquet")
+
+        assert ended == ["wherobots.query"]
+
+    def test_no_trace_context_without_opentelemetry(self, fake_session):
+        with connect_direct(fake_session.uri) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM t")
+            cursor.fetchall()
+
+        assert "trace_context" not in fake_session.requests[0]
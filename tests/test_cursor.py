@@ -6,15 +6,37 @@ These tests verify that:
 2. Pyformat parameter substitution (%(name)s) works correctly with
    type-aware SQL quoting.
 3. Unknown parameter keys raise ProgrammingError.
+4. executemany() coalesces executions into as few statements as possible.
+5. The description is built from the Arrow schema of the results.
+6. Queries that don't complete within their timeout are cancelled.
 """
 
-from datetime import date
+import time
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from enum import IntEnum
+from uuid import UUID
 
+import pandas
+import pyarrow
 import pytest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
-from wherobots.db.cursor import Cursor, _substitute_parameters, _quote_value
-from wherobots.db.errors import ProgrammingError
+from conftest import encode_arrow
+from wherobots.db import BINARY, DATETIME, GEOMETRY, NUMBER, ROWID, STRING
+
+from wherobots.db.cursor import (
+    Cursor,
+    _coalesce_statements,
+    _substitute_parameters,
+    _quote_value,
+)
+from wherobots.db.errors import (
+    OperationalError,
+    ProgrammingError,
+    QueryTimeoutError,
+)
+from wherobots.db.models import ExecutionResult, ResultsPayload
 
 
 def _make_cursor():
@@ -76,7 +98,47 @@ class TestQuoteValue:
 
     def test_non_primitive_uses_str(self):
         """Non-primitive types fall through to str() and get quoted as strings."""
-        assert _quote_value(date(2024, 1, 15)) == "'2024-01-15'"
+        assert _quote_value(UUID(int=1)) == "'00000000-0000-0000-0000-000000000001'"
+
+    def test_date(self):
+        assert _quote_value(date(2024, 1, 15)) == "DATE '2024-01-15'"
+
+    def test_datetime(self):
+        assert (
+            _quote_value(datetime(2024, 1, 15, 10, 30, 0, 5))
+            == "TIMESTAMP '2024-01-15 10:30:00.000005'"
+        )
+        assert (
+            _quote_value(datetime(2024, 1, 15, 10, 30, tzinfo=timezone.utc))
+            == "TIMESTAMP '2024-01-15 10:30:00+00:00'"
+        )
+
+    def test_decimal(self):
+        assert _quote_value(Decimal("1.50")) == "1.50"
+        assert _quote_value(Decimal("1E+3")) == "1000"
+
+    def test_non_finite_decimal_raises(self):
+        with pytest.raises(ProgrammingError, match="Cannot convert decimal"):
+            _quote_value(Decimal("NaN"))
+
+    def test_sequences(self):
+        assert _quote_value([1, "a", None]) == "(1, 'a', NULL)"
+        assert _quote_value((True,)) == "(TRUE)"
+        assert _quote_value([]) == "(NULL)"
+
+    def test_binary_buffers(self):
+        assert _quote_value(bytearray(b"\xde\xad")) == "X'dead'"
+        assert _quote_value(memoryview(b"\xde\xad")) == "X'dead'"
+
+    def test_subclasses(self):
+        class Code(str):
+            pass
+
+        class Level(IntEnum):
+            HIGH = 3
+
+        assert _quote_value(Code("it's")) == "'it''s'"
+        assert _quote_value(Level.HIGH) == "3"
 
     def test_nan_raises(self):
         with pytest.raises(ProgrammingError, match="Cannot convert float"):
@@ -272,3 +334,298 @@ class TestSubstituteParameters:
         assert _substitute_parameters(sql, {"v": None}) == (
             "SELECT * FROM t WHERE val = NULL"
         )
+
+    def test_in_list(self):
+        result = _substitute_parameters(
+            "SELECT * FROM t WHERE id IN %(ids)s", {"ids": [1, 2, 3]}
+        )
+        assert result == "SELECT * FROM t WHERE id IN (1, 2, 3)"
+
+    def test_compiled_template_is_reused(self):
+        sql = "SELECT %(a)s, '%%' LIKE %(b)s"
+        assert _substitute_parameters(sql, {"a": 1, "b": "x"}) == (
+            "SELECT 1, '%%' LIKE 'x'"
+        )
+        assert _substitute_parameters(sql, {"a": 2, "b": "y"}) == (
+            "SELECT 2, '%%' LIKE 'y'"
+        )
+        with pytest.raises(ProgrammingError, match="'b' not found"):
+            _substitute_parameters(sql, {"a": 3})
+
+
+# ---------------------------------------------------------------------------
+# executemany() tests
+# ---------------------------------------------------------------------------
+
+
+def _make_executing_cursor(results=None):
+    """Create a Cursor whose executions complete immediately with ``results``."""
+    executed = []
+
+    def mock_exec_fn(sql, handler, store):
+        executed.append(sql)
+        handler(ExecutionResult(results=results))
+        return f"exec-{len(executed)}"
+
+    return Cursor(mock_exec_fn, MagicMock()), executed
+
+
+class TestCoalesceStatements:
+    """Unit tests for the _coalesce_statements helper."""
+
+    def test_insert_values_coalesced(self):
+        sql = "INSERT INTO t (a, b) VALUES (%(a)s, %(b)s)"
+        params = [{"a": 1, "b": "x"}, {"a": 2, "b": None}, {"a": 3, "b": "it's"}]
+        assert list(_coalesce_statements(sql, params)) == [
+            ("INSERT INTO t (a, b) VALUES (1, 'x'), (2, NULL), (3, 'it''s')", 3)
+        ]
+
+    def test_insert_select_not_coalesced(self):
+        sql = "INSERT INTO t SELECT %(a)s, ST_Point(%(x)s, %(y)s)"
+        params = [{"a": 1, "x": 0.5, "y": 1.5}, {"a": 2, "x": 2.5, "y": 3.5}]
+        assert list(_coalesce_statements(sql, params)) == [
+            ("INSERT INTO t SELECT 1, ST_Point(0.5, 1.5)", None),
+            ("INSERT INTO t SELECT 2, ST_Point(2.5, 3.5)", None),
+        ]
+
+    @pytest.mark.parametrize(
+        "sql",
+        [
+            "INSERT INTO t VALUES (%(a)s), (%(a)s)",
+            "INSERT INTO t VALUES (%(a)s); DELETE FROM t WHERE a IN (%(a)s)",
+            "INSERT INTO t SELECT * FROM s WHERE a IN (SELECT 1) AND b VALUES (%(a)s)",
+            "INSERT OVERWRITE t VALUES (%(a)s)",
+        ],
+    )
+    def test_non_plain_insert_values_not_coalesced(self, sql):
+        params = [{"a": 1}, {"a": 2}]
+        assert [n for _, n in _coalesce_statements(sql, params)] == [None, None]
+
+    def test_parentheses_in_literals(self):
+        sql = "INSERT INTO t (a, b) VALUES (%(a)s, ')(')"
+        params = [{"a": 1}, {"a": 2}]
+        assert list(_coalesce_statements(sql, params)) == [
+            ("INSERT INTO t (a, b) VALUES (1, ')('), (2, ')(')", 2)
+        ]
+
+    def test_statement_size_bound(self):
+        sql = "INSERT INTO t VALUES (%(a)s)"
+        params = [{"a": i} for i in range(10, 20)]
+        statements = list(_coalesce_statements(sql, params, max_statement_size=40))
+        assert all(len(s) <= 40 for s, _ in statements)
+        assert sum(n for _, n in statements) == 10
+        assert statements[0] == ("INSERT INTO t VALUES (10), (11), (12)", 3)
+
+    def test_oversized_row_sent_alone(self):
+        sql = "INSERT INTO t VALUES (%(a)s)"
+        params = [{"a": "x" * 100}, {"a": "y"}]
+        statements = list(_coalesce_statements(sql, params, max_statement_size=40))
+        assert [n for _, n in statements] == [1, 1]
+
+    def test_other_statements_not_coalesced(self):
+        sql = "UPDATE t SET a = %(a)s WHERE id = %(id)s"
+        params = [{"a": 1, "id": 1}, {"a": 2, "id": 2}]
+        assert list(_coalesce_statements(sql, params)) == [
+            ("UPDATE t SET a = 1 WHERE id = 1", None),
+            ("UPDATE t SET a = 2 WHERE id = 2", None),
+        ]
+
+    def test_select_with_limit_not_coalesced(self):
+        sql = "INSERT INTO t SELECT * FROM s WHERE id = %(id)s LIMIT 1"
+        params = [{"id": 1}, {"id": 2}]
+        assert [n for _, n in _coalesce_statements(sql, params)] == [None, None]
+
+    def test_parameter_in_head_not_coalesced(self):
+        sql = "INSERT INTO t PARTITION (p = %(p)s) VALUES (%(a)s)"
+        params = [{"p": 1, "a": 1}, {"p": 2, "a": 2}]
+        assert [n for _, n in _coalesce_statements(sql, params)] == [None, None]
+
+
+class TestExecuteMany:
+    def test_coalesced_insert(self):
+        cursor, executed = _make_executing_cursor()
+        params = [{"a": i} for i in range(5)]
+        cursor.executemany("INSERT INTO t VALUES (%(a)s)", params)
+        assert executed == ["INSERT INTO t VALUES (0), (1), (2), (3), (4)"]
+        assert cursor.rowcount == 5
+
+    def test_batches_executed_in_order(self):
+        cursor, executed = _make_executing_cursor()
+        params = [{"a": i} for i in range(10, 20)]
+        cursor.executemany(
+            "INSERT INTO t VALUES (%(a)s)", params, max_statement_size=40
+        )
+        assert len(executed) == 4
+        assert executed[0].endswith("(10), (11), (12)")
+        assert cursor.rowcount == 10
+
+    def test_reported_affected_rows(self):
+        cursor, executed = _make_executing_cursor(
+            pandas.DataFrame({"num_affected_rows": [2]})
+        )
+        cursor.executemany("DELETE FROM t WHERE a = %(a)s", [{"a": 1}, {"a": 2}])
+        assert len(executed) == 2
+        assert cursor.rowcount == 4
+
+    def test_unknown_rowcount(self):
+        cursor, _ = _make_executing_cursor()
+        cursor.executemany("DELETE FROM t WHERE a = %(a)s", [{"a": 1}])
+        assert cursor.rowcount == -1
+
+    def test_error_is_raised(self):
+        def failing_exec_fn(sql, handler, store):
+            handler(ExecutionResult(error=OperationalError("boom")))
+            return "exec-1"
+
+        cursor = Cursor(failing_exec_fn, MagicMock())
+        with pytest.raises(OperationalError, match="boom"):
+            cursor.executemany("INSERT INTO t VALUES (%(a)s)", [{"a": 1}])
+
+
+def _cursor_with_result(result: ExecutionResult) -> Cursor:
+    def exec_fn(sql, handler, store):
+        handler(result)
+        return "exec-1"
+
+    cursor = Cursor(exec_fn, MagicMock())
+    cursor.execute("SELECT * FROM t")
+    return cursor
+
+
+class TestDescription:
+    TABLE = pyarrow.table(
+        {
+            "id": pyarrow.array([1], pyarrow.int32()),
+            "name": ["a"],
+            "data": [b"x"],
+            "at": pyarrow.array([0], pyarrow.timestamp("us")),
+            "price": pyarrow.array([Decimal("1.50")], pyarrow.decimal128(10, 2)),
+            "flag": [True],
+        }
+    )
+
+    def test_type_objects(self):
+        cursor = _cursor_with_result(ExecutionResult(table=self.TABLE))
+        type_codes = [d[1] for d in cursor.description]
+        assert type_codes == [NUMBER, STRING, BINARY, DATETIME, NUMBER, NUMBER]
+        assert type_codes[0] != STRING
+        assert all(type_code != ROWID for type_code in type_codes)
+
+    def test_sizes(self):
+        cursor = _cursor_with_result(ExecutionResult(table=self.TABLE))
+        description = {d[0]: d for d in cursor.description}
+        assert description["id"][2:] == (None, 4, None, None, True)
+        assert description["name"][3] is None
+        assert description["price"][3:6] == (16, 10, 2)
+
+    def test_from_payload_schema_without_decoding(self):
+        payload = ResultsPayload(
+            result_bytes=encode_arrow(self.TABLE, "zstd"),
+            format="arrow",
+            compression="zstd",
+        )
+        cursor = _cursor_with_result(ExecutionResult(payload=payload))
+        with patch("wherobots.db.cursor.decode_results") as decode:
+            assert [d[0] for d in cursor.description] == self.TABLE.column_names
+            decode.assert_not_called()
+        assert cursor.fetch_arrow_table().equals(self.TABLE)
+
+    def test_geometry(self):
+        field = pyarrow.field(
+            "geom",
+            pyarrow.binary(),
+            metadata={b"ARROW:extension:name": b"geoarrow.wkb"},
+        )
+        table = pyarrow.table(
+            [pyarrow.array([b"\x01"])], schema=pyarrow.schema([field])
+        )
+        cursor = _cursor_with_result(ExecutionResult(table=table))
+        assert cursor.description[0][1] == GEOMETRY
+        assert cursor.description[0][1] != BINARY
+
+    def test_does_not_wait_for_results(self):
+        handlers = []
+
+        def exec_fn(sql, handler, store):
+            handlers.append(handler)
+            return "exec-1"
+
+        cursor = Cursor(exec_fn, MagicMock())
+        cursor.execute("SELECT * FROM t")
+        started = time.monotonic()
+        assert cursor.description is None
+        assert time.monotonic() - started < 0.1
+
+        payload = ResultsPayload(
+            result_bytes=encode_arrow(self.TABLE, None), format="arrow"
+        )
+        handlers[0](ExecutionResult(payload=payload))
+        # Available as soon as the results arrive, before they are fetched.
+        assert [d[0] for d in cursor.description] == self.TABLE.column_names
+
+    def test_no_results(self):
+        cursor = _cursor_with_result(ExecutionResult())
+        assert cursor.description is None
+        assert cursor.get_store_result() is None
+        assert cursor.get_store_result() is None
+
+    def test_error_is_raised_on_fetch(self):
+        cursor = _cursor_with_result(ExecutionResult(error=OperationalError("boom")))
+        assert cursor.description is None
+        with pytest.raises(OperationalError, match="boom"):
+            cursor.fetchall()
+
+
+class TestTimeout:
+    def _cursor(self, timeout=None):
+        handlers = []
+        timeouts = []
+
+        def exec_fn(sql, handler, store, timeout=None):
+            handlers.append(handler)
+            timeouts.append(timeout)
+            return f"exec-{len(handlers)}"
+
+        cancel_fn = MagicMock()
+        cursor = Cursor(exec_fn, cancel_fn, timeout=timeout)
+        return cursor, handlers, timeouts, cancel_fn
+
+    def test_timeout_is_enforced_by_connection(self):
+        cursor, handlers, timeouts, cancel_fn = self._cursor(timeout=0.01)
+        cursor.execute("SELECT 1")
+        assert timeouts == [0.01]
+
+        # The connection cancels the query and hands the timeout error over.
+        handlers[0](ExecutionResult(error=QueryTimeoutError("exec-1 timed out")))
+        with pytest.raises(QueryTimeoutError, match="exec-1"):
+            cursor.fetchall()
+
+        # The results of the cancelled query are ignored.
+        handlers[0](ExecutionResult(results=pandas.DataFrame()))
+        with pytest.raises(QueryTimeoutError):
+            cursor.fetchone()
+        # The connection already cancelled it.
+        cursor.close()
+        cancel_fn.assert_not_called()
+
+    def test_execute_timeout(self):
+        cursor, handlers, timeouts, cancel_fn = self._cursor(timeout=60)
+        cursor.execute("SELECT 1", timeout=0)
+        cursor.execute("SELECT 2")
+        assert timeouts == [0, 60]
+
+    def test_no_timeout(self):
+        cursor, handlers, timeouts, cancel_fn = self._cursor()
+        cursor.execute("SELECT 1")
+        handlers[0](ExecutionResult(results=[(1,)]))
+        assert cursor.fetchall() == [(1,)]
+        assert timeouts == [None]
+        cancel_fn.assert_not_called()
+
+    def test_late_result_of_previous_query_is_ignored(self):
+        cursor, handlers, timeouts, cancel_fn = self._cursor()
+        cursor.execute("SELECT 1")
+        cursor.execute("SELECT 2")
+        handlers[0](ExecutionResult(results=[(1,)]))
+        handlers[1](ExecutionResult(results=[(2,)]))
+        assert cursor.fetchall() == [(2,)]
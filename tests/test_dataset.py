@@ -0,0 +1,147 @@
+"""Tests for reading multi-file results stored in cloud storage.
+
+These tests verify that:
+1. The files under the result URI are read as one dataset, with Hive-style
+   partitions as columns and Spark's metadata files ignored.
+2. Column projections, filters and bounding boxes are pushed down, and row
+   groups are pruned according to their statistics.
+3. The cursor exposes the reader for queries stored as multiple files.
+"""
+
+import json
+
+import pyarrow
+import pyarrow.dataset
+import pyarrow.parquet
+import pytest
+
+from wherobots.db import dataset
+from wherobots.db.cursor import Cursor
+from wherobots.db.errors import NotSupportedError, ProgrammingError
+from wherobots.db.models import ExecutionResult, Store, StoreResult
+from wherobots.db.types import StorageFormat
+
+GEO_METADATA = {
+    "version": "1.1.0",
+    "primary_column": "geometry",
+    "columns": {
+        "geometry": {
+            "encoding": "WKB",
+            "geometry_types": ["Point"],
+            "covering": {
+                "bbox": {
+                    "xmin": ["bounds", "xmin"],
+                    "ymin": ["bounds", "ymin"],
+                    "xmax": ["bounds", "xmax"],
+                    "ymax": ["bounds", "ymax"],
+                }
+            },
+        }
+    },
+}
+
+
+def _points(start: int, count: int) -> pyarrow.Table:
+    """Points along the diagonal, with their bounding box covering column."""
+    ids = list(range(start, start + count))
+    bounds = pyarrow.StructArray.from_arrays(
+        [pyarrow.array(ids, pyarrow.float64())] * 4,
+        ["xmin", "ymin", "xmax", "ymax"],
+    )
+    table = pyarrow.table({"id": ids, "geometry": [b"\x00"] * count, "bounds": bounds})
+    return table.replace_schema_metadata({"geo": json.dumps(GEO_METADATA)})
+
+
+@pytest.fixture
+def stored(tmp_path):
+    """Results written as Spark does, in two partitions of two files each."""
+    for part, region in enumerate(["east", "west"]):
+        directory = tmp_path / f"region={region}"
+        directory.mkdir()
+        for i in range(2):
+            start = (2 * part + i) * 100
+            pyarrow.parquet.write_table(
+                _points(start, 100),
+                directory / f"part-{i:05d}.parquet",
+                row_group_size=25,
+            )
+    (tmp_path / "_SUCCESS").write_bytes(b"")
+    return tmp_path
+
+
+class TestStoreDataset:
+    def test_reads_all_files(self, stored):
+        table = dataset.read_store_dataset(
+            dataset.store_dataset(str(stored))
+        ).read_all()
+
+        assert sorted(table.column("id").to_pylist()) == list(range(400))
+        assert set(table.column("region").to_pylist()) == {"east", "west"}
+
+    def test_projection_and_partition_filter(self, stored):
+        table = dataset.read_store_dataset(
+            dataset.store_dataset(f"file://{stored}"),
+            columns=["id"],
+            filter=pyarrow.dataset.field("region") == "west",
+        ).read_all()
+
+        assert table.column_names == ["id"]
+        assert sorted(table.column("id").to_pylist()) == list(range(200, 400))
+
+    def test_bbox(self, stored):
+        table = dataset.read_store_dataset(
+            dataset.store_dataset(str(stored)),
+            columns=["id"],
+            bbox=(10, 10, 30.5, 30.5),
+        ).read_all()
+
+        assert sorted(table.column("id").to_pylist()) == list(range(10, 31))
+
+    def test_bbox_prunes_row_groups(self, stored):
+        stored_dataset = dataset.store_dataset(str(stored))
+        expression = dataset.bbox_filter(stored_dataset.schema, (10, 10, 30, 30))
+
+        row_groups = [
+            row_group
+            for fragment in stored_dataset.get_fragments(expression)
+            for row_group in fragment.split_by_row_group(expression)
+        ]
+
+        assert len(row_groups) == 2
+
+    def test_bbox_requires_covering_column(self, tmp_path):
+        pyarrow.parquet.write_table(
+            pyarrow.table({"id": [1]}), tmp_path / "part-0.parquet"
+        )
+        with pytest.raises(ProgrammingError):
+            dataset.read_store_dataset(
+                dataset.store_dataset(str(tmp_path)), bbox=(0, 0, 1, 1)
+            )
+
+    def test_geojson_not_supported(self, stored):
+        with pytest.raises(NotSupportedError):
+            dataset.store_dataset(str(stored), StorageFormat.GEOJSON)
+
+
+def _store_cursor(store_result: StoreResult) -> Cursor:
+    def exec_fn(sql, handler, store):
+        handler(ExecutionResult(store_result=store_result))
+        return "exec-1"
+
+    cursor = Cursor(exec_fn, lambda execution_id: None)
+    cursor.execute("SELECT * FROM t", store=Store(StorageFormat.PARQUET))
+    return cursor
+
+
+class TestCursor:
+    def test_fetch_store_dataset(self, stored):
+        cursor = _store_cursor(StoreResult(f"file://{stored}"))
+
+        table = cursor.fetch_store_dataset(columns=["id"], bbox=(0, 0, 9, 9)).read_all()
+
+        assert sorted(table.column("id").to_pylist()) == list(range(10))
+
+    def test_presigned_url_not_supported(self):
+        cursor = _store_cursor(StoreResult("https://example.com/results"))
+        with pytest.raises(NotSupportedError):
+            cursor.fetch_store_dataset()
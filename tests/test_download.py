@@ -0,0 +1,336 @@
+"""Tests for the download of results stored in cloud storage.
+
+These tests verify that:
+1. Stored files are downloaded with parallel range requests, and in a single
+   request from servers that don't support them.
+2. Parquet, CSV and GeoJSON files are decoded into record batches.
+3. The cursor exposes both, for queries executed with a presigned URL.
+"""
+
+import gc
+import http.server
+import io
+import json
+import re
+import threading
+
+import pyarrow
+import pyarrow.csv
+import pyarrow.parquet
+import pytest
+
+from wherobots.db import download
+from wherobots.db.cursor import Cursor
+from wherobots.db.errors import (
+    NotSupportedError,
+    OperationalError,
+    ProgrammingError,
+)
+from wherobots.db.models import ExecutionResult, Store, StoreResult
+from wherobots.db.types import StorageFormat
+
+PART_SIZE = 1024
+
+
+class FakeStorage:
+    """An HTTP server serving files, with or without range requests."""
+
+    def __init__(self) -> None:
+        self.files: dict[str, bytes] = {}
+        self.ranges = True
+        self.requests: list[str | None] = []
+        storage = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                data = storage.files.get(self.path)
+                if data is None:
+                    self.send_error(404)
+                    return
+                header = self.headers.get("Range")
+                storage.requests.append(header)
+                match = re.match(r"bytes=(\d+)-(\d+)", header or "")
+                if storage.ranges and match:
+                    start = int(match.group(1))
+                    end = min(int(match.group(2)), len(data) - 1)
+                    self.send_response(206)
+                    self.send_header(
+                        "Content-Range", f"bytes {start}-{end}/{len(data)}"
+                    )
+                    data = data[start : end + 1]
+                else:
+                    self.send_response(200)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(
+            target=self.server.serve_forever, args=(0.05,), daemon=True
+        ).start()
+
+    def put(self, name: str, data: bytes) -> str:
+        self.files[f"/{name}"] = data
+        return f"http://127.0.0.1:{self.server.server_port}/{name}"
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def storage():
+    storage = FakeStorage()
+    yield storage
+    storage.close()
+
+
+@pytest.fixture
+def table():
+    return pyarrow.table(
+        {"id": list(range(2000)), "name": [f"row {i}" for i in range(2000)]}
+    )
+
+
+def _parquet(table: pyarrow.Table) -> bytes:
+    sink = io.BytesIO()
+    pyarrow.parquet.write_table(table, sink, row_group_size=500)
+    return sink.getvalue()
+
+
+class TestDownload:
+    def test_parallel_ranged_download(self, storage, table, tmp_path):
+        data = _parquet(table)
+        url = storage.put("results.parquet", data)
+        path = tmp_path / "results.parquet"
+
+        download.download(url, path, size=len(data), part_size=PART_SIZE)
+
+        assert path.read_bytes() == data
+        assert len(storage.requests) == -(-len(data) // PART_SIZE)
+        assert all(r.startswith("bytes=") for r in storage.requests)
+
+    def test_probes_size_when_unknown(self, storage, tmp_path):
+        url = storage.put("results.csv", b"x" * 5000)
+        path = tmp_path / "results.csv"
+
+        download.download(url, path, part_size=PART_SIZE)
+
+        assert path.read_bytes() == b"x" * 5000
+        assert storage.requests[0] == "bytes=0-0"
+
+    def test_falls_back_without_range_support(self, storage, tmp_path):
+        storage.ranges = False
+        url = storage.put("results.csv", b"x" * 5000)
+        path = tmp_path / "results.csv"
+
+        download.download(url, path, part_size=PART_SIZE)
+
+        assert path.read_bytes() == b"x" * 5000
+
+    def test_no_prefetching_file_is_opened(self, storage, tmp_path, monkeypatch):
+        data = b"x" * 5000
+        url = storage.put("results.csv", data)
+        monkeypatch.setattr(download, "RangedHttpFile", None)
+
+        download.download(url, tmp_path / "results.csv", size=5000, part_size=PART_SIZE)
+
+        assert (tmp_path / "results.csv").read_bytes() == data
+
+    def test_failed_download_removes_file(self, storage, tmp_path):
+        url = storage.put("results.csv", b"x" * 5000)
+        path = tmp_path / "missing.csv"
+
+        with pytest.raises(Exception):
+            download.download(url.replace("results", "other"), path, size=5000)
+        assert not path.exists()
+
+
+class TestRead:
+    def test_parquet_streams_row_groups(self, storage, table):
+        data = _parquet(table)
+        url = storage.put("results.parquet", data)
+
+        reader = download.read(
+            url, StorageFormat.PARQUET, size=len(data), part_size=PART_SIZE
+        )
+
+        assert reader.schema == table.schema
+        assert reader.read_all().equals(table)
+
+    @pytest.fixture
+    def sources(self, monkeypatch):
+        sources = []
+
+        class RecordingFile(download.RangedHttpFile):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                sources.append(self)
+
+        monkeypatch.setattr(download, "RangedHttpFile", RecordingFile)
+        return sources
+
+    def test_source_closed_when_exhausted(self, storage, table, sources):
+        data = _parquet(table)
+        url = storage.put("results.parquet", data)
+
+        reader = download.read(
+            url, StorageFormat.PARQUET, size=len(data), part_size=PART_SIZE
+        )
+        assert not sources[0].closed
+        reader.read_all()
+        assert sources[0].closed
+
+    def test_source_closed_when_released(self, storage, table, sources):
+        data = _parquet(table)
+        url = storage.put("results.parquet", data)
+
+        reader = download.read(
+            url, StorageFormat.PARQUET, size=len(data), part_size=PART_SIZE
+        )
+        reader.read_next_batch()
+        del reader
+        gc.collect()
+        assert sources[0].closed
+
+    def test_source_closed_on_decoding_error(self, storage, sources):
+        url = storage.put("results.parquet", b"not parquet" * 100)
+
+        with pytest.raises(pyarrow.ArrowInvalid):
+            download.read(url, StorageFormat.PARQUET, part_size=PART_SIZE)
+        assert sources[0].closed
+
+    def test_csv_with_options(self, storage, table):
+        sink = io.BytesIO()
+        pyarrow.csv.write_csv(
+            table,
+            sink,
+            pyarrow.csv.WriteOptions(include_header=False, delimiter="|"),
+        )
+        url = storage.put("results.csv", sink.getvalue())
+
+        reader = download.read(
+            url,
+            StorageFormat.CSV,
+            options={"header": "false", "delimiter": "|"},
+            part_size=PART_SIZE,
+        )
+
+        result = reader.read_all()
+        assert result.num_rows == table.num_rows
+        assert result.column(0).to_pylist() == table.column("id").to_pylist()
+
+    def test_geojson_features(self, storage):
+        features = [
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [i, i]},
+                "properties": {"id": i},
+            }
+            for i in range(100)
+        ]
+        data = "\n".join(json.dumps(f) for f in features).encode()
+        url = storage.put("results.geojson", data)
+
+        result = download.read(
+            url, StorageFormat.GEOJSON, part_size=PART_SIZE
+        ).read_all()
+
+        assert result.column("id").to_pylist() == list(range(100))
+        assert json.loads(result.column("geometry")[3].as_py()) == {
+            "type": "Point",
+            "coordinates": [3, 3],
+        }
+
+    def test_geojson_feature_collection(self, storage):
+        data = json.dumps(
+            {
+                "type": "FeatureCollection",
+                "features": [
+                    {"type": "Feature", "geometry": None, "properties": {"id": 1}}
+                ],
+            },
+            indent=2,
+        ).encode()
+        url = storage.put("results.geojson", data)
+
+        result = download.read(url, StorageFormat.GEOJSON).read_all()
+
+        assert result.to_pylist() == [{"id": 1, "geometry": None}]
+
+    def test_geojson_properties_of_all_features(self, storage):
+        features = [
+            {"type": "Feature", "geometry": None, "properties": {"id": 1}},
+            {"type": "Feature", "geometry": None, "properties": {"id": 2, "n": "b"}},
+        ]
+        data = "\n".join(json.dumps(f) for f in features).encode()
+        url = storage.put("results.geojson", data)
+
+        result = download.read(url, StorageFormat.GEOJSON).read_all()
+
+        assert result.to_pylist() == [
+            {"id": 1, "n": None, "geometry": None},
+            {"id": 2, "n": "b", "geometry": None},
+        ]
+
+    def test_geojson_inconsistent_properties(self, storage, monkeypatch):
+        monkeypatch.setattr(download, "GEOJSON_BATCH_SIZE", 2)
+        properties = [{"id": 1}, {"id": 2}, {"id": "three"}, {"id": "four"}]
+        features = [
+            {"type": "Feature", "geometry": None, "properties": p} for p in properties
+        ]
+        data = "\n".join(json.dumps(f) for f in features).encode()
+        url = storage.put("results.geojson", data)
+
+        reader = download.read(url, StorageFormat.GEOJSON)
+
+        with pytest.raises(OperationalError, match="id has incompatible types"):
+            reader.read_all()
+
+
+def _store_cursor(store: Store, store_result: StoreResult | None) -> Cursor:
+    def exec_fn(sql, handler, store):
+        handler(ExecutionResult(store_result=store_result))
+        return "exec-1"
+
+    cursor = Cursor(exec_fn, lambda execution_id: None)
+    cursor.execute("SELECT * FROM t", store=store)
+    return cursor
+
+
+class TestCursor:
+    def test_fetch_store_arrow(self, storage, table):
+        data = _parquet(table)
+        url = storage.put("results.parquet", data)
+        cursor = _store_cursor(
+            Store.for_download(StorageFormat.PARQUET), StoreResult(url, len(data))
+        )
+
+        assert cursor.fetch_store_arrow().read_all().equals(table)
+
+    def test_download_store_result(self, storage, table, tmp_path):
+        data = _parquet(table)
+        url = storage.put("results.parquet", data)
+        cursor = _store_cursor(
+            Store.for_download(StorageFormat.PARQUET), StoreResult(url, len(data))
+        )
+
+        path = cursor.download_store_result(str(tmp_path / "results.parquet"))
+
+        assert pyarrow.parquet.read_table(path).equals(table)
+
+    def test_requires_store_result(self):
+        cursor = _store_cursor(Store.for_download(), None)
+        with pytest.raises(ProgrammingError):
+            cursor.fetch_store_arrow()
+
+    def test_requires_presigned_url(self):
+        cursor = _store_cursor(
+            Store(StorageFormat.PARQUET), StoreResult("s3://bucket/results", None)
+        )
+        with pytest.raises(NotSupportedError):
+            cursor.download_store_result("results.parquet")
@@ -0,0 +1,64 @@
+"""Tests of the connection flow of the driver."""
+
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import requests
+
+from wherobots.db import connect, connect_direct
+from wherobots.db.driver import http_session, ssl_context
+
+
+def status(state: str, uri: str | None = None) -> MagicMock:
+    response = MagicMock()
+    response.json.return_value = {"status": state, "appMeta": {"url": uri}}
+    return response
+
+
+class TestConnectPath:
+    def test_ssl_context_is_shared(self):
+        assert ssl_context("wss://a/1.0.0") is ssl_context("wss://b/1.0.0")
+        assert ssl_context("ws://a/1.0.0") is None
+
+    def test_http_session_is_shared(self):
+        assert isinstance(http_session(), requests.Session)
+        assert http_session() is http_session()
+
+    def test_http_session_is_per_thread(self):
+        sessions = []
+        thread = threading.Thread(target=lambda: sessions.append(http_session()))
+        thread.start()
+        thread.join()
+        assert sessions[0] is not http_session()
+
+    def test_connect_direct_timings(self, fake_session):
+        with connect_direct(fake_session.uri) as conn:
+            timings = conn.connect_timings
+        assert timings.create_session is None
+        assert timings.dns >= 0
+        assert timings.tcp_connect >= 0
+        assert timings.websocket_handshake > 0
+        assert timings.total >= timings.websocket_handshake
+
+    def test_connect_timings_and_polling(self, fake_session):
+        responses = [
+            status("PENDING"),
+            status("PENDING"),
+            status("READY", fake_session.uri),
+        ]
+        with (
+            patch("wherobots.db.driver.create_session", return_value="http://status"),
+            patch.object(requests.Session, "get", side_effect=responses) as get,
+        ):
+            start = time.perf_counter()
+            with connect(api_key="key") as conn:
+                elapsed = time.perf_counter() - start
+                timings = conn.connect_timings
+        assert get.call_count == 3
+        # Polls are not spaced by whole seconds anymore.
+        assert elapsed < 2
+        assert len(timings.session_polls) == 3
+        assert timings.create_session >= 0
+        assert timings.session_wait >= sum(timings.session_polls)
+        assert timings.total >= timings.session_wait + timings.websocket_handshake
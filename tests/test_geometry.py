@@ -0,0 +1,177 @@
+"""Tests for the vectorized handling of geometry columns."""
+
+import json
+import struct
+
+import pyarrow
+import pytest
+
+from wherobots.db.cursor import Cursor
+from wherobots.db.geometry import (
+    EXTENSION_METADATA,
+    EXTENSION_NAME,
+    geometry_columns,
+    to_geoarrow,
+    to_geodataframe,
+)
+from wherobots.db.models import ExecutionResult
+from wherobots.db.types import GeometryRepresentation
+
+
+def _wkb_point(x: float, y: float, srid: int | None = None, little=True) -> bytes:
+    order = "<" if little else ">"
+    if srid is None:
+        return bytes([little]) + struct.pack(f"{order}Idd", 1, x, y)
+    return bytes([little]) + struct.pack(f"{order}Iidd", 0x20000001, srid, x, y)
+
+
+def _extension(table: pyarrow.Table, name: str) -> tuple[str, dict]:
+    metadata = table.schema.field(name).metadata
+    return (
+        metadata[EXTENSION_NAME].decode(),
+        json.loads(metadata[EXTENSION_METADATA]),
+    )
+
+
+class TestGeometryColumns:
+    def test_detects_binary_geometries(self):
+        table = pyarrow.table(
+            {
+                "id": [1, 2],
+                "geom": [None, _wkb_point(1, 2)],
+                "data": [b"\xff\xff", b"\xff\xff"],
+            }
+        )
+        assert geometry_columns(table, GeometryRepresentation.WKB) == ["geom"]
+
+    def test_detects_text_geometries(self):
+        table = pyarrow.table(
+            {"name": ["a", "b"], "geom": ["SRID=4326;POINT (1 2)", "POINT (3 4)"]}
+        )
+        assert geometry_columns(table, GeometryRepresentation.EWKT) == ["geom"]
+        assert geometry_columns(table) == ["geom"]
+
+    def test_detects_geojson(self):
+        table = pyarrow.table(
+            {"name": ['{"a": 1}'], "geom": ['{"type": "Point", "coordinates": [1, 2]}']}
+        )
+        assert geometry_columns(table, GeometryRepresentation.GEOJSON) == ["geom"]
+
+
+class TestToGeoArrow:
+    def test_ewkb_carries_crs(self):
+        geoms = [_wkb_point(1, 2, 4326), None, _wkb_point(3, 4, 4326, little=False)]
+        table = pyarrow.table({"geom": pyarrow.array(geoms, pyarrow.binary())})
+
+        result = to_geoarrow(table, GeometryRepresentation.EWKB)
+
+        assert _extension(result, "geom") == (
+            "geoarrow.wkb",
+            {"crs": "EPSG:4326", "crs_type": "authority_code"},
+        )
+        # The geometries themselves are left untouched.
+        assert result.column("geom").equals(table.column("geom"))
+
+    def test_ewkb_on_sliced_and_large_arrays(self):
+        geoms = pyarrow.array(
+            [_wkb_point(0, 0, 3857), _wkb_point(1, 2, 4326), _wkb_point(3, 4)],
+            pyarrow.large_binary(),
+        )
+        table = pyarrow.table({"geom": geoms.slice(1)})
+
+        result = to_geoarrow(table, GeometryRepresentation.EWKB, ["geom"])
+
+        assert _extension(result, "geom")[1]["crs"] == "EPSG:4326"
+
+    def test_mixed_srids_have_no_crs(self):
+        table = pyarrow.table(
+            {"geom": [_wkb_point(0, 0, 3857), _wkb_point(1, 2, 4326)]}
+        )
+        result = to_geoarrow(table, GeometryRepresentation.EWKB)
+        assert _extension(result, "geom")[1] == {}
+
+    @pytest.mark.parametrize("type", [pyarrow.binary(), pyarrow.large_binary()])
+    def test_all_null_ewkb_column(self, type):
+        column = pyarrow.chunked_array(
+            [
+                pyarrow.array([None, None], type),
+                pyarrow.array([], type),
+                pyarrow.nulls(3, type),
+            ]
+        )
+        table = pyarrow.table({"geom": column})
+
+        result = to_geoarrow(table, GeometryRepresentation.EWKB, ["geom"])
+
+        assert _extension(result, "geom") == ("geoarrow.wkb", {})
+        assert result.column("geom").null_count == 5
+
+    def test_ewkt_strips_srid(self):
+        table = pyarrow.table(
+            {"geom": ["SRID=3857;POINT (1 2)", None, "SRID=3857;POINT (3 4)"]}
+        )
+
+        result = to_geoarrow(table, GeometryRepresentation.EWKT)
+
+        assert _extension(result, "geom") == (
+            "geoarrow.wkt",
+            {"crs": "EPSG:3857", "crs_type": "authority_code"},
+        )
+        assert result.column("geom").to_pylist() == ["POINT (1 2)", None, "POINT (3 4)"]
+
+    def test_wkb_has_no_crs(self):
+        table = pyarrow.table({"geom": [_wkb_point(1, 2)], "id": [1]})
+        result = to_geoarrow(table, GeometryRepresentation.WKB)
+        assert _extension(result, "geom") == ("geoarrow.wkb", {})
+        assert result.schema.field("id").metadata is None
+
+
+class TestToGeoDataFrame:
+    @pytest.fixture(autouse=True)
+    def geopandas(self):
+        return pytest.importorskip("geopandas")
+
+    def test_ewkb(self):
+        table = pyarrow.table(
+            {"id": [1, 2], "geom": [_wkb_point(1, 2, 4326), _wkb_point(3, 4, 4326)]}
+        )
+
+        frame = to_geodataframe(table, GeometryRepresentation.EWKB)
+
+        assert list(frame.columns) == ["id", "geom"]
+        assert frame.geometry.name == "geom"
+        assert frame.crs.to_epsg() == 4326
+        assert frame.geometry.x.tolist() == [1, 3]
+
+    def test_wkt(self):
+        table = pyarrow.table({"geom": ["POINT (1 2)"], "other": ["POINT (3 4)"]})
+
+        frame = to_geodataframe(table, GeometryRepresentation.WKT, geometry="other")
+
+        assert frame.geometry.name == "other"
+        assert frame["geom"].x.tolist() == [1]
+
+    def test_geojson(self):
+        table = pyarrow.table({"geom": ['{"type": "Point", "coordinates": [1, 2]}']})
+        frame = to_geodataframe(table, GeometryRepresentation.GEOJSON)
+        assert frame.geometry.y.tolist() == [2]
+
+
+def test_cursor_fetch_geoarrow():
+    table = pyarrow.table({"id": [1], "geom": [_wkb_point(1, 2, 4326)]})
+
+    def exec_fn(sql, handler, store):
+        handler(ExecutionResult(table=table))
+        return "exec-1"
+
+    cursor = Cursor(
+        exec_fn,
+        lambda execution_id: None,
+        geometry_representation=GeometryRepresentation.EWKB,
+    )
+    cursor.execute("SELECT * FROM t")
+
+    result = cursor.fetch_geoarrow()
+
+    assert _extension(result, "geom")[0] == "geoarrow.wkb"
+    assert result.column("id").to_pylist() == [1]
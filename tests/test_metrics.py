@@ -0,0 +1,120 @@
+"""Tests for the connection metrics and their Prometheus exposition."""
+
+import math
+import time
+
+import pytest
+
+from wherobots.db import OperationalError, QueryTimeoutError, connect_direct
+from wherobots.db.metrics import Histogram, MetricsSnapshot, to_prometheus
+from wherobots.db.types import DataCompression
+
+
+class TestHistogram:
+    def test_cumulative_buckets(self):
+        histogram = Histogram(buckets=[0.1, 1])
+        for value in (0.05, 0.1, 0.5, 2, 3):
+            histogram.observe(value)
+
+        snapshot = histogram.snapshot()
+
+        assert snapshot.buckets == (0.1, 1, math.inf)
+        assert snapshot.counts == (2, 3, 5)
+        assert snapshot.count == 5
+        assert snapshot.sum == pytest.approx(5.65)
+
+
+class TestConnectionMetrics:
+    def test_query_and_frame_metrics(self, fake_session):
+        with connect_direct(
+            fake_session.uri, data_compression=DataCompression.ZSTD
+        ) as conn:
+            cursor = conn.cursor()
+            for _ in range(3):
+                cursor.execute("SELECT * FROM t")
+                cursor.fetchall()
+            time.sleep(0.3)  # Let the listener time out once
+            metrics = conn.metrics()
+
+        assert metrics.queries_started == 3
+        assert metrics.queries_completed == 3
+        assert metrics.queries_in_flight == 0
+        # Two state updates per query as JSON, and its results as CBOR.
+        assert metrics.frames_received == {"json": 6, "cbor": 3}
+        assert metrics.results_received == {("arrow", "zstd"): 3}
+        assert metrics.result_bytes_received[("arrow", "zstd")] > 0
+        assert metrics.decode_time.count == 3
+        assert metrics.message_handling_time.count == 9
+        assert metrics.read_timeouts >= 1
+
+    def test_failed_and_cancelled_queries(self, fake_session):
+        def on_execute_sql(ws, request):
+            if request["statement"] == "FAIL":
+                fake_session.send(
+                    ws,
+                    kind="error",
+                    execution_id=request["execution_id"],
+                    message="Boom",
+                )
+
+        fake_session.on_execute_sql = on_execute_sql
+        with connect_direct(fake_session.uri) as conn:
+            cursor = conn.cursor()
+            cursor.execute("FAIL")
+            with pytest.raises(OperationalError):
+                cursor.fetchall()
+            cursor.execute("HANG", timeout=0.05)
+            assert conn.metrics().queries_in_flight == 1
+            with pytest.raises(QueryTimeoutError):
+                cursor.fetchall()
+            deadline = time.monotonic() + 5
+            while conn.queries_in_flight and time.monotonic() < deadline:
+                time.sleep(0.01)
+            metrics = conn.metrics()
+
+        assert metrics.queries_started == 2
+        assert metrics.queries_failed == 1
+        assert metrics.queries_cancelled == 1
+        assert metrics.queries_timed_out == 1
+        assert metrics.queries_in_flight == 0
+
+
+class TestPrometheus:
+    def test_single_snapshot(self):
+        text = to_prometheus(
+            MetricsSnapshot(
+                queries_started=2,
+                queries_in_flight=1,
+                frames_received={"json": 4},
+                results_received={("arrow", "none"): 1},
+            )
+        )
+        lines = text.splitlines()
+
+        assert "# TYPE wherobots_db_queries_started_total counter" in lines
+        assert "wherobots_db_queries_started_total 2" in lines
+        assert "# TYPE wherobots_db_queries_in_flight gauge" in lines
+        assert "wherobots_db_queries_in_flight 1" in lines
+        assert "wherobots_db_queries_timed_out_total 0" in lines
+        assert 'wherobots_db_frames_received_total{encoding="json"} 4' in lines
+        assert (
+            'wherobots_db_results_received_total{format="arrow",codec="none"} 1'
+            in lines
+        )
+        assert 'wherobots_db_decode_time_seconds_bucket{le="+Inf"} 0' in lines
+        assert "wherobots_db_decode_time_seconds_count 0" in lines
+        assert text.endswith("\n")
+
+    def test_labelled_snapshots(self):
+        text = to_prometheus(
+            {
+                "a": MetricsSnapshot(queries_started=1),
+                'b"2': MetricsSnapshot(queries_started=2),
+            },
+            label="session",
+        )
+        lines = text.splitlines()
+
+        assert lines.count("# TYPE wherobots_db_queries_started_total counter") == 1
+        assert 'wherobots_db_queries_started_total{session="a"} 1' in lines
+        assert 'wherobots_db_queries_started_total{session="b\\"2"} 2' in lines
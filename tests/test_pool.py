@@ -0,0 +1,149 @@
+"""Tests of ConnectionPool against a local SQL session stand-in."""
+
+import functools
+import threading
+import time
+
+import pytest
+
+from wherobots.db import connect_direct
+from wherobots.db.errors import InterfaceError, OperationalError
+from wherobots.db.pool import ConnectionPool
+
+
+@pytest.fixture
+def factory(fake_session):
+    return functools.partial(connect_direct, fake_session.uri)
+
+
+class TestConnectionPool:
+    def test_prewarms_min_size_connections(self, factory):
+        with ConnectionPool(factory, min_size=2, max_size=3) as pool:
+            assert pool.wait_ready(timeout=5)
+            stats = pool.stats()
+            assert stats.size == 2
+            assert stats.idle == 2
+            assert stats.connections_created == 2
+
+    def test_checkout_and_execute(self, factory):
+        with ConnectionPool(factory, min_size=1, max_size=2) as pool:
+            with pool.connection(timeout=5) as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT * FROM t")
+                    assert list(cursor.fetchall()["id"]) == [1, 2, 3]
+                assert pool.stats().in_use == 1
+            stats = pool.stats()
+            assert stats.in_use == 0
+            assert stats.checkouts == 1
+            assert stats.wait_time_max >= stats.wait_time_avg >= 0
+
+    def test_connections_are_reused(self, factory):
+        with ConnectionPool(factory, min_size=1, max_size=1) as pool:
+            with pool.connection(timeout=5) as first:
+                pass
+            with pool.connection(timeout=5) as second:
+                pass
+            assert first is second
+            assert pool.stats().connections_created == 1
+
+    def test_checkout_times_out_at_max_size(self, factory):
+        with ConnectionPool(factory, min_size=0, max_size=1) as pool:
+            conn = pool.getconn(timeout=5)
+            with pytest.raises(OperationalError):
+                pool.getconn(timeout=0.1)
+            assert pool.stats().timeouts == 1
+            pool.putconn(conn)
+
+    def test_waiting_checkout_gets_returned_connection(self, factory):
+        with ConnectionPool(factory, min_size=0, max_size=1) as pool:
+            conn = pool.getconn(timeout=5)
+            threading.Timer(0.1, pool.putconn, args=(conn,)).start()
+            assert pool.getconn(timeout=5) is conn
+            assert pool.stats().wait_time_max >= 0.1
+            pool.putconn(conn)
+
+    def test_dead_connection_is_replaced(self, factory):
+        with ConnectionPool(factory, min_size=1, max_size=1) as pool:
+            assert pool.wait_ready(timeout=5)
+            dead = pool.getconn(timeout=5)
+            pool.putconn(dead)
+            dead.close()
+
+            conn = pool.getconn(timeout=5)
+            assert conn is not dead
+            assert not conn.closed
+            stats = pool.stats()
+            assert stats.connections_replaced == 1
+            assert stats.connections_created == 2
+            pool.putconn(conn)
+
+    def test_checkout_timeout_bounds_opening(self, factory):
+        opened = threading.Event()
+
+        def slow_factory():
+            time.sleep(0.5)
+            conn = factory()
+            opened.set()
+            return conn
+
+        with ConnectionPool(slow_factory, min_size=0, max_size=1) as pool:
+            start = time.monotonic()
+            with pytest.raises(OperationalError):
+                pool.getconn(timeout=0.1)
+            assert time.monotonic() - start < 0.4
+            assert pool.stats().timeouts == 1
+            # The connection still being opened is kept for the next checkout.
+            assert opened.wait(5)
+            conn = pool.getconn(timeout=5)
+            assert pool.stats().connections_created == 1
+            pool.putconn(conn)
+
+    def test_dead_connection_is_closed_outside_the_lock(self, factory):
+        with ConnectionPool(factory, min_size=0, max_size=1) as pool:
+            conn = pool.getconn(timeout=5)
+            closing, release = threading.Event(), threading.Event()
+            close = conn.close
+
+            def slow_close():
+                closing.set()
+                release.wait(5)
+                close()
+
+            conn.close = slow_close
+            close()
+            thread = threading.Thread(target=pool.putconn, args=(conn,))
+            thread.start()
+            assert closing.wait(5)
+            # The pool stays usable while the dead connection is being closed.
+            assert pool.stats().connections_replaced == 1
+            release.set()
+            thread.join(5)
+
+    def test_factories_are_used_in_turn(self, factory):
+        calls = []
+
+        def make(name):
+            def open_connection():
+                calls.append(name)
+                return factory()
+
+            return open_connection
+
+        with ConnectionPool([make("a"), make("b")], min_size=0, max_size=3) as pool:
+            conns = [pool.getconn(timeout=5) for _ in range(3)]
+            for conn in conns:
+                pool.putconn(conn)
+        assert calls == ["a", "b", "a"]
+
+    def test_closed_pool(self, factory):
+        pool = ConnectionPool(factory, min_size=1, max_size=2)
+        conn = pool.getconn(timeout=5)
+        pool.close()
+        with pytest.raises(InterfaceError):
+            pool.getconn(timeout=1)
+        pool.putconn(conn)
+        assert conn.closed
+
+    def test_invalid_sizes(self, factory):
+        with pytest.raises(ValueError):
+            ConnectionPool(factory, min_size=3, max_size=2)
@@ -0,0 +1,182 @@
+"""Tests for the dispatch of execution progress events."""
+
+import threading
+import time
+
+import pytest
+
+from wherobots.db import ProgressInfo, connect_direct
+from wherobots.db.progress import ProgressDispatcher
+
+
+def progress(execution_id, completed, total=10):
+    return ProgressInfo(
+        execution_id=execution_id,
+        tasks_total=total,
+        tasks_completed=completed,
+        tasks_active=1,
+    )
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Timed out"
+        time.sleep(0.005)
+
+
+class TestProgressDispatcher:
+    def test_bursts_are_coalesced(self):
+        received = []
+        entered = threading.Event()
+        release = threading.Event()
+
+        def handler(info):
+            entered.set()
+            release.wait()
+            received.append(info.tasks_completed)
+
+        dispatcher = ProgressDispatcher(max_rate=None)
+        dispatcher.dispatch(progress("a", 1), [handler])
+        assert entered.wait(1)
+        for completed in range(2, 11):
+            dispatcher.dispatch(progress("a", completed), [handler])
+        release.set()
+        wait_for(lambda: received and received[-1] == 10)
+        dispatcher.close()
+
+        # Only the latest of the events received during the first delivery.
+        assert received == [1, 10]
+
+    def test_max_rate(self):
+        received = []
+        dispatcher = ProgressDispatcher(max_rate=10)
+        started = time.monotonic()
+        dispatcher.dispatch(progress("a", 1), [lambda info: received.append(info)])
+        wait_for(lambda: len(received) == 1)
+        dispatcher.dispatch(progress("a", 2), [lambda info: received.append(info)])
+        wait_for(lambda: len(received) == 2)
+        dispatcher.close()
+
+        assert time.monotonic() - started >= 0.1
+
+    def test_executions_are_independent(self):
+        received = []
+        dispatcher = ProgressDispatcher(max_rate=1)
+        for execution_id in ("a", "b", "c"):
+            dispatcher.dispatch(
+                progress(execution_id, 1), [lambda info: received.append(info)]
+            )
+        wait_for(lambda: len(received) == 3, timeout=0.5)
+        dispatcher.close()
+
+        assert {info.execution_id for info in received} == {"a", "b", "c"}
+
+    def test_pending_progress_is_delivered_after_finish(self):
+        received = []
+        dispatcher = ProgressDispatcher(max_rate=20)
+        dispatcher.dispatch(progress("a", 1), [lambda info: received.append(info)])
+        dispatcher.dispatch(progress("a", 2), [lambda info: received.append(info)])
+        dispatcher.finish("a")
+        wait_for(lambda: received and received[-1].tasks_completed == 2)
+        dispatcher.close()
+
+    def test_handler_errors_are_logged(self, caplog):
+        received = []
+
+        def failing(info):
+            raise ValueError("boom")
+
+        dispatcher = ProgressDispatcher()
+        dispatcher.dispatch(
+            progress("a", 1), [failing, lambda info: received.append(info)]
+        )
+        wait_for(lambda: received)
+        dispatcher.close()
+
+        assert "Progress handler raised an exception" in caplog.text
+
+
+@pytest.fixture
+def progress_session(fake_session):
+    """A session sending a burst of progress events for every query."""
+    on_execute_sql = fake_session.on_execute_sql
+
+    def with_progress(ws, request):
+        if request.get("enable_progress_events"):
+            for completed in range(1, 51):
+                fake_session.send(
+                    ws,
+                    kind="execution_progress",
+                    execution_id=request["execution_id"],
+                    tasks_total=50,
+                    tasks_completed=completed,
+                    tasks_active=1,
+                )
+        on_execute_sql(ws, request)
+
+    fake_session.on_execute_sql = with_progress
+    return fake_session
+
+
+class TestProgressHandlers:
+    def test_slow_handler_does_not_delay_results(self, progress_session):
+        received = []
+
+        def slow_handler(info):
+            time.sleep(0.05)
+            received.append(info)
+
+        with connect_direct(progress_session.uri, progress_max_rate=None) as conn:
+            conn.set_progress_handler(slow_handler)
+            with conn.cursor() as cursor:
+                started = time.perf_counter()
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+                assert time.perf_counter() - started < 0.5
+
+            wait_for(lambda: received and received[-1].tasks_completed == 50)
+        assert len(received) < 50
+
+    def test_cursor_and_execution_handlers(self, progress_session):
+        connection_progress = []
+        cursor_progress = []
+        execution_progress = []
+
+        with connect_direct(progress_session.uri) as conn:
+            conn.set_progress_handler(connection_progress.append)
+            first, second = conn.cursor(), conn.cursor()
+            first.set_progress_handler(cursor_progress.append)
+
+            first.execute("SELECT 1")
+            first.fetchall()
+            second.execute("SELECT 2", progress_handler=execution_progress.append)
+            second.fetchall()
+
+            wait_for(lambda: len({i.execution_id for i in connection_progress}) == 2)
+            wait_for(lambda: cursor_progress and execution_progress)
+
+        assert {i.execution_id for i in cursor_progress} == {
+            connection_progress[0].execution_id
+        }
+        assert {i.execution_id for i in execution_progress} == {
+            connection_progress[-1].execution_id
+        }
+
+    def test_cursor_handler_enables_progress_events(self, progress_session):
+        received = []
+        with connect_direct(progress_session.uri) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1", progress_handler=received.append)
+            cursor.fetchall()
+            cursor.execute("SELECT 2")
+            cursor.fetchall()
+            wait_for(lambda: received and received[-1].tasks_completed == 50)
+
+        first, second = [
+            request
+            for request in progress_session.requests
+            if request["kind"] == "execute_sql"
+        ]
+        assert first["enable_progress_events"] is True
+        assert "enable_progress_events" not in second
@@ -0,0 +1,181 @@
+"""Tests of the recovery of queries in flight when the connection is lost."""
+
+import time
+
+import pyarrow
+import pytest
+
+from conftest import encode_arrow
+from wherobots.db import OperationalError, ReconnectPolicy, connect_direct
+from wherobots.db.constants import REATTACH_PROTOCOL_VERSION
+
+FAST_RETRY = ReconnectPolicy(max_attempts=3, min_delay=0.01, max_delay=0.05)
+
+
+def wait_for(predicate, timeout: float = 5) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "Timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def running_session(fake_session):
+    """A session where queries keep running until the connection is lost."""
+
+    def on_execute_sql(ws, request):
+        fake_session.statements[request["execution_id"]] = request["statement"]
+        fake_session.send(
+            ws,
+            kind="state_updated",
+            execution_id=request["execution_id"],
+            state="running",
+        )
+
+    fake_session.on_execute_sql = on_execute_sql
+    return fake_session
+
+
+class TestReconnect:
+    def test_running_query_is_reattached(self, running_session):
+        with connect_direct(
+            running_session.uri,
+            reconnect=FAST_RETRY,
+            protocol=REATTACH_PROTOCOL_VERSION,
+        ) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT * FROM t")
+                wait_for(lambda: "execute_sql" in running_session.kinds())
+                running_session.drop()
+
+                assert list(cursor.fetchall()["id"]) == [1, 2, 3]
+        kinds = running_session.kinds()
+        assert kinds.count("execute_sql") == 1
+        assert kinds.index("reattach") < kinds.index("retrieve_results")
+
+    def test_succeeded_query_results_are_requested_again(self, fake_session):
+        serve_results = fake_session.on_retrieve_results
+        dropped = []
+
+        def on_retrieve_results(ws, request):
+            if not dropped:
+                dropped.append(request)
+                ws.close()
+                return
+            serve_results(ws, request)
+
+        fake_session.on_retrieve_results = on_retrieve_results
+        with connect_direct(fake_session.uri, reconnect=FAST_RETRY) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT * FROM t")
+                assert list(cursor.fetchall()["id"]) == [1, 2, 3]
+        kinds = fake_session.kinds()
+        assert kinds.count("execute_sql") == 1
+        assert kinds.count("retrieve_results") == 2
+        assert "reattach" not in kinds
+
+    def test_running_query_is_not_reattached_with_older_protocol(self, running_session):
+        with connect_direct(running_session.uri, reconnect=FAST_RETRY) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT * FROM t")
+                wait_for(lambda: "execute_sql" in running_session.kinds())
+                running_session.drop()
+
+                with pytest.raises(OperationalError, match="protocol"):
+                    cursor.fetchall()
+        assert "reattach" not in running_session.kinds()
+
+    def test_unanswered_reattach_fails(self, running_session):
+        running_session.on_reattach = lambda ws, request: None
+        policy = ReconnectPolicy(min_delay=0.01, reattach_timeout=0.3)
+        with connect_direct(
+            running_session.uri, reconnect=policy, protocol=REATTACH_PROTOCOL_VERSION
+        ) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT * FROM t")
+                wait_for(lambda: "execute_sql" in running_session.kinds())
+                running_session.drop()
+
+                started = time.monotonic()
+                with pytest.raises(OperationalError, match="No response"):
+                    cursor.fetchall()
+                assert time.monotonic() - started < 2
+
+    def test_reconnect_is_disabled_by_default(self, running_session):
+        with connect_direct(running_session.uri) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM t")
+            wait_for(lambda: "execute_sql" in running_session.kinds())
+            running_session.drop()
+
+            with pytest.raises(OperationalError, match="lost"):
+                cursor.fetchall()
+        assert running_session.kinds() == ["execute_sql"]
+
+    def test_unknown_query_fails(self, running_session):
+        with connect_direct(
+            running_session.uri,
+            reconnect=FAST_RETRY,
+            protocol=REATTACH_PROTOCOL_VERSION,
+        ) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT * FROM t")
+                wait_for(lambda: "execute_sql" in running_session.kinds())
+                running_session.statements.clear()  # e.g. the session restarted
+                running_session.drop()
+
+                with pytest.raises(OperationalError, match="Unknown query"):
+                    cursor.fetchall()
+
+    def test_interrupted_stream_fails(self, fake_session):
+        fake_session.table = pyarrow.table({"id": list(range(10000))})
+        fake_session.batch_size = 100
+        fake_session.chunk_size = 1024
+
+        def on_retrieve_results(ws, request):
+            data = encode_arrow(fake_session.table, None, fake_session.batch_size)
+            fake_session.send_chunk(
+                ws, request["execution_id"], data[:4096], None, False
+            )
+            ws.close()
+
+        fake_session.on_retrieve_results = on_retrieve_results
+        with connect_direct(
+            fake_session.uri, reconnect=FAST_RETRY, stream_results=True
+        ) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT * FROM t")
+                with pytest.raises(OperationalError, match="streaming"):
+                    cursor.fetchall()
+
+    def test_no_reconnect_fails_pending_queries(self, running_session):
+        with connect_direct(running_session.uri, reconnect=None) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM t")
+            wait_for(lambda: "execute_sql" in running_session.kinds())
+            running_session.drop()
+
+            with pytest.raises(OperationalError, match="lost"):
+                cursor.fetchall()
+            assert conn.closed
+
+    def test_reconnect_gives_up(self, running_session):
+        with connect_direct(running_session.uri, reconnect=FAST_RETRY) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM t")
+            wait_for(lambda: "execute_sql" in running_session.kinds())
+            running_session.server.shutdown()
+            running_session.drop()
+
+            with pytest.raises(OperationalError, match="lost"):
+                cursor.fetchall()
+
+    def test_close_fails_pending_queries(self, running_session):
+        conn = connect_direct(running_session.uri)
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM t")
+        wait_for(lambda: "execute_sql" in running_session.kinds())
+        conn.close()
+
+        with pytest.raises(OperationalError, match="closed"):
+            cursor.fetchall()
@@ -0,0 +1,147 @@
+"""Tests for the recording and replay of connection traffic."""
+
+import io
+import time
+
+import pyarrow
+import pytest
+
+from wherobots.db import connect_direct
+from wherobots.db.errors import OperationalError
+from wherobots.db.recording import (
+    RedactedPayload,
+    ReplayServer,
+    TrafficRecorder,
+    load_recording,
+)
+
+
+def record(fake_session, path, statements, **kwargs):
+    options = {
+        k: kwargs.pop(k)
+        for k in ("redact_results", "max_result_size", "redact_sql")
+        if k in kwargs
+    }
+    with TrafficRecorder(path, **options) as recorder:
+        with connect_direct(fake_session.uri, recorder=recorder, **kwargs) as conn:
+            for statement in statements:
+                with conn.cursor() as cursor:
+                    cursor.execute(statement)
+                    cursor.fetchall()
+
+
+def replay(uri, statements, **kwargs):
+    results = []
+    with connect_direct(uri, **kwargs) as conn:
+        for statement in statements:
+            with conn.cursor() as cursor:
+                cursor.execute(statement)
+                results.append(cursor.fetchall())
+    return results
+
+
+class TestTrafficRecorder:
+    def test_records_requests_and_frames(self, fake_session, tmp_path):
+        path = tmp_path / "traffic.jsonl"
+        record(fake_session, path, ["SELECT 1"])
+
+        frames = load_recording(path)
+        assert [(f.direction, f.message["kind"]) for f in frames] == [
+            ("sent", "execute_sql"),
+            ("received", "state_updated"),
+            ("received", "state_updated"),
+            ("sent", "retrieve_results"),
+            ("received", "execution_result"),
+        ]
+        assert frames[0].message["statement"] == "SELECT 1"
+        assert [f.at for f in frames] == sorted(f.at for f in frames)
+        result = frames[-1]
+        assert result.encoding == "cbor"
+        assert isinstance(result.message["results"]["result_bytes"], bytes)
+        assert result.size > len(result.message["results"]["result_bytes"])
+
+    def test_redaction(self, fake_session):
+        buffer = io.StringIO()
+        record(fake_session, buffer, ["SELECT 1"], redact_results=True, redact_sql=True)
+
+        buffer.seek(0)
+        frames = load_recording(buffer)
+        assert frames[0].message["statement"] is None
+        payload = frames[-1].message["results"]["result_bytes"]
+        assert isinstance(payload, RedactedPayload)
+        assert payload.size > 0 and payload.prefix == b""
+
+    def test_truncation(self, fake_session, tmp_path):
+        path = tmp_path / "traffic.jsonl"
+        record(fake_session, path, ["SELECT 1"], max_result_size=16)
+
+        payload = load_recording(path)[-1].message["results"]["result_bytes"]
+        assert isinstance(payload, RedactedPayload)
+        assert len(payload.prefix) == 16 and payload.size > 16
+
+
+class TestReplayServer:
+    def test_replays_results(self, fake_session, tmp_path):
+        fake_session.tables["SELECT 2"] = pyarrow.table({"v": [2]})
+        path = tmp_path / "traffic.jsonl"
+        record(fake_session, path, ["SELECT 1", "SELECT 2"])
+        fake_session.close()
+
+        with ReplayServer(path, speed=0) as server:
+            # Queries are matched by statement, whatever their order.
+            second, first = replay(server.uri, ["SELECT 2", "SELECT 1"])
+        assert list(first["id"]) == [1, 2, 3]
+        assert list(second["v"]) == [2]
+
+    def test_redacted_results_are_replaced(self, fake_session, tmp_path):
+        path = tmp_path / "traffic.jsonl"
+        record(fake_session, path, ["SELECT 1"], redact_results=True)
+
+        with ReplayServer(path, speed=0) as server:
+            (df,) = replay(server.uri, ["SELECT 1"])
+        assert list(df.columns) == ["filler"]
+
+    def test_truncated_streamed_results_are_replaced(self, fake_session, tmp_path):
+        fake_session.chunk_size = 64
+        path = tmp_path / "traffic.jsonl"
+        record(
+            fake_session, path, ["SELECT 1"], stream_results=True, max_result_size=32
+        )
+        chunks = [
+            f
+            for f in load_recording(path)
+            if f.message["kind"] == "execution_result_chunk"
+        ]
+        assert len(chunks) > 1
+
+        with ReplayServer(path, speed=0) as server:
+            (df,) = replay(server.uri, ["SELECT 1"], stream_results=True)
+        assert list(df.columns) == ["filler"]
+
+    def test_recorded_delays(self, fake_session, tmp_path):
+        on_execute_sql = fake_session.on_execute_sql
+
+        def slow_execute_sql(ws, request):
+            time.sleep(0.3)
+            on_execute_sql(ws, request)
+
+        fake_session.on_execute_sql = slow_execute_sql
+        path = tmp_path / "traffic.jsonl"
+        record(fake_session, path, ["SELECT 1"])
+
+        with ReplayServer(path) as server:
+            started = time.perf_counter()
+            replay(server.uri, ["SELECT 1"])
+            assert time.perf_counter() - started >= 0.3
+        with ReplayServer(path, speed=10) as server:
+            started = time.perf_counter()
+            replay(server.uri, ["SELECT 1"])
+            assert time.perf_counter() - started < 0.25
+
+    def test_queries_beyond_the_recording_fail(self, fake_session, tmp_path):
+        path = tmp_path / "traffic.jsonl"
+        record(fake_session, path, ["SELECT 1"])
+
+        with ReplayServer(path, speed=0) as server:
+            with pytest.raises(OperationalError):
+                replay(server.uri, ["SELECT 1", "SELECT 1"])
@@ -0,0 +1,144 @@
+"""Tests for row-wise access to query results."""
+
+from unittest.mock import MagicMock
+
+import pyarrow
+import pytest
+
+from wherobots.db import connect_direct
+from wherobots.db.cursor import Cursor
+from wherobots.db.errors import NotSupportedError, ProgrammingError
+from wherobots.db.models import ExecutionResult, StoreResult
+from wherobots.db.results import ArrowResults
+
+
+@pytest.fixture
+def table():
+    return pyarrow.table(
+        {"id": list(range(2500)), "name": [f"n{i}" for i in range(2500)]}
+    )
+
+
+def _stream(table, batch_size=1000):
+    return ArrowResults(
+        reader=pyarrow.RecordBatchReader.from_batches(
+            table.schema, table.to_batches(max_chunksize=batch_size)
+        )
+    )
+
+
+class TestArrowResultsRows:
+    def test_next_row_returns_tuples(self, table):
+        results = ArrowResults(table=table)
+        assert results.next_row() == (0, "n0")
+        assert results.next_row() == (1, "n1")
+        assert results.position == 2
+
+    def test_next_row_until_end(self, table):
+        results = _stream(table)
+        rows = []
+        while (row := results.next_row()) is not None:
+            rows.append(row)
+        assert len(rows) == 2500
+        assert rows[-1] == (2499, "n2499")
+        assert results.next_row() is None
+
+    def test_rows_after_next_row(self, table):
+        results = ArrowResults(table=table)
+        results.next_row()
+        assert results.rows(3) == [(1, "n1"), (2, "n2"), (3, "n3")]
+        assert results.position == 4
+        assert results.take().num_rows == 2496
+
+    def test_rows_across_batches(self, table):
+        results = _stream(table)
+        results.rows(999)
+        assert results.rows(3) == [(999, "n999"), (1000, "n1000"), (1001, "n1001")]
+
+    def test_rows_all(self, table):
+        results = ArrowResults(table=table)
+        results.rows(10)
+        assert len(results.rows()) == 2490
+
+    def test_seek(self, table):
+        results = ArrowResults(table=table)
+        results.seek(2000)
+        assert results.next_row() == (2000, "n2000")
+        results.seek(5)
+        assert results.next_row() == (5, "n5")
+        results.seek(2500)
+        assert results.next_row() is None
+
+    def test_seek_out_of_range(self, table):
+        results = ArrowResults(table=table)
+        with pytest.raises(IndexError):
+            results.seek(2501)
+        with pytest.raises(IndexError):
+            results.seek(-1)
+        assert results.position == 0
+
+    def test_streamed_seek_forward_only(self, table):
+        results = _stream(table)
+        results.seek(1500)
+        assert results.next_row() == (1500, "n1500")
+        results.seek(1200)  # Still within the batch held in memory.
+        assert results.next_row() == (1200, "n1200")
+        with pytest.raises(NotSupportedError):
+            results.seek(10)
+        with pytest.raises(IndexError):
+            results.seek(3000)
+
+
+class TestCursorRows:
+    def test_fetchone_and_fetchmany(self, fake_session, table):
+        fake_session.table = table
+        with connect_direct(fake_session.uri) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM t")
+            assert cursor.rownumber is None
+            assert cursor.fetchone() == (0, "n0")
+            assert cursor.rownumber == 1
+            cursor.arraysize = 2
+            assert cursor.fetchmany() == [(1, "n1"), (2, "n2")]
+            assert cursor.fetchmany(1) == [(3, "n3")]
+            assert len(cursor.fetchall()) == 2496
+            assert cursor.fetchone() is None
+            assert cursor.fetchmany(5) == []
+
+    def test_iteration(self, fake_session, table):
+        fake_session.table = table
+        with connect_direct(fake_session.uri) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM t")
+            rows = list(cursor)
+
+        assert len(rows) == 2500
+        assert rows[42] == (42, "n42")
+
+    def test_scroll(self, fake_session, table):
+        fake_session.table = table
+        with connect_direct(fake_session.uri) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM t")
+            cursor.scroll(10)
+            assert cursor.fetchone() == (10, "n10")
+            cursor.scroll(-5)
+            assert cursor.rownumber == 6
+            cursor.scroll(100, mode="absolute")
+            assert cursor.fetchone() == (100, "n100")
+            with pytest.raises(IndexError):
+                cursor.scroll(10_000)
+
+    def test_fetching_stored_results_raises(self):
+        handlers = []
+
+        def exec_fn(sql, handler, store):
+            handlers.append(handler)
+            return "exec-1"
+
+        cursor = Cursor(exec_fn, MagicMock())
+        cursor.execute("SELECT 1")
+        handlers[0](ExecutionResult(store_result=StoreResult("s3://bucket/key")))
+        with pytest.raises(ProgrammingError, match="did not return any results"):
+            cursor.fetchone()
+        assert cursor.get_store_result().result_uri == "s3://bucket/key"
@@ -0,0 +1,121 @@
+"""Tests of the persistent SQL session URI cache."""
+
+import socket
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+
+from wherobots.db import connect
+from wherobots.db.region import Region
+from wherobots.db.runtime import Runtime
+from wherobots.db.session_cache import SessionCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return SessionCache(tmp_path / "sessions.json")
+
+
+def unused_uri() -> str:
+    """A WebSocket URI nobody listens on."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return f"ws://127.0.0.1:{s.getsockname()[1]}"
+
+
+def ready_status(uri: str) -> MagicMock:
+    response = MagicMock()
+    response.json.return_value = {"status": "READY", "appMeta": {"url": uri}}
+    return response
+
+
+class TestSessionCache:
+    def test_put_and_get(self, cache):
+        cache.put("k", "wss://session")
+        assert cache.get("k") == "wss://session"
+        assert SessionCache(cache.path).get("k") == "wss://session"
+        assert cache.get("other") is None
+
+    def test_invalidate_and_clear(self, cache):
+        cache.put("a", "wss://a")
+        cache.put("b", "wss://b")
+        cache.invalidate("a")
+        assert cache.get("a") is None
+        assert cache.get("b") == "wss://b"
+        cache.clear()
+        assert cache.get("b") is None
+
+    def test_expired_entries_are_ignored(self, cache):
+        cache.put("k", "wss://session")
+        with patch("time.time", return_value=1e12):
+            assert cache.get("k") is None
+
+    def test_unreadable_file_is_ignored(self, cache):
+        cache.path.write_text("not json")
+        assert cache.get("k") is None
+        cache.put("k", "wss://session")
+        assert cache.get("k") == "wss://session"
+
+    def test_key_depends_on_session_and_credentials(self):
+        key = SessionCache.key("host", "secret", Runtime.TINY, Region.AWS_US_WEST_2)
+        assert key == SessionCache.key("host", "secret")  # defaults
+        assert "secret" not in key
+        assert key != SessionCache.key("host", "other")
+        assert key != SessionCache.key("host", "secret", Runtime.SMALL)
+        assert key != SessionCache.key("host", "secret", version="1.0")
+
+    def test_default_path_from_environment(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("WHEROBOTS_SESSION_CACHE", str(tmp_path / "c.json"))
+        assert SessionCache().path == tmp_path / "c.json"
+
+
+class TestConnectWithSessionCache:
+    def test_cache_hit_skips_session_negotiation(self, cache, fake_session):
+        cache.put(SessionCache.key("host", "key"), fake_session.uri)
+        with patch("wherobots.db.driver.create_session") as create_session:
+            with connect(host="host", api_key="key", session_cache=cache) as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT * FROM t")
+                    assert list(cursor.fetchall()["id"]) == [1, 2, 3]
+        create_session.assert_not_called()
+
+    def test_cache_miss_stores_session_uri(self, cache, fake_session):
+        with (
+            patch("wherobots.db.driver.create_session", return_value="http://status"),
+            patch.object(
+                requests.Session, "get", return_value=ready_status(fake_session.uri)
+            ),
+        ):
+            connect(host="host", api_key="key", session_cache=cache).close()
+        assert cache.get(SessionCache.key("host", "key")) == fake_session.uri
+
+    def test_stale_entry_falls_back_to_regular_flow(self, cache, fake_session):
+        key = SessionCache.key("host", "key")
+        cache.put(key, unused_uri())
+        with (
+            patch(
+                "wherobots.db.driver.create_session", return_value="http://status"
+            ) as create_session,
+            patch.object(
+                requests.Session, "get", return_value=ready_status(fake_session.uri)
+            ),
+        ):
+            connect(host="host", api_key="key", session_cache=cache).close()
+        create_session.assert_called_once()
+        assert cache.get(key) == fake_session.uri
+
+    def test_force_new_bypasses_cache(self, cache, fake_session):
+        cache.put(SessionCache.key("host", "key"), unused_uri())
+        with (
+            patch(
+                "wherobots.db.driver.create_session", return_value="http://status"
+            ) as create_session,
+            patch.object(
+                requests.Session, "get", return_value=ready_status(fake_session.uri)
+            ),
+            patch("wherobots.db.driver.connect_direct") as connect_direct,
+        ):
+            connect(host="host", api_key="key", session_cache=cache, force_new=True)
+        create_session.assert_called_once()
+        connect_direct.assert_called_once()
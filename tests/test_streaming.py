@@ -0,0 +1,207 @@
+"""Tests for streamed retrieval of query results."""
+
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pyarrow
+import pytest
+
+from conftest import encode_arrow
+from wherobots.db import connect_direct
+from wherobots.db.cursor import Cursor
+from wherobots.db.errors import OperationalError, QueryTimeoutError
+from wherobots.db.models import ExecutionResult
+from wherobots.db.results import ResultStream
+from wherobots.db.types import DataCompression
+
+
+class TestResultStream:
+    def test_reads_across_chunks(self):
+        stream = ResultStream(4)
+        stream.put(b"abc")
+        stream.put(b"de")
+        stream.finish()
+        assert stream.read() == b"abcde"
+        assert stream.read() == b""
+
+    def test_put_spills_when_full(self):
+        stream = ResultStream(2)
+        chunks = [bytes([i]) * 100 for i in range(10)]
+        for chunk in chunks[:5]:
+            stream.put(chunk)
+        assert stream.spilled == 3
+        assert stream.read(250) == b"".join(chunks)[:250]
+        # Chunks put while spilled ones are pending keep their order.
+        for chunk in chunks[5:]:
+            stream.put(chunk)
+        stream.finish()
+        assert stream.read() == b"".join(chunks)[250:]
+
+    def test_put_does_not_block(self):
+        stream = ResultStream(1)
+        done = threading.Event()
+
+        def producer():
+            for _ in range(100):
+                stream.put(b"a" * 1024)
+            stream.finish()
+            done.set()
+
+        threading.Thread(target=producer, daemon=True).start()
+        assert done.wait(1)
+        assert stream.read() == b"a" * 100 * 1024
+
+    def test_close_drops_chunks(self):
+        stream = ResultStream(1)
+        stream.put(b"a")
+        stream.put(b"b")
+        stream.close()
+        stream.put(b"c")
+        stream.finish()
+        assert stream.closed
+
+    def test_error_is_raised_to_reader(self):
+        stream = ResultStream(4)
+        stream.put(b"a")
+        stream.finish(OperationalError("boom"))
+        assert stream.read(1) == b"a"
+        with pytest.raises(OperationalError, match="boom"):
+            stream.read(1)
+
+    def test_peek_schema(self):
+        table = pyarrow.table({"id": [1, 2, 3]})
+        data = encode_arrow(table)
+        stream = ResultStream(4)
+        assert stream.peek_schema() is None
+        stream.put(data[:10])
+        assert stream.peek_schema() is None
+        stream.put(data[10:])
+        assert stream.peek_schema() == table.schema
+        # Peeking leaves the chunks in the stream.
+        stream.finish()
+        assert stream.read() == data
+
+
+class TestStreamedResults:
+    @pytest.fixture
+    def table(self, fake_session):
+        table = pyarrow.table({"id": list(range(10_000)), "v": [1.5] * 10_000})
+        fake_session.table = table
+        fake_session.batch_size = 1000
+        fake_session.chunk_size = 4096
+        return table
+
+    @pytest.mark.parametrize("compression", [None, "brotli"])
+    def test_fetchall(self, fake_session, table, compression):
+        with connect_direct(
+            fake_session.uri,
+            stream_results=True,
+            data_compression=DataCompression(compression) if compression else None,
+        ) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM t")
+            df = cursor.fetchall()
+
+        assert fake_session.requests[-1]["stream"] is True
+        assert list(df["id"]) == list(range(10_000))
+        assert cursor.rowcount == 10_000
+        assert [d[0] for d in cursor.description] == ["id", "v"]
+
+    def test_fetchmany_before_stream_ends(self, fake_session, table):
+        """The first rows are available as soon as the first chunk arrives."""
+        release = threading.Event()
+        send_chunk = fake_session.send_chunk
+
+        def gated_send_chunk(ws, execution_id, data, compression, last):
+            if last:
+                release.wait(5)
+            send_chunk(ws, execution_id, data, compression, last)
+
+        fake_session.send_chunk = gated_send_chunk
+        with connect_direct(fake_session.uri, stream_results=True) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM t")
+            first = cursor.fetchmany(10)
+            assert [row[0] for row in first] == list(range(10))
+            assert cursor.rowcount == -1
+            release.set()
+            rest = cursor.fetchall()
+            assert len(rest) == 10_000 - 10
+            assert cursor.rowcount == 10_000
+
+    def test_stream_timeout(self, fake_session, table):
+        """The timeout of the query also bounds the reception of its stream."""
+        release = threading.Event()
+        send_chunk = fake_session.send_chunk
+
+        def gated_send_chunk(ws, execution_id, data, compression, last):
+            if last:
+                release.wait(5)
+            send_chunk(ws, execution_id, data, compression, last)
+
+        fake_session.send_chunk = gated_send_chunk
+        with connect_direct(fake_session.uri, stream_results=True) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM t", timeout=0.5)
+            assert [row[0] for row in cursor.fetchmany(10)] == list(range(10))
+            with pytest.raises(QueryTimeoutError):
+                cursor.fetchall()
+            release.set()
+            deadline = time.monotonic() + 5
+            while "cancel" not in fake_session.kinds() and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert fake_session.kinds()[-1] == "cancel"
+            (record,) = conn.query_history
+            assert record.timed_out
+
+    def test_description_does_not_wait_for_stream(self):
+        handlers = []
+
+        def exec_fn(sql, handler, store):
+            handlers.append(handler)
+            return "exec-1"
+
+        cursor = Cursor(exec_fn, MagicMock())
+        cursor.execute("SELECT * FROM t")
+        stream = ResultStream(4)
+        handlers[0](ExecutionResult(stream=stream))
+        # No chunk has been received yet.
+        assert cursor.description is None
+
+        stream.put(encode_arrow(pyarrow.table({"id": [1, 2, 3]})))
+        assert [d[0] for d in cursor.description] == ["id"]
+        stream.finish()
+        assert cursor.fetchall()["id"].tolist() == [1, 2, 3]
+
+    def test_slow_stream_does_not_block_other_cursors(self, fake_session, table):
+        fake_session.chunk_size = 512
+        with connect_direct(fake_session.uri, stream_results=True) as conn:
+            streaming, other = conn.cursor(), conn.cursor()
+            streaming.execute("SELECT * FROM t")
+            assert [row[0] for row in streaming.fetchmany(1)] == [0]
+
+            # The first cursor isn't consuming its stream, which is larger
+            # than its in-memory buffer.
+            other.execute("SELECT * FROM t")
+            assert len(other.fetchall()) == 10_000
+
+            assert len(streaming.fetchall()) == 10_000 - 1
+
+    def test_error_during_stream(self, fake_session, table):
+        send_chunk = fake_session.send_chunk
+
+        def failing_send_chunk(ws, execution_id, data, compression, last):
+            if last:
+                fake_session.send(
+                    ws, kind="error", execution_id=execution_id, message="boom"
+                )
+                return
+            send_chunk(ws, execution_id, data, compression, last)
+
+        fake_session.send_chunk = failing_send_chunk
+        with connect_direct(fake_session.uri, stream_results=True) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM t")
+            with pytest.raises(OperationalError, match="boom"):
+                cursor.fetchall()
@@ -9,16 +9,42 @@ from .errors import (
     OperationalError,
     ProgrammingError,
     NotSupportedError,
+    QueryTimeoutError,
+)
+from .models import (
+    ConnectTimings,
+    ProgressInfo,
+    QueryRecord,
+    QueryStats,
+    ReconnectPolicy,
+    Store,
+    StoreResult,
 )
-from .models import ProgressInfo, Store, StoreResult
 from .region import Region
 from .runtime import Runtime
-from .types import StorageFormat
+from .types import (
+    BINARY,
+    DATETIME,
+    GEOMETRY,
+    NUMBER,
+    ROWID,
+    STRING,
+    StorageFormat,
+)
 
 __all__ = [
+    "BINARY",
+    "DATETIME",
+    "GEOMETRY",
+    "NUMBER",
+    "ROWID",
+    "STRING",
     "Connection",
+    "ConnectTimings",
     "Cursor",
     "ProgressInfo",
+    "QueryRecord",
+    "QueryStats",
     "connect",
     "connect_direct",
     "Error",
@@ -28,6 +54,8 @@ __all__ = [
     "OperationalError",
     "ProgrammingError",
     "NotSupportedError",
+    "QueryTimeoutError",
+    "ReconnectPolicy",
     "Region",
     "Runtime",
     "Store",
@@ -0,0 +1,17 @@
+"""Asyncio interface for Wherobots DB.
+
+Provides the same functionality as :mod:`wherobots.db`, but with coroutine
+methods backed by a single ``websockets.asyncio`` connection, so that many
+concurrent queries can be awaited from one event loop without extra threads.
+"""
+
+from .connection import AsyncConnection
+from .cursor import AsyncCursor
+from .driver import connect_async, connect_direct_async
+
+__all__ = [
+    "AsyncConnection",
+    "AsyncCursor",
+    "connect_async",
+    "connect_direct_async",
+]
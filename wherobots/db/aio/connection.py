@@ -0,0 +1,634 @@
+import asyncio
+import functools
+import json
+import logging
+import textwrap
+import time
+import uuid
+from types import TracebackType
+from typing import Any, Awaitable, Callable, Dict, List
+
+from packaging.version import Version
+import cbor2
+import pandas
+import websockets.asyncio.client
+import websockets.exceptions
+
+from .. import tracing
+from ..cache import DiskResultCache, ResultCache
+from ..compression import AdaptiveCompression
+from ..connection import Query, QueryHistory, reconnect_retry
+from ..constants import (
+    DEFAULT_PROGRESS_MAX_RATE,
+    PROTOCOL_VERSION,
+    QUERY_HISTORY_SIZE,
+    REATTACH_PROTOCOL_VERSION,
+)
+from ..errors import NotSupportedError, OperationalError
+from ..metrics import ConnectionMetrics, MetricsSnapshot
+from ..models import (
+    ConnectTimings,
+    ExecutionResult,
+    ProgressInfo,
+    QueryRecord,
+    ReconnectPolicy,
+    ResultsPayload,
+    Store,
+    StoreResult,
+)
+from ..progress import ProgressDispatcher, ProgressHandler
+from ..recording import TrafficRecorder
+from ..types import (
+    RequestKind,
+    EventKind,
+    ExecutionState,
+    ResultsFormat,
+    DataCompression,
+    GeometryRepresentation,
+)
+from .cursor import AsyncCursor
+
+
+def _check_sync_only(
+    stream_results: bool, result_cache: ResultCache | DiskResultCache | None
+) -> None:
+    """Rejects the features only the synchronous connection supports."""
+    if stream_results:
+        raise NotSupportedError("Streamed results are not supported with asyncio")
+    if result_cache is not None:
+        raise NotSupportedError("Result caching is not supported with asyncio")
+
+
+class AsyncConnection:
+    """Asyncio counterpart of :class:`wherobots.db.Connection`.
+
+    The connection is backed by an asyncio WebSocket connected to the Wherobots
+    SQL session instance. Instead of a background thread, a listener task running
+    on the event loop the connection was created in handles the events from the
+    SQL session and resolves the corresponding cursors' pending results.
+
+    Instances must be created from within a running event loop, usually through
+    :func:`wherobots.db.aio.connect_async`.
+
+    Like its synchronous counterpart, the connection reconnects to the SQL
+    session and reattaches the queries in flight when the WebSocket is lost,
+    if given a ``reconnect`` coroutine function, and records its traffic with a
+    ``recorder``.
+
+    Queries past their timeout are cancelled by a timer task on the event loop,
+    whether or not their results are being awaited.
+
+    Streamed results and the result cache are only supported by the synchronous
+    :class:`wherobots.db.Connection`; asking for either raises
+    :class:`NotSupportedError`.
+    """
+
+    def __init__(
+        self,
+        ws: websockets.asyncio.client.ClientConnection,
+        results_format: ResultsFormat | None = None,
+        data_compression: DataCompression | AdaptiveCompression | None = None,
+        geometry_representation: GeometryRepresentation | None = None,
+        connect_timings: ConnectTimings | None = None,
+        reconnect: Callable[[], Awaitable[websockets.asyncio.client.ClientConnection]]
+        | None = None,
+        reconnect_policy: ReconnectPolicy | None = None,
+        query_timeout: float | None = None,
+        query_history_size: int = QUERY_HISTORY_SIZE,
+        recorder: TrafficRecorder | None = None,
+        progress_max_rate: float | None = DEFAULT_PROGRESS_MAX_RATE,
+        stream_results: bool = False,
+        result_cache: ResultCache | DiskResultCache | None = None,
+        protocol: Version = PROTOCOL_VERSION,
+    ):
+        _check_sync_only(stream_results, result_cache)
+        self.__ws = ws
+        self.__protocol = protocol
+        self.__recorder = recorder
+        self.__results_format = results_format
+        self.__data_compression = data_compression
+        self.__geometry_representation = geometry_representation
+        self.__query_timeout = query_timeout
+        self.__progress_handler: ProgressHandler | None = None
+        self.__progress = ProgressDispatcher(progress_max_rate)
+        self.__connect_timings = connect_timings
+        self.__reconnect_fn = reconnect
+        self.__reconnect_policy = reconnect_policy
+        self.__closing = False
+
+        self.__queries: dict[str, Query] = {}
+        self.__reattach_deadlines: dict[str, float] = {}
+        self.__timeouts: dict[str, asyncio.Task[None]] = {}
+        self.__history = QueryHistory(query_history_size)
+        self.__metrics = ConnectionMetrics()
+        self.__received_at: float | None = None
+        self.__loop = asyncio.get_running_loop()
+        self.__task = self.__loop.create_task(
+            self.__main_loop(), name="wherobots-connection"
+        )
+
+    async def __aenter__(self) -> "AsyncConnection":
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        self.__closing = True
+        await self.__ws.close()
+        await self.__task
+        self.__progress.close()
+
+    @property
+    def connect_timings(self) -> ConnectTimings | None:
+        """The breakdown of the time spent establishing this connection."""
+        return self.__connect_timings
+
+    @property
+    def query_timeout(self) -> float | None:
+        """The default timeout of the queries of this connection's cursors, in seconds."""
+        return self.__query_timeout
+
+    @property
+    def queries_in_flight(self) -> int:
+        """The number of queries of this connection that haven't finished yet."""
+        return len(self.__queries)
+
+    @property
+    def query_history(self) -> List[QueryRecord]:
+        """The metadata of the recently finished queries, from the oldest."""
+        return self.__history.records()
+
+    def metrics(self) -> MetricsSnapshot:
+        """A snapshot of the operational metrics of this connection.
+
+        See :meth:`wherobots.db.Connection.metrics`.
+        """
+        return self.__metrics.snapshot(queries_in_flight=len(self.__queries))
+
+    def query_record(self, execution_id: str) -> QueryRecord | None:
+        """The metadata of an in-flight or recently finished query, if known."""
+        query = self.__queries.get(execution_id)
+        if query is not None:
+            return query.record()
+        return self.__history.get(execution_id)
+
+    def commit(self) -> None:
+        raise NotSupportedError
+
+    def rollback(self) -> None:
+        raise NotSupportedError
+
+    def cursor(self) -> AsyncCursor:
+        return AsyncCursor(
+            self.__execute_sql,
+            self.__cancel_query,
+            geometry_representation=self.__geometry_representation,
+            timeout=self.__query_timeout,
+        )
+
+    def set_progress_handler(self, handler: ProgressHandler | None) -> None:
+        """Register a callback invoked for execution progress events.
+
+        See :meth:`wherobots.db.Connection.set_progress_handler`. The handler is
+        called on the connection's event loop, so it must not block.
+        """
+        self.__progress_handler = handler
+
+    async def __main_loop(self) -> None:
+        """Listener task handling messages from the SQL session."""
+        logging.info("Starting background connection handling task...")
+        while True:
+            try:
+                await self.__listen()
+            except websockets.exceptions.ConnectionClosed:
+                if self.__closing or not await self.__reconnect():
+                    logging.info("Connection closed; stopping main loop.")
+                    break
+                continue
+            except Exception as e:
+                logging.exception("Error handling message from SQL session", exc_info=e)
+            # Reset per message, so that a message that failed before it was
+            # received isn't timed from the previous one.
+            received_at, self.__received_at = self.__received_at, None
+            if received_at is not None:
+                self.__metrics.message_handled(time.perf_counter() - received_at)
+
+        # Nothing will ever resolve the queries still in flight; unblock their
+        # cursors instead of leaving them waiting forever.
+        error = OperationalError(
+            f"Connection to SQL session {'closed' if self.__closing else 'lost'}"
+        )
+        for query in list(self.__queries.values()):
+            query.state = ExecutionState.FAILED
+            self.__retire(query, error)
+            query.notify(ExecutionResult(error=error))
+
+    async def __reconnect(self) -> bool:
+        """Reconnects to the SQL session and reattaches the queries in flight.
+
+        Returns whether the connection was reestablished.
+        """
+        if self.__reconnect_fn is None or self.__reconnect_policy is None:
+            return False
+
+        logging.warning("Lost connection to SQL session; reconnecting...")
+        try:
+            ws = await reconnect_retry(self.__reconnect_policy)(self.__reconnect_fn)()
+        except Exception as e:
+            logging.error("Could not reconnect to SQL session: %s", e)
+            return False
+        if self.__closing:
+            await ws.close()
+            return False
+
+        self.__ws = ws
+        logging.info("Reconnected to SQL session.")
+        timeout = self.__reconnect_policy.reattach_timeout
+        for query in list(self.__queries.values()):
+            if query.state.is_terminal_state():
+                continue
+            try:
+                if query.state in (
+                    ExecutionState.SUCCEEDED,
+                    ExecutionState.RESULTS_REQUESTED,
+                ):
+                    logging.info("Requesting results of %s again.", query.execution_id)
+                    await self.__request_results(query.execution_id)
+                elif self.__protocol < REATTACH_PROTOCOL_VERSION:
+                    raise OperationalError(
+                        f"Running query can't be reattached with protocol {self.__protocol}"
+                    )
+                else:
+                    logging.info("Reattaching to query %s.", query.execution_id)
+                    await self.__send(
+                        {
+                            "kind": RequestKind.REATTACH.value,
+                            "execution_id": query.execution_id,
+                        }
+                    )
+                    self.__reattach_deadlines[query.execution_id] = (
+                        time.monotonic() + timeout
+                    )
+                    asyncio.get_running_loop().call_later(
+                        timeout, self.__expire_reattached
+                    )
+            except Exception as e:
+                logging.exception("Could not reattach query %s", query.execution_id)
+                query.state = ExecutionState.FAILED
+                error = OperationalError(f"Could not reattach query: {e}")
+                self.__retire(query, error)
+                query.notify(ExecutionResult(error=error))
+        return True
+
+    def __expire_reattached(self) -> None:
+        """Fails the reattached queries the SQL session hasn't followed up on."""
+        now = time.monotonic()
+        for execution_id, deadline in list(self.__reattach_deadlines.items()):
+            if now < deadline:
+                continue
+            del self.__reattach_deadlines[execution_id]
+            query = self.__queries.get(execution_id)
+            if query is not None:
+                query.state = ExecutionState.FAILED
+                error = OperationalError("No response to reattaching the query")
+                self.__retire(query, error)
+                query.notify(ExecutionResult(error=error))
+
+    async def __time_out(self, execution_id: str, timeout: float) -> None:
+        """Cancels a query that doesn't complete within ``timeout`` seconds.
+
+        Its cursor is handed a :class:`QueryTimeoutError` right away, rather
+        than the (empty) results of the cancelled query.
+        """
+        await asyncio.sleep(timeout)
+        # Retiring the query must not cancel this task.
+        self.__timeouts.pop(execution_id, None)
+        query = self.__queries.get(execution_id)
+        if query is None:
+            return
+        logging.warning(
+            "Query %s did not complete within %s seconds; cancelling it.",
+            execution_id,
+            timeout,
+        )
+        try:
+            await self.__cancel_query(execution_id)
+        except OperationalError as e:
+            logging.warning("Could not cancel query %s: %s", execution_id, e)
+        if execution_id not in self.__queries:
+            # The query completed while it was being cancelled.
+            return
+        error = query.time_out()
+        self.__metrics.query_timed_out()
+        self.__retire(query, error)
+        query.notify(ExecutionResult(error=error))
+
+    def __dispatch_progress(self, execution_id: str, message: Dict[str, Any]) -> None:
+        """Hands a progress event over to the handlers of its query, if any."""
+        query = self.__queries.get(execution_id)
+        handlers = [
+            handler
+            for handler in (
+                self.__progress_handler,
+                query.progress_handler if query else None,
+            )
+            if handler is not None
+        ]
+        if not handlers:
+            return
+        self.__progress.dispatch(
+            ProgressInfo(
+                execution_id=execution_id,
+                tasks_total=message.get("tasks_total", 0),
+                tasks_completed=message.get("tasks_completed", 0),
+                tasks_active=message.get("tasks_active", 0),
+            ),
+            [functools.partial(self.__deliver_progress, handlers)],
+        )
+        if query is None:
+            # Late progress of a finished query is delivered only once.
+            self.__progress.finish(execution_id)
+
+    def __deliver_progress(
+        self, handlers: List[ProgressHandler], info: ProgressInfo
+    ) -> None:
+        """Hands coalesced progress over from the dispatcher to the event loop."""
+        self.__loop.call_soon_threadsafe(self.__call_progress_handlers, handlers, info)
+
+    @staticmethod
+    def __call_progress_handlers(
+        handlers: List[ProgressHandler], info: ProgressInfo
+    ) -> None:
+        for handler in handlers:
+            try:
+                handler(info)
+            except Exception:
+                logging.exception("Progress handler raised an exception")
+
+    def __retire(
+        self, query: Query, error: Exception | None = None, decoding: bool = False
+    ) -> None:
+        """Stops tracking a finished query, keeping its metadata in the history.
+
+        The query's span is ended once its results are decoded, if they are
+        still ``decoding``.
+        """
+        timer = self.__timeouts.pop(query.execution_id, None)
+        if timer is not None:
+            timer.cancel()
+        if self.__queries.pop(query.execution_id, None) is not None:
+            self.__history.add(query.record(error))
+            self.__metrics.query_finished(query.state)
+            if error is not None:
+                query.stats.error = str(error)
+            if not decoding:
+                tracing.end_query_span(query.stats)
+        self.__progress.finish(query.execution_id)
+
+    async def __listen(self) -> None:
+        """Waits for the next message from the SQL session and processes it."""
+        message = await self.__recv()
+        kind = message.get("kind")
+        execution_id = message.get("execution_id")
+        if not kind or not execution_id:
+            # Invalid event.
+            return
+
+        if kind == EventKind.EXECUTION_PROGRESS:
+            self.__dispatch_progress(execution_id, message)
+            return
+
+        self.__reattach_deadlines.pop(execution_id, None)
+        query = self.__queries.get(execution_id)
+        if not query:
+            logging.warning(
+                "Received %s event for unknown execution ID %s", kind, execution_id
+            )
+            return
+
+        if kind == EventKind.STATE_UPDATED or kind == EventKind.EXECUTION_RESULT:
+            try:
+                query.state = ExecutionState[message["state"].upper()]
+                logging.info("Query %s is now %s.", execution_id, query.state)
+            except KeyError:
+                logging.warning("Invalid state update message for %s", execution_id)
+                return
+
+            if query.state == ExecutionState.SUCCEEDED:
+                if kind == EventKind.STATE_UPDATED:
+                    result_uri = message.get("result_uri")
+                    if result_uri:
+                        query.state = ExecutionState.COMPLETED
+                        self.__retire(query)
+                        query.notify(
+                            ExecutionResult(
+                                store_result=StoreResult(
+                                    result_uri=result_uri,
+                                    size=message.get("size"),
+                                )
+                            )
+                        )
+                        return
+
+                    if query.store is not None:
+                        query.state = ExecutionState.COMPLETED
+                        self.__retire(query)
+                        query.notify(ExecutionResult())
+                        return
+
+                    query.result_size = message.get("size")
+                    await self.__request_results(execution_id)
+                    return
+
+                results = message.get("results")
+                query.state = ExecutionState.COMPLETED
+                if not results or not isinstance(results, dict):
+                    logging.warning("Got no results back from %s.", execution_id)
+                    self.__retire(query)
+                    query.notify(ExecutionResult())
+                    return
+                self.__retire(query, decoding=True)
+
+                compression = results.get("compression")
+                result_bytes = results.get("result_bytes") or b""
+                self.__metrics.results_received(
+                    results.get("format"), compression, len(result_bytes)
+                )
+                observe = None
+                if (
+                    isinstance(self.__data_compression, AdaptiveCompression)
+                    and compression
+                ):
+                    observe = functools.partial(
+                        self.__data_compression.observe,
+                        compression,
+                        len(result_bytes),
+                    )
+                stats = query.stats
+
+                def on_decoded(size: int, seconds: float) -> None:
+                    self.__metrics.decoded(seconds)
+                    if observe is not None:
+                        observe(size, seconds)
+                    # The span of the query covers the decoding of its results.
+                    tracing.end_query_span(stats)
+
+                query.stats.bytes_received += len(result_bytes)
+                query.stats.frames_received += 1
+                query.stats.format = results.get("format")
+                query.stats.compression = compression
+                query.notify(
+                    ExecutionResult(
+                        payload=ResultsPayload(
+                            result_bytes=result_bytes,
+                            format=results.get("format"),
+                            compression=compression,
+                            on_decoded=on_decoded,
+                            stats=query.stats,
+                        )
+                    )
+                )
+            elif query.state == ExecutionState.CANCELLED:
+                logging.info(
+                    "Query %s has been cancelled; returning empty results.",
+                    execution_id,
+                )
+                query.notify(ExecutionResult(results=pandas.DataFrame()))
+                self.__retire(query)
+        elif kind == EventKind.ERROR:
+            query.state = ExecutionState.FAILED
+            error = OperationalError(message.get("message"))
+            self.__retire(query, error)
+            query.notify(ExecutionResult(error=error))
+        else:
+            logging.warning("Received unknown %s event!", kind)
+
+    async def __send(self, message: Dict[str, Any]) -> None:
+        request = json.dumps(message)
+        logging.debug("Request: %s", request)
+        try:
+            await self.__ws.send(request)
+        except websockets.exceptions.ConnectionClosed as e:
+            raise OperationalError("Connection to SQL session lost") from e
+        if self.__recorder is not None:
+            self.__recorder.sent(message, len(request))
+
+    async def __recv(self) -> Dict[str, Any]:
+        frame = await self.__ws.recv()
+        self.__received_at = received_at = time.perf_counter()
+        message: Dict[str, Any]
+        if isinstance(frame, str):
+            encoding = "json"
+            message = json.loads(frame)
+        elif isinstance(frame, bytes):
+            encoding = "cbor"
+            message = cbor2.loads(frame)
+        else:
+            raise ValueError("Unexpected frame type received")
+        self.__metrics.frame_received(encoding, len(frame))
+        if self.__recorder is not None:
+            self.__recorder.received(message, encoding, len(frame), received_at)
+        return message
+
+    async def __execute_sql(
+        self,
+        sql: str,
+        handler: Callable[[Any], None],
+        store: Store | None = None,
+        progress_handler: ProgressHandler | None = None,
+        timeout: float | None = None,
+    ) -> str:
+        """Triggers the execution of the given SQL query.
+
+        The query is cancelled if it doesn't complete within ``timeout`` seconds.
+        """
+        execution_id = str(uuid.uuid4())
+        request = {
+            "kind": RequestKind.EXECUTE_SQL.value,
+            "execution_id": execution_id,
+            "statement": sql,
+        }
+
+        if self.__progress_handler is not None or progress_handler is not None:
+            request["enable_progress_events"] = True
+
+        if store:
+            request["store"] = store.to_dict()
+
+        query = Query(
+            sql=sql,
+            execution_id=execution_id,
+            state=ExecutionState.EXECUTION_REQUESTED,
+            handler=handler,
+            store=store,
+            progress_handler=progress_handler,
+            timeout=timeout,
+        )
+        query.stats.span = tracing.start_query_span(execution_id, sql)
+        context = tracing.trace_context(query.stats.span)
+        if context:
+            request["trace_context"] = context
+        self.__queries[execution_id] = query
+        if timeout is not None:
+            self.__timeouts[execution_id] = self.__loop.create_task(
+                self.__time_out(execution_id, timeout)
+            )
+        self.__metrics.query_started()
+
+        logging.info(
+            "Executing SQL query %s: %s", execution_id, textwrap.shorten(sql, width=60)
+        )
+        try:
+            await self.__send(request)
+        except OperationalError as e:
+            timer = self.__timeouts.pop(execution_id, None)
+            if timer is not None:
+                timer.cancel()
+            self.__queries.pop(execution_id, None)
+            self.__metrics.query_finished(ExecutionState.FAILED)
+            query.stats.error = str(e)
+            tracing.end_query_span(query.stats)
+            raise
+        return execution_id
+
+    async def __request_results(self, execution_id: str) -> None:
+        query = self.__queries.get(execution_id)
+        if not query:
+            return
+
+        request = {
+            "kind": RequestKind.RETRIEVE_RESULTS.value,
+            "execution_id": execution_id,
+        }
+        if self.__results_format:
+            request["format"] = self.__results_format.value
+        compression = self.__data_compression
+        if isinstance(compression, AdaptiveCompression):
+            compression = compression.select(query.result_size)
+        if compression:
+            request["compression"] = compression.value
+        if self.__geometry_representation:
+            request["geometry"] = self.__geometry_representation.value
+
+        query.state = ExecutionState.RESULTS_REQUESTED
+        logging.info("Requesting results from %s ...", execution_id)
+        await self.__send(request)
+
+    async def __cancel_query(self, execution_id: str) -> None:
+        """Cancels the query with the given execution ID."""
+        query = self.__queries.get(execution_id)
+        if not query or query.state.is_terminal_state():
+            return
+
+        request = {
+            "kind": RequestKind.CANCEL.value,
+            "execution_id": execution_id,
+        }
+        logging.info("Cancelling query %s...", execution_id)
+        await self.__send(request)
@@ -0,0 +1,366 @@
+import asyncio
+from types import TracebackType
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Tuple
+
+import pandas
+import pyarrow
+
+from ..constants import MAX_STATEMENT_SIZE
+from ..cursor import (
+    _affected_rows,
+    _coalesce_statements,
+    _describe_schema,
+    _substitute_parameters,
+    _to_pandas,
+)
+from ..errors import NotSupportedError, ProgrammingError
+from ..geometry import to_geoarrow, to_geodataframe
+from ..models import ExecutionResult, QueryStats, Store, StoreResult
+from ..progress import ProgressHandler
+from ..results import ArrowResults, decode_results, peek_schema
+from ..types import GeometryRepresentation
+
+# Called with the SQL, the result handler, the store and, if any, a progress_handler
+# and a timeout.
+ExecuteFn = Callable[..., Awaitable[str]]
+CancelFn = Callable[[str], Awaitable[None]]
+
+
+class AsyncCursor:
+    """Asyncio counterpart of :class:`wherobots.db.Cursor`.
+
+    Every operation that waits on the SQL session is a coroutine. Each execution
+    is tracked by its own future, resolved by the connection's listener task.
+    """
+
+    def __init__(
+        self,
+        exec_fn: ExecuteFn,
+        cancel_fn: CancelFn,
+        geometry_representation: GeometryRepresentation | None = None,
+        timeout: float | None = None,
+    ) -> None:
+        self.__exec_fn = exec_fn
+        self.__cancel_fn = cancel_fn
+        self.__geometry_representation = geometry_representation
+        self.__timeout = timeout
+        self.__progress_handler: ProgressHandler | None = None
+
+        self.__future: asyncio.Future[Any] | None = None
+        self.__results: ArrowResults | List[Any] | None = None
+        self.__store_result: StoreResult | None = None
+        self.__current_execution_id: str | None = None
+        self.__current_row: int = 0
+
+        # Description and row count are set by the last executed operation.
+        # Their default values are defined by PEP-0249.
+        self.__description: List[Tuple[Any, ...]] | None = None
+        self.__rowcount: int = -1
+
+        # Array-size is also defined by PEP-0249 and is expected to be read/writable.
+        self.arraysize: int = 1
+
+    @property
+    def description(self) -> List[Tuple[Any, ...]] | None:
+        """The PEP-0249 description of the columns of the results.
+
+        See :attr:`wherobots.db.Cursor.description`: it is available as soon as
+        the results have been received, before they are fetched, and reading it
+        never waits.
+        """
+        if self.__description is None:
+            self.__description = _describe_schema(self.__schema())
+        return self.__description
+
+    def __schema(self) -> pyarrow.Schema | None:
+        """The Arrow schema of the results, if received, without decoding them."""
+        if isinstance(self.__results, ArrowResults):
+            return self.__results.schema
+        future = self.__future
+        if future is None or not future.done() or future.cancelled():
+            return None
+        result = future.result()
+        if not isinstance(result, ExecutionResult) or result.error:
+            return None
+        if result.payload is not None:
+            return peek_schema(result.payload)
+        if isinstance(result.results, pandas.DataFrame):
+            return pyarrow.Schema.from_pandas(result.results, preserve_index=False)
+        return None
+
+    @property
+    def rowcount(self) -> int:
+        if self.__rowcount < 0 and isinstance(self.__results, ArrowResults):
+            num_rows = self.__results.num_rows
+            return num_rows if num_rows is not None else -1
+        return self.__rowcount
+
+    @property
+    def last_query_stats(self) -> QueryStats | None:
+        """The timings and sizes of the execution of the last query.
+
+        See :attr:`wherobots.db.Cursor.last_query_stats`.
+        """
+        future = self.__future
+        if future is None or not future.done() or future.cancelled():
+            return None
+        result = future.result()
+        return result.stats if isinstance(result, ExecutionResult) else None
+
+    async def __get_results(self) -> ArrowResults | List[Any] | None:
+        execution_id, future = self.__current_execution_id, self.__future
+        if not execution_id or future is None:
+            raise ProgrammingError("No query has been executed yet")
+        if self.__results is not None:
+            return self.__results
+
+        # The connection resolves the future with a QueryTimeoutError if the
+        # query doesn't complete within its timeout.
+        execution_result = await future
+        if not isinstance(execution_result, ExecutionResult):
+            raise ProgrammingError("Unexpected result type")
+
+        if execution_result.error:
+            raise execution_result.error
+
+        self.__store_result = execution_result.store_result
+        results: Any = execution_result.results
+        if execution_result.payload is not None:
+            # Decode off the event loop so large results don't stall other tasks.
+            results = await asyncio.to_thread(decode_results, execution_result.payload)
+
+        # Results is None when results are stored in cloud storage
+        if results is None:
+            return None
+
+        if isinstance(results, pandas.DataFrame):
+            results = ArrowResults(
+                table=pyarrow.Table.from_pandas(results, preserve_index=False)
+            )
+        if not isinstance(results, ArrowResults):
+            self.__rowcount = len(results)
+        self.__results = results
+        return self.__results
+
+    async def __get_rows(self) -> ArrowResults | List[Any]:
+        """The results of the current query, which must have returned some."""
+        results = await self.__get_results()
+        if results is None:
+            raise ProgrammingError("The last query did not return any results")
+        return results
+
+    async def execute(
+        self,
+        operation: str,
+        parameters: Dict[str, Any] | None = None,
+        store: Store | None = None,
+        timeout: float | None = None,
+        progress_handler: ProgressHandler | None = None,
+    ) -> None:
+        """Execute an operation, binding the given parameters.
+
+        See :meth:`wherobots.db.Cursor.execute`.
+        """
+        if (
+            self.__current_execution_id
+            and self.__future is not None
+            and not self.__future.done()
+        ):
+            await self.__cancel_fn(self.__current_execution_id)
+
+        self.__results = None
+        self.__store_result = None
+        self.__current_row = 0
+        self.__rowcount = -1
+        self.__description = None
+
+        timeout = timeout if timeout is not None else self.__timeout
+        future = asyncio.get_running_loop().create_future()
+
+        def handler(result: Any) -> None:
+            if not future.done():
+                future.set_result(result)
+
+        self.__future = future
+        progress_handler = progress_handler or self.__progress_handler
+        self.__current_execution_id = await self.__exec_fn(
+            _substitute_parameters(operation, parameters),
+            handler,
+            store,
+            **({"progress_handler": progress_handler} if progress_handler else {}),
+            **({"timeout": timeout} if timeout is not None else {}),
+        )
+
+    def set_progress_handler(self, handler: ProgressHandler | None) -> None:
+        """Register a callback invoked for the progress of this cursor's queries.
+
+        See :meth:`wherobots.db.Cursor.set_progress_handler`.
+        """
+        self.__progress_handler = handler
+
+    async def get_store_result(self) -> StoreResult | None:
+        """Get the store result for the last executed query.
+
+        See :meth:`wherobots.db.Cursor.get_store_result`.
+        """
+        await self.__get_results()
+        return self.__store_result
+
+    async def executemany(
+        self,
+        operation: str,
+        seq_of_parameters: Iterable[Dict[str, Any]],
+        max_statement_size: int = MAX_STATEMENT_SIZE,
+    ) -> None:
+        """Execute an operation for each of the given parameter sets.
+
+        See :meth:`wherobots.db.Cursor.executemany`.
+        """
+        total: int | None = 0
+        for statement, inserted in _coalesce_statements(
+            operation, seq_of_parameters, max_statement_size
+        ):
+            await self.execute(statement)
+            affected = _affected_rows(await self.__get_results(), inserted)
+            total = None if total is None or affected is None else total + affected
+        self.__rowcount = total if total is not None else -1
+
+    @property
+    def rownumber(self) -> int | None:
+        """The 0-based index of the next row to be fetched (PEP-0249 extension)."""
+        if isinstance(self.__results, ArrowResults):
+            return self.__results.position
+        if self.__results is not None:
+            return self.__current_row
+        return None
+
+    async def scroll(self, value: int, mode: str = "relative") -> None:
+        """Move to another row of the results (PEP-0249 extension).
+
+        See :meth:`wherobots.db.Cursor.scroll`.
+        """
+        results = await self.__get_rows()
+        if mode == "relative":
+            position = (self.rownumber or 0) + value
+        elif mode == "absolute":
+            position = value
+        else:
+            raise ProgrammingError(f"Invalid scroll mode {mode!r}")
+
+        if isinstance(results, ArrowResults):
+            results.seek(position)
+        elif 0 <= position <= len(results):
+            self.__current_row = position
+        else:
+            raise IndexError(f"Row position {position} is out of range")
+
+    async def fetchone(self) -> Any:
+        """Fetch the next row of the results as a tuple, or None at the end."""
+        results = await self.__get_rows()
+        if isinstance(results, ArrowResults):
+            return results.next_row()
+
+        results = results[self.__current_row :]
+        if len(results) == 0:
+            return None
+        self.__current_row += 1
+        return results[0]
+
+    async def fetchmany(self, size: int | None = None) -> List[Any]:
+        """Fetch the next ``size`` rows (``arraysize`` by default) as tuples."""
+        size = size or self.arraysize
+        results = await self.__get_rows()
+        if isinstance(results, ArrowResults):
+            return results.rows(size)
+
+        results = results[self.__current_row : self.__current_row + size]
+        self.__current_row += len(results)
+        return results
+
+    async def fetchall(self) -> Any:
+        """Fetch all remaining rows of the results as a pandas DataFrame."""
+        results = await self.__get_rows()
+        if isinstance(results, ArrowResults):
+            return _to_pandas(results.take(), self.last_query_stats)
+
+        return results[self.__current_row :]
+
+    async def fetch_arrow_table(self) -> pyarrow.Table:
+        """Fetch all remaining rows of the results as a ``pyarrow.Table``.
+
+        See :meth:`wherobots.db.Cursor.fetch_arrow_table`.
+        """
+        results = await self.__get_results()
+        if not isinstance(results, ArrowResults):
+            raise NotSupportedError("Results are not in Arrow format")
+        return results.take()
+
+    async def fetch_record_batches(self) -> pyarrow.RecordBatchReader:
+        """Fetch the remaining rows of the results as a stream of record batches.
+
+        See :meth:`wherobots.db.Cursor.fetch_record_batches`.
+        """
+        results = await self.__get_results()
+        if not isinstance(results, ArrowResults):
+            raise NotSupportedError("Results are not in Arrow format")
+        return results.to_reader()
+
+    async def fetch_geoarrow(
+        self, geometry_columns: List[str] | None = None
+    ) -> pyarrow.Table:
+        """Fetch all remaining rows as a ``pyarrow.Table`` of GeoArrow geometries.
+
+        See :meth:`wherobots.db.Cursor.fetch_geoarrow`.
+        """
+        return to_geoarrow(
+            await self.fetch_arrow_table(),
+            self.__geometry_representation,
+            geometry_columns,
+        )
+
+    async def fetch_geodataframe(
+        self,
+        geometry_columns: List[str] | None = None,
+        geometry: str | None = None,
+    ) -> Any:
+        """Fetch all remaining rows as a ``geopandas.GeoDataFrame``.
+
+        See :meth:`wherobots.db.Cursor.fetch_geodataframe`. The conversion runs
+        in a worker thread.
+        """
+        return await asyncio.to_thread(
+            to_geodataframe,
+            await self.fetch_arrow_table(),
+            self.__geometry_representation,
+            geometry_columns,
+            geometry,
+        )
+
+    async def close(self) -> None:
+        """Close the cursor, cancelling its query if it is still running."""
+        if (
+            self.__current_execution_id
+            and self.__future is not None
+            and not self.__future.done()
+        ):
+            await self.__cancel_fn(self.__current_execution_id)
+
+    def __aiter__(self) -> "AsyncCursor":
+        return self
+
+    async def __anext__(self) -> Any:
+        row = await self.fetchone()
+        if row is None:
+            raise StopAsyncIteration
+        return row
+
+    async def __aenter__(self) -> "AsyncCursor":
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        await self.close()
@@ -0,0 +1,255 @@
+"""Asyncio Wherobots DB driver.
+
+Mirrors :func:`wherobots.db.connect` and :func:`wherobots.db.connect_direct`.
+"""
+
+import asyncio
+import functools
+import logging
+import time
+from typing import Dict, Union
+
+from packaging.version import Version
+import websockets.asyncio.client
+
+from ..constants import (
+    DEFAULT_CONNECT_TIMEOUT_SECONDS,
+    DEFAULT_ENDPOINT,
+    DEFAULT_PROGRESS_MAX_RATE,
+    DEFAULT_SESSION_WAIT_TIMEOUT_SECONDS,
+    MAX_MESSAGE_SIZE,
+    PROTOCOL_VERSION,
+)
+from ..cache import DiskResultCache, ResultCache
+from ..compression import AdaptiveCompression
+from ..driver import (
+    PerMessageDeflate,
+    auth_headers,
+    create_session,
+    http_session,
+    http_to_ws,
+    open_socket,
+    resolve_session_cache,
+    session_status_retry,
+    session_uri_from_status,
+    ssl_context,
+    websocket_compression,
+)
+from ..errors import InterfaceError
+from ..models import ConnectTimings, ReconnectPolicy
+from ..recording import TrafficRecorder
+from ..region import Region
+from ..runtime import Runtime
+from ..session_cache import SessionCache
+from ..session_type import SessionType
+from ..types import DataCompression, GeometryRepresentation, ResultsFormat
+from .connection import AsyncConnection, _check_sync_only
+
+
+async def connect_async(
+    host: str = DEFAULT_ENDPOINT,
+    token: Union[str, None] = None,
+    api_key: Union[str, None] = None,
+    runtime: Union[Runtime, None] = None,
+    region: Union[Region, None] = None,
+    version: Union[str, None] = None,
+    wait_timeout: float = DEFAULT_SESSION_WAIT_TIMEOUT_SECONDS,
+    session_type: Union[SessionType, None] = None,
+    force_new: bool = False,
+    shutdown_after_inactive_seconds: Union[int, None] = None,
+    results_format: Union[ResultsFormat, None] = None,
+    data_compression: Union[DataCompression, AdaptiveCompression, None] = None,
+    geometry_representation: Union[GeometryRepresentation, None] = None,
+    session_cache: Union[SessionCache, bool, None] = None,
+    reconnect: Union[ReconnectPolicy, None] = None,
+    permessage_deflate: PerMessageDeflate = True,
+    query_timeout: Union[float, None] = None,
+    recorder: Union[TrafficRecorder, None] = None,
+    progress_max_rate: Union[float, None] = DEFAULT_PROGRESS_MAX_RATE,
+    stream_results: bool = False,
+    result_cache: Union[ResultCache, DiskResultCache, None] = None,
+) -> AsyncConnection:
+    """Creates or attaches to a SQL session and connects to it.
+
+    The HTTP requests to the Wherobots API are run off the event loop, and the
+    polling of the session status until it is ready waits with ``asyncio.sleep``,
+    so that connecting never blocks other tasks.
+    """
+    started = time.perf_counter()
+    timings = ConnectTimings()
+    headers = auth_headers(token, api_key)
+
+    async def connect_to(uri: str, open_timeout: float) -> AsyncConnection:
+        conn = await connect_direct_async(
+            uri=uri,
+            headers=headers,
+            results_format=results_format,
+            data_compression=data_compression,
+            geometry_representation=geometry_representation,
+            open_timeout=open_timeout,
+            timings=timings,
+            reconnect=reconnect,
+            permessage_deflate=permessage_deflate,
+            query_timeout=query_timeout,
+            recorder=recorder,
+            progress_max_rate=progress_max_rate,
+            stream_results=stream_results,
+            result_cache=result_cache,
+        )
+        timings.total = time.perf_counter() - started
+        logging.info("Connected to SQL session: %s", timings)
+        return conn
+
+    cache = resolve_session_cache(session_cache)
+    cache_key = None
+    if cache:
+        cache_key = cache.key(
+            host, token or api_key or "", runtime, region, version, session_type
+        )
+        cached_uri = None if force_new else cache.get(cache_key)
+        if cached_uri:
+            try:
+                timings.session_cache_hit = True
+                return await connect_to(cached_uri, cache.connect_timeout)
+            except InterfaceError:
+                logging.info("Cached SQL session is unavailable; reconnecting.")
+                timings = ConnectTimings()
+                cache.invalidate(cache_key)
+
+    start = time.perf_counter()
+    session_id_url = await asyncio.to_thread(
+        create_session,
+        host=host,
+        headers=headers,
+        runtime=runtime,
+        region=region,
+        version=version,
+        session_type=session_type,
+        force_new=force_new,
+        shutdown_after_inactive_seconds=shutdown_after_inactive_seconds,
+    )
+    timings.create_session = time.perf_counter() - start
+
+    @session_status_retry(wait_timeout)
+    async def get_session_uri() -> str:
+        poll_start = time.perf_counter()
+        # Sessions are per thread: get the worker thread's own.
+        r = await asyncio.to_thread(
+            lambda: http_session().get(session_id_url, headers=headers)
+        )
+        timings.session_polls.append(time.perf_counter() - poll_start)
+        r.raise_for_status()
+        return session_uri_from_status(r.json())
+
+    try:
+        logging.info("Getting SQL session status from %s ...", session_id_url)
+        start = time.perf_counter()
+        session_uri = await get_session_uri()
+        timings.session_wait = time.perf_counter() - start
+        logging.debug("SQL session URI from app status: %s", session_uri)
+    except Exception as e:
+        raise InterfaceError("Could not acquire SQL session!", e)
+
+    conn = await connect_to(http_to_ws(session_uri), DEFAULT_CONNECT_TIMEOUT_SECONDS)
+    if cache and cache_key:
+        cache.put(cache_key, http_to_ws(session_uri))
+    return conn
+
+
+async def connect_direct_async(
+    uri: str,
+    protocol: Version = PROTOCOL_VERSION,
+    headers: Union[Dict[str, str], None] = None,
+    results_format: Union[ResultsFormat, None] = None,
+    data_compression: Union[DataCompression, AdaptiveCompression, None] = None,
+    geometry_representation: Union[GeometryRepresentation, None] = None,
+    open_timeout: Union[float, None] = DEFAULT_CONNECT_TIMEOUT_SECONDS,
+    timings: Union[ConnectTimings, None] = None,
+    reconnect: Union[ReconnectPolicy, None] = None,
+    permessage_deflate: PerMessageDeflate = True,
+    query_timeout: Union[float, None] = None,
+    recorder: Union[TrafficRecorder, None] = None,
+    progress_max_rate: Union[float, None] = DEFAULT_PROGRESS_MAX_RATE,
+    stream_results: bool = False,
+    result_cache: Union[ResultCache, DiskResultCache, None] = None,
+) -> AsyncConnection:
+    """Connects to the SQL session at the given WebSocket URI.
+
+    The time spent connecting is recorded in ``timings``, when given, and
+    available as the connection's ``connect_timings``.
+
+    If the connection is lost, it is reestablished following the ``reconnect``
+    policy, when given. Running queries are only reattached if the SQL session
+    speaks a ``protocol`` supporting it (``REATTACH_PROTOCOL_VERSION``);
+    otherwise they fail with an :class:`OperationalError`.
+
+    The traffic of the connection is recorded with ``recorder``, when given.
+
+    Streamed results and the result cache are not supported with asyncio:
+    ``stream_results`` and ``result_cache`` raise :class:`NotSupportedError`.
+    """
+    _check_sync_only(stream_results, result_cache)
+    uri_with_protocol = f"{uri}/{protocol}"
+    started = time.perf_counter()
+    if timings is None:
+        timings = ConnectTimings()
+
+    ws = await open_websocket_async(
+        uri_with_protocol, headers, open_timeout, timings, permessage_deflate
+    )
+    timings.total = time.perf_counter() - started
+
+    return AsyncConnection(
+        ws,
+        results_format=results_format,
+        data_compression=data_compression,
+        geometry_representation=geometry_representation,
+        connect_timings=timings,
+        reconnect=functools.partial(
+            open_websocket_async,
+            uri_with_protocol,
+            headers,
+            open_timeout,
+            permessage_deflate=permessage_deflate,
+        ),
+        reconnect_policy=reconnect,
+        query_timeout=query_timeout,
+        recorder=recorder,
+        progress_max_rate=progress_max_rate,
+        protocol=protocol,
+        stream_results=stream_results,
+        result_cache=result_cache,
+    )
+
+
+async def open_websocket_async(
+    uri: str,
+    headers: Union[Dict[str, str], None],
+    open_timeout: Union[float, None],
+    timings: Union[ConnectTimings, None] = None,
+    permessage_deflate: PerMessageDeflate = True,
+) -> websockets.asyncio.client.ClientConnection:
+    """Opens the WebSocket to the SQL session at the given URI."""
+    if timings is None:
+        timings = ConnectTimings()
+
+    sock = None
+    try:
+        logging.info("Connecting to SQL session at %s ...", uri)
+        sock = await asyncio.to_thread(open_socket, uri, open_timeout, timings)
+        start = time.perf_counter()
+        ws = await websockets.asyncio.client.connect(
+            uri=uri,
+            additional_headers=headers,
+            max_size=MAX_MESSAGE_SIZE,
+            ssl=ssl_context(uri),
+            open_timeout=open_timeout,
+            sock=sock,
+            **websocket_compression(permessage_deflate),
+        )
+        timings.websocket_handshake = time.perf_counter() - start
+    except Exception as e:
+        if sock is not None:
+            sock.close()
+        raise InterfaceError("Failed to connect to SQL session!") from e
+    return ws
@@ -0,0 +1,379 @@
+"""Caching of query results.
+
+Applications such as dashboards often issue the same queries repeatedly, on
+data that changes much less frequently than it is queried. A
+:class:`ResultCache` attached to a connection serves the Arrow results of
+repeated queries from memory, without executing them on the SQL session. A
+:class:`DiskResultCache` keeps them on disk instead, where they outlive the
+process and can be shared by all the processes of a host.
+"""
+
+import collections
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Hashable, List, Tuple, Union
+
+import pyarrow
+import pyarrow.ipc
+
+from .constants import (
+    DEFAULT_DISK_RESULT_CACHE_MAX_BYTES,
+    DEFAULT_RESULT_CACHE_MAX_BYTES,
+    DEFAULT_RESULT_CACHE_TTL_SECONDS,
+)
+from .session_cache import cache_home
+
+
+# Leading comments and parentheses, before the first keyword of a statement.
+_PREFIX_RE = re.compile(r"(?:\s+|--[^\n]*|/\*.*?\*/|\()*", re.DOTALL)
+_READ_ONLY_RE = re.compile(r"(?:SELECT|WITH|SHOW|DESCRIBE|DESC)\b", re.IGNORECASE)
+_WRITE_RE = re.compile(
+    r"\b(?:INSERT|UPDATE|DELETE|MERGE|CREATE|DROP|ALTER|TRUNCATE|CACHE|"
+    r"UNCACHE|REFRESH|SET|RESET|USE|GRANT|REVOKE|LOAD|MSCK|ANALYZE)\b",
+    re.IGNORECASE,
+)
+
+
+def cache_scope(*parts: Any) -> str:
+    """A fingerprint of the session and credentials that results belong to.
+
+    Made part of the cache keys of results, so that connections with other
+    credentials, or to other sessions, never see each other's results.
+    """
+    return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()
+
+
+def is_read_only(sql: str) -> bool:
+    """Whether the results of the given statement can be cached.
+
+    Only single ``SELECT``, ``WITH ... SELECT``, ``SHOW`` and ``DESCRIBE``
+    statements are considered read-only; a ``WITH`` statement mentioning a
+    write operation anywhere, or any statement followed by another, is not.
+    """
+    statement = sql.strip().rstrip(";")
+    if ";" in statement:
+        return False
+    prefix = _PREFIX_RE.match(statement)
+    start = prefix.end() if prefix else 0
+    match = _READ_ONLY_RE.match(statement, start)
+    if match is None:
+        return False
+    if match.group(0).upper() == "WITH":
+        return _WRITE_RE.search(statement, match.end()) is None
+    return True
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    """A snapshot of the state and statistics of a result cache.
+
+    Attributes:
+        hits: The number of lookups served with fresh results.
+        stale_hits: The number of lookups served with stale results.
+        misses: The number of lookups that found no usable results.
+        evictions: The number of entries evicted to stay within the byte budget.
+        expirations: The number of entries dropped after they expired.
+        entries: The number of entries in the cache.
+        size: The total size of the cached results, in bytes.
+    """
+
+    hits: int
+    stale_hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    entries: int
+    size: int
+
+
+@dataclass(frozen=True)
+class _Entry:
+    table: pyarrow.Table
+    stored_at: float
+    ttl: float
+
+
+class ResultCache:
+    """A thread-safe, in-memory cache of Arrow query results.
+
+    Results are kept for ``ttl`` seconds, within a budget of ``max_bytes``
+    bytes: when storing new results would exceed it, the least recently used
+    entries are evicted. Results larger than the whole budget are not cached.
+
+    With a ``stale_ttl``, expired results remain usable for that many more
+    seconds: they are returned as stale, so that the caller can use them right
+    away while refreshing them in the background (stale-while-revalidate).
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_RESULT_CACHE_MAX_BYTES,
+        ttl: float = DEFAULT_RESULT_CACHE_TTL_SECONDS,
+        stale_ttl: float = 0,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+
+        self.__lock = threading.Lock()
+        self.__entries: collections.OrderedDict[Hashable, _Entry] = (
+            collections.OrderedDict()
+        )
+        self.__size = 0
+
+        self.__hits = 0
+        self.__stale_hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+        self.__expirations = 0
+
+    def __remove(self, key: Hashable) -> None:
+        entry = self.__entries.pop(key)
+        self.__size -= entry.table.nbytes
+
+    def get(self, key: Hashable) -> Tuple[pyarrow.Table, bool] | None:
+        """Looks up the results for the given key.
+
+        Returns the cached table and whether it is still fresh, or None when
+        there are no results, or only expired ones, for this key.
+        """
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                self.__misses += 1
+                return None
+
+            age = time.monotonic() - entry.stored_at
+            if age > entry.ttl + self.stale_ttl:
+                self.__remove(key)
+                self.__expirations += 1
+                self.__misses += 1
+                return None
+
+            self.__entries.move_to_end(key)
+            fresh = age <= entry.ttl
+            if fresh:
+                self.__hits += 1
+            else:
+                self.__stale_hits += 1
+            return entry.table, fresh
+
+    def put(
+        self, key: Hashable, table: pyarrow.Table, ttl: float | None = None
+    ) -> None:
+        """Stores the results for the given key, for ``ttl`` seconds if given."""
+        nbytes = table.nbytes
+        with self.__lock:
+            if key in self.__entries:
+                self.__remove(key)
+            if nbytes > self.max_bytes:
+                return
+            while self.__entries and self.__size + nbytes > self.max_bytes:
+                self.__remove(next(iter(self.__entries)))
+                self.__evictions += 1
+            self.__entries[key] = _Entry(
+                table=table,
+                stored_at=time.monotonic(),
+                ttl=self.ttl if ttl is None else ttl,
+            )
+            self.__size += nbytes
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drops the results for the given key, if any."""
+        with self.__lock:
+            if key in self.__entries:
+                self.__remove(key)
+
+    def clear(self) -> None:
+        """Drops all cached results."""
+        with self.__lock:
+            self.__entries.clear()
+            self.__size = 0
+
+    def stats(self) -> CacheStats:
+        """Returns a snapshot of the cache's state and statistics."""
+        with self.__lock:
+            return CacheStats(
+                hits=self.__hits,
+                stale_hits=self.__stale_hits,
+                misses=self.__misses,
+                evictions=self.__evictions,
+                expirations=self.__expirations,
+                entries=len(self.__entries),
+                size=self.__size,
+            )
+
+
+class DiskResultCache:
+    """A cache of Arrow query results on disk, shared by concurrent processes.
+
+    Each result is written as an uncompressed Arrow IPC file in ``directory``
+    and read back through a memory map, so that hits don't copy the results
+    into memory. The interface and the expiration of results are the same as
+    :class:`ResultCache`'s.
+
+    The files are at most ``max_bytes`` in total; when storing new results
+    would exceed it, the least recently used ones are deleted. Files are
+    written under a temporary name and atomically renamed, so processes never
+    see partially written results. Their modification time holds their
+    expiration time, and their access time is updated on every hit.
+
+    Statistics are those of the current process, except for the number of
+    entries and their size.
+
+    The directory and the files in it are only accessible to their owner.
+    """
+
+    SUFFIX = ".arrow"
+
+    def __init__(
+        self,
+        directory: Union[str, os.PathLike[str], None] = None,
+        max_bytes: int = DEFAULT_DISK_RESULT_CACHE_MAX_BYTES,
+        ttl: float = DEFAULT_RESULT_CACHE_TTL_SECONDS,
+        stale_ttl: float = 0,
+    ) -> None:
+        self.directory = (
+            Path(directory) if directory is not None else cache_home() / "results"
+        )
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+
+        self.__lock = threading.Lock()
+        self.__hits = 0
+        self.__stale_hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+        self.__expirations = 0
+
+    def __path(self, key: Hashable) -> Path:
+        digest = hashlib.sha256(json.dumps(key).encode("utf-8")).hexdigest()
+        return self.directory / f"{digest}{self.SUFFIX}"
+
+    def __files(self) -> List[Tuple[Path, os.stat_result]]:
+        files = []
+        try:
+            for path in self.directory.glob(f"*{self.SUFFIX}"):
+                try:
+                    files.append((path, path.stat()))
+                except FileNotFoundError:
+                    pass  # Deleted by another process.
+        except OSError:
+            pass
+        return files
+
+    def get(self, key: Hashable) -> Tuple[pyarrow.Table, bool] | None:
+        """Looks up the results for the given key.
+
+        Returns the cached table and whether it is still fresh, or None when
+        there are no results, or only expired ones, for this key.
+        """
+        path = self.__path(key)
+        now = time.time()
+        try:
+            expires_at = path.stat().st_mtime
+            if now > expires_at + self.stale_ttl:
+                path.unlink()
+                with self.__lock:
+                    self.__expirations += 1
+                    self.__misses += 1
+                return None
+            with pyarrow.ipc.open_file(pyarrow.memory_map(str(path))) as reader:
+                table = reader.read_all()
+            # Record the access for the LRU eviction, keeping the expiration.
+            os.utime(path, (now, expires_at))
+        except (OSError, pyarrow.ArrowInvalid):
+            with self.__lock:
+                self.__misses += 1
+            return None
+
+        fresh = now <= expires_at
+        with self.__lock:
+            if fresh:
+                self.__hits += 1
+            else:
+                self.__stale_hits += 1
+        return table, fresh
+
+    def put(
+        self, key: Hashable, table: pyarrow.Table, ttl: float | None = None
+    ) -> None:
+        """Stores the results for the given key, for ``ttl`` seconds if given."""
+        if table.nbytes > self.max_bytes:
+            return
+        path = self.__path(key)
+        now = time.time()
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True, mode=0o700)
+            # Temporary files are created with mode 0600.
+            fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".", suffix=".tmp")
+            try:
+                with open(fd, "wb") as f:
+                    with pyarrow.ipc.new_file(f, table.schema) as writer:
+                        writer.write_table(table)
+                os.utime(tmp, (now, now + (self.ttl if ttl is None else ttl)))
+                os.replace(tmp, path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        except OSError:
+            logging.warning("Could not write cached results to %s", self.directory)
+            return
+        self.__evict(keep=path)
+
+    def __evict(self, keep: Path) -> None:
+        """Deletes the least recently used results in excess of ``max_bytes``."""
+        files = sorted(self.__files(), key=lambda file: file[1].st_atime)
+        size = sum(stat.st_size for _, stat in files)
+        for path, stat in files:
+            if size <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                path.unlink()
+                with self.__lock:
+                    self.__evictions += 1
+            except FileNotFoundError:
+                pass  # Evicted by another process.
+            except OSError:
+                continue
+            size -= stat.st_size
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drops the results for the given key, if any."""
+        try:
+            self.__path(key).unlink()
+        except OSError:
+            pass
+
+    def clear(self) -> None:
+        """Drops all cached results."""
+        for path, _ in self.__files():
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    def stats(self) -> CacheStats:
+        """Returns a snapshot of the cache's state and statistics."""
+        files = self.__files()
+        with self.__lock:
+            return CacheStats(
+                hits=self.__hits,
+                stale_hits=self.__stale_hits,
+                misses=self.__misses,
+                evictions=self.__evictions,
+                expirations=self.__expirations,
+                entries=len(files),
+                size=sum(stat.st_size for _, stat in files),
+            )
@@ -0,0 +1,135 @@
+"""Adaptive selection of the compression codec of query results.
+
+Brotli compresses results the most, but decompresses them several times slower
+than zstd or lz4; on a fast network, the client spends more time decompressing
+Brotli results than it saves receiving them. :class:`AdaptiveCompression`
+picks the codec of each query's results to minimize the total time spent
+receiving and decoding them.
+"""
+
+import threading
+from dataclasses import dataclass
+from typing import Dict, Sequence
+
+from .constants import (
+    ADAPTIVE_COMPRESSION_BANDWIDTH,
+    ADAPTIVE_COMPRESSION_SMALL_RESULT_SIZE,
+)
+from .types import DataCompression
+
+
+@dataclass(frozen=True)
+class CodecEstimate:
+    """The estimated performance of a compression codec on query results.
+
+    Attributes:
+        ratio: The size of compressed results relative to their decoded size.
+        throughput: The decoding throughput, in decoded bytes per second.
+        observations: The number of results these estimates were measured on.
+    """
+
+    ratio: float
+    throughput: float
+    observations: int = 0
+
+
+# Typical figures for Arrow IPC results, refined by measurements.
+_PRIORS = {
+    DataCompression.BROTLI: CodecEstimate(ratio=0.2, throughput=300e6),
+    DataCompression.ZSTD: CodecEstimate(ratio=0.25, throughput=1e9),
+    DataCompression.LZ4: CodecEstimate(ratio=0.4, throughput=2.5e9),
+}
+
+
+class AdaptiveCompression:
+    """Selects the compression codec of each query's results.
+
+    The time to receive and decode results of a given size with each codec is
+    estimated from the network ``bandwidth`` (in bytes per second), and from
+    the compression ratio and decoding throughput of the codec. These start
+    from typical figures, and are refined with a moving average (weighted by
+    ``smoothing``) of those measured on the results decoded by the cursors.
+
+    Results known to be smaller than ``small_result_size`` bytes, for which
+    the compression ratio makes no noticeable difference, use the codec that
+    decodes the fastest. When the SQL session doesn't hint at the size of the
+    results, the average size of the previous ones is assumed.
+
+    Pass an instance as the ``data_compression`` of a connection.
+    """
+
+    def __init__(
+        self,
+        bandwidth: float = ADAPTIVE_COMPRESSION_BANDWIDTH,
+        codecs: Sequence[DataCompression] = tuple(_PRIORS),
+        small_result_size: int = ADAPTIVE_COMPRESSION_SMALL_RESULT_SIZE,
+        smoothing: float = 0.3,
+    ) -> None:
+        if not codecs:
+            raise ValueError("At least one codec is required")
+        self.bandwidth = bandwidth
+        self.small_result_size = small_result_size
+        self.smoothing = smoothing
+
+        self.__lock = threading.Lock()
+        self.__estimates: Dict[DataCompression, CodecEstimate] = {
+            codec: _PRIORS[codec] for codec in codecs
+        }
+        self.__average_size: float | None = None
+
+    def estimates(self) -> Dict[DataCompression, CodecEstimate]:
+        """Returns the current estimates of each codec's performance."""
+        with self.__lock:
+            return dict(self.__estimates)
+
+    def cost(self, codec: DataCompression, size: float) -> float:
+        """Estimates the seconds spent receiving and decoding results."""
+        estimate = self.__estimates[codec]
+        return size * estimate.ratio / self.bandwidth + size / estimate.throughput
+
+    def select(self, size: float | None = None) -> DataCompression:
+        """Selects the codec for results of the given decoded size, if known."""
+        with self.__lock:
+            if size is None:
+                size = self.__average_size
+            if size is not None and size < self.small_result_size:
+                return max(
+                    self.__estimates,
+                    key=lambda codec: self.__estimates[codec].throughput,
+                )
+            return min(
+                self.__estimates,
+                key=lambda codec: self.cost(codec, size or self.small_result_size),
+            )
+
+    def observe(
+        self,
+        codec: DataCompression | str,
+        compressed_size: int,
+        decoded_size: int,
+        seconds: float,
+    ) -> None:
+        """Records the measured decoding of results compressed with ``codec``."""
+        if decoded_size <= 0 or seconds <= 0:
+            return
+        try:
+            codec = DataCompression(codec)
+        except ValueError:
+            return
+        alpha = self.smoothing
+        with self.__lock:
+            self.__average_size = (
+                decoded_size
+                if self.__average_size is None
+                else (1 - alpha) * self.__average_size + alpha * decoded_size
+            )
+            estimate = self.__estimates.get(codec)
+            if estimate is None:
+                return
+            self.__estimates[codec] = CodecEstimate(
+                ratio=(1 - alpha) * estimate.ratio
+                + alpha * compressed_size / decoded_size,
+                throughput=(1 - alpha) * estimate.throughput
+                + alpha * decoded_size / seconds,
+                observations=estimate.observations + 1,
+            )
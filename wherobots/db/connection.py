@@ -1,22 +1,53 @@
+import functools
 import json
 import logging
 import textwrap
 import threading
+import time
 import uuid
-from dataclasses import dataclass
-from typing import Any, Callable, Dict
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from types import TracebackType
+from typing import Any, Callable, Dict, Hashable, List
+
+from packaging.version import Version
 
 import pandas
-import pyarrow
 import cbor2
+import tenacity
 import websockets.exceptions
 import websockets.protocol
 import websockets.sync.client
 
-from .constants import DEFAULT_READ_TIMEOUT_SECONDS
-from .cursor import Cursor
-from .errors import NotSupportedError, OperationalError
-from .models import ExecutionResult, ProgressInfo, Store, StoreResult
+from .cache import DiskResultCache, ResultCache, is_read_only
+from .compression import AdaptiveCompression
+from .constants import (
+    DEFAULT_PROGRESS_MAX_RATE,
+    DEFAULT_READ_TIMEOUT_SECONDS,
+    PROTOCOL_VERSION,
+    QUERY_HISTORY_SIZE,
+    QUERY_HISTORY_SQL_LENGTH,
+    REATTACH_PROTOCOL_VERSION,
+    STREAM_QUEUE_SIZE,
+)
+from .cursor import Cursor, _substitute_parameters
+from .errors import NotSupportedError, OperationalError, QueryTimeoutError
+from .metrics import ConnectionMetrics, MetricsSnapshot
+from .models import (
+    ConnectTimings,
+    ExecutionResult,
+    ProgressInfo,
+    QueryRecord,
+    QueryStats,
+    ReconnectPolicy,
+    ResultsPayload,
+    Store,
+    StoreResult,
+)
+from . import tracing
+from .progress import ProgressDispatcher, ProgressHandler
+from .recording import TrafficRecorder
+from .results import ArrowResults, ResultStream, decode_results
 from .types import (
     RequestKind,
     EventKind,
@@ -27,8 +58,23 @@ from .types import (
 )
 
 
-ProgressHandler = Callable[[ProgressInfo], None]
-"""A callable invoked with a :class:`ProgressInfo` on every progress event."""
+def reconnect_retry(policy: ReconnectPolicy) -> Any:
+    """Retry policy for reconnecting to the SQL session.
+
+    Works for both regular and ``async`` connection functions.
+    """
+    return tenacity.retry(
+        stop=tenacity.stop_after_attempt(policy.max_attempts),
+        wait=tenacity.wait_exponential(
+            multiplier=policy.min_delay, min=policy.min_delay, max=policy.max_delay
+        ),
+        before_sleep=lambda state: logging.warning(
+            "Reconnection attempt %d failed: %s",
+            state.attempt_number,
+            state.outcome.exception() if state.outcome else None,
+        ),
+        reraise=True,
+    )
 
 
 @dataclass
@@ -38,6 +84,85 @@ class Query:
     state: ExecutionState
     handler: Callable[[Any], None]
     store: Store | None = None
+    stream: ResultStream | None = None
+    result_size: int | None = None  # Size hint from the SQL session, if any
+    progress_handler: ProgressHandler | None = None
+    timeout: float | None = None
+    timed_out: bool = False
+    submitted_at: float = field(default_factory=time.time)
+    stats: QueryStats = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.stats = QueryStats(self.execution_id, submitted_at=self.submitted_at)
+        self.stats.mark(self.state)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if name == "state" and "stats" in self.__dict__:
+            # Every state transition of the query is timed.
+            self.stats.mark(value)
+
+    def notify(self, result: ExecutionResult) -> None:
+        """Hands a result over to the query's cursor, with the query's stats."""
+        result.stats = self.stats
+        self.handler(result)
+
+    def time_out(self) -> QueryTimeoutError:
+        """Marks the query as cancelled for not completing within its timeout."""
+        self.timed_out = True
+        self.state = ExecutionState.CANCELLED
+        return QueryTimeoutError(
+            f"Query {self.execution_id} did not complete within "
+            f"{self.timeout} seconds and was cancelled"
+        )
+
+    def record(self, error: Exception | None = None) -> QueryRecord:
+        """The metadata of this query, without its handler and results."""
+        finished = self.state.is_terminal_state() or error is not None
+        return QueryRecord(
+            execution_id=self.execution_id,
+            sql=self.sql[:QUERY_HISTORY_SQL_LENGTH],
+            state=self.state,
+            submitted_at=self.submitted_at,
+            duration=time.time() - self.submitted_at if finished else None,
+            error=str(error) if error is not None else None,
+            timed_out=self.timed_out,
+        )
+
+
+class QueryHistory:
+    """The metadata of the most recently finished queries of a connection.
+
+    Up to ``size`` records are kept; the least recently finished or looked up
+    ones are evicted first.
+    """
+
+    def __init__(self, size: int = QUERY_HISTORY_SIZE) -> None:
+        self.__size = size
+        self.__records: OrderedDict[str, QueryRecord] = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.__records)
+
+    def add(self, record: QueryRecord) -> None:
+        with self.__lock:
+            self.__records[record.execution_id] = record
+            self.__records.move_to_end(record.execution_id)
+            while len(self.__records) > self.__size:
+                self.__records.popitem(last=False)
+
+    def get(self, execution_id: str) -> QueryRecord | None:
+        with self.__lock:
+            record = self.__records.get(execution_id)
+            if record is not None:
+                self.__records.move_to_end(execution_id)
+            return record
+
+    def records(self) -> List[QueryRecord]:
+        """The records, from the least to the most recent."""
+        with self.__lock:
+            return list(self.__records.values())
 
 
 class Connection:
@@ -53,6 +178,49 @@ class Connection:
 
     A background thread listens for events from the SQL session, and handles update to the
     corresponding query state. Queries are tracked by their unique execution ID.
+
+    With ``stream_results``, the SQL session is asked to send Arrow results as a
+    sequence of chunks that are fed to the cursor as they arrive. Rows can then be
+    fetched before the whole result has been received, and results are not
+    limited by the maximum WebSocket message size. Up to ``STREAM_QUEUE_SIZE``
+    chunks are buffered in memory per cursor; the chunks a slow cursor hasn't
+    consumed yet are spilled to a temporary file, so that it never holds up the
+    delivery of events to the connection's other cursors.
+
+    When the WebSocket is lost and a ``reconnect`` function is given, the
+    connection reconnects to the SQL session following ``reconnect_policy`` and
+    reattaches the queries in flight by their execution ID: results are
+    requested again for queries that had already succeeded, and running queries
+    are followed up on the new WebSocket, if the SQL session's ``protocol``
+    version supports it. Running queries the SQL session sends no event about
+    within the policy's ``reattach_timeout`` fail. Queries that cannot be
+    recovered, such as those whose results were being streamed, fail
+    immediately, as do all pending queries when reconnecting is not possible.
+
+    With a ``result_cache``, the Arrow results of queries are kept in the cache,
+    and queries whose results are cached are answered from it without being
+    executed. Results are only shared with connections of the same
+    ``result_cache_scope``, a fingerprint of the session and credentials (see
+    :func:`wherobots.db.cache.cache_scope`). Stale results are returned immediately while the query is executed
+    again in the background to refresh them. Only the results of read-only
+    statements are cached: other statements are always executed. Queries
+    storing their results in cloud storage, and streamed results, are never
+    cached either.
+
+    With an :class:`AdaptiveCompression` as ``data_compression``, the codec of
+    each query's results is selected according to the decoding throughput
+    measured on the previous ones.
+
+    Queries that don't complete within ``query_timeout`` seconds (unless given
+    another timeout when executed) are cancelled, and their cursor raises
+    :class:`QueryTimeoutError`, so that a runaway query doesn't keep using the
+    resources of the SQL session. Deadlines are enforced by the connection's
+    listener, whether or not the results are being fetched, and are checked at
+    least every ``read_timeout`` seconds.
+
+    With a ``recorder``, the requests sent and the frames received on the
+    connection are recorded, to be replayed later with
+    :class:`wherobots.db.recording.ReplayServer`.
     """
 
     def __init__(
@@ -60,30 +228,142 @@ class Connection:
         ws: websockets.sync.client.ClientConnection,
         read_timeout: float = DEFAULT_READ_TIMEOUT_SECONDS,
         results_format: ResultsFormat | None = None,
-        data_compression: DataCompression | None = None,
+        data_compression: DataCompression | AdaptiveCompression | None = None,
         geometry_representation: GeometryRepresentation | None = None,
+        stream_results: bool = False,
+        connect_timings: ConnectTimings | None = None,
+        reconnect: Callable[[], websockets.sync.client.ClientConnection] | None = None,
+        reconnect_policy: ReconnectPolicy | None = None,
+        result_cache: ResultCache | DiskResultCache | None = None,
+        result_cache_scope: str | None = None,
+        query_timeout: float | None = None,
+        query_history_size: int = QUERY_HISTORY_SIZE,
+        recorder: TrafficRecorder | None = None,
+        progress_max_rate: float | None = DEFAULT_PROGRESS_MAX_RATE,
+        protocol: Version = PROTOCOL_VERSION,
     ):
         self.__ws = ws
+        self.__protocol = protocol
+        self.__recorder = recorder
         self.__read_timeout = read_timeout
         self.__results_format = results_format
         self.__data_compression = data_compression
         self.__geometry_representation = geometry_representation
+        self.__query_timeout = query_timeout
+        self.__stream_results = stream_results
         self.__progress_handler: ProgressHandler | None = None
+        self.__progress = ProgressDispatcher(progress_max_rate)
+        self.__connect_timings = connect_timings
+        self.__reconnect_fn = reconnect
+        self.__reconnect_policy = reconnect_policy
+        self.__closing = False
+        self.__result_cache = result_cache
+        self.__result_cache_scope = result_cache_scope
+        self.__revalidating: set[Hashable] = set()
+        self.__revalidating_lock = threading.Lock()
 
         self.__queries: dict[str, Query] = {}
+        self.__reattach_deadlines: dict[str, float] = {}
+        self.__query_deadlines: dict[str, float] = {}
+        self.__history = QueryHistory(query_history_size)
+        self.__metrics = ConnectionMetrics()
+        self.__received_at: float | None = None
         self.__thread = threading.Thread(
             target=self.__main_loop, daemon=True, name="wherobots-connection"
         )
         self.__thread.start()
 
-    def __enter__(self):
+    def __enter__(self) -> "Connection":
         return self
 
-    def __exit__(self, exc_type, exc_val, exc_tb):
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
         self.close()
 
     def close(self) -> None:
+        self.__closing = True
         self.__ws.close()
+        self.__progress.close()
+
+    @property
+    def connect_timings(self) -> ConnectTimings | None:
+        """The breakdown of the time spent establishing this connection."""
+        return self.__connect_timings
+
+    @property
+    def closed(self) -> bool:
+        """Whether the connection to the SQL session is closed or closing."""
+        return (
+            self.__ws.protocol.state >= websockets.protocol.State.CLOSING
+            or not self.__thread.is_alive()
+        )
+
+    def ping(self, timeout: float | None = None) -> bool:
+        """Checks that the SQL session is responsive on this connection.
+
+        Returns whether the SQL session answered a WebSocket ping within the
+        given timeout.
+        """
+        if self.closed:
+            return False
+        try:
+            return self.__ws.ping().wait(timeout)
+        except websockets.exceptions.ConnectionClosed:
+            return False
+
+    @property
+    def result_cache(self) -> ResultCache | DiskResultCache | None:
+        """The cache of query results of this connection, if any."""
+        return self.__result_cache
+
+    def invalidate_cached_results(
+        self, operation: str | None = None, parameters: Dict[str, Any] | None = None
+    ) -> None:
+        """Drops the cached results of the given operation, or all of them.
+
+        The operation and parameters are the ones given to ``Cursor.execute()``.
+        """
+        if self.__result_cache is None:
+            return
+        if operation is None:
+            self.__result_cache.clear()
+        else:
+            sql = _substitute_parameters(operation, parameters)
+            self.__result_cache.invalidate(self.__cache_key(sql))
+
+    @property
+    def query_timeout(self) -> float | None:
+        """The default timeout of the queries of this connection's cursors, in seconds."""
+        return self.__query_timeout
+
+    @property
+    def queries_in_flight(self) -> int:
+        """The number of queries of this connection that haven't finished yet."""
+        return len(self.__queries)
+
+    @property
+    def query_history(self) -> List[QueryRecord]:
+        """The metadata of the recently finished queries, from the oldest."""
+        return self.__history.records()
+
+    def metrics(self) -> MetricsSnapshot:
+        """A snapshot of the operational metrics of this connection.
+
+        See :mod:`wherobots.db.metrics`, whose :func:`to_prometheus` renders
+        snapshots for Prometheus.
+        """
+        return self.__metrics.snapshot(queries_in_flight=len(self.__queries))
+
+    def query_record(self, execution_id: str) -> QueryRecord | None:
+        """The metadata of an in-flight or recently finished query, if known."""
+        query = self.__queries.get(execution_id)
+        if query is not None:
+            return query.record()
+        return self.__history.get(execution_id)
 
     def commit(self) -> None:
         raise NotSupportedError
@@ -92,14 +372,26 @@ class Connection:
         raise NotSupportedError
 
     def cursor(self) -> Cursor:
-        return Cursor(self.__execute_sql, self.__cancel_query)
+        return Cursor(
+            self.__execute_sql,
+            self.__cancel_query,
+            geometry_representation=self.__geometry_representation,
+            timeout=self.__query_timeout,
+        )
 
     def set_progress_handler(self, handler: ProgressHandler | None) -> None:
         """Register a callback invoked for execution progress events.
 
         When a handler is set, every ``execute_sql`` request automatically
         includes ``enable_progress_events: true`` so the SQL session streams
-        progress updates for running queries.
+        progress updates for running queries. Handlers can also be registered
+        for the queries of a single cursor, or a single execution (see
+        :meth:`wherobots.db.Cursor.set_progress_handler`).
+
+        Handlers are called from a separate thread, so that they don't delay
+        the delivery of results. Bursts of progress events are coalesced: only
+        the latest progress of each query is delivered, at most
+        ``progress_max_rate`` times per second.
 
         Pass ``None`` to disable progress reporting.
 
@@ -113,16 +405,211 @@ class Connection:
         """Main background loop listening for messages from the SQL session."""
         logging.info("Starting background connection handling loop...")
         while self.__ws.protocol.state < websockets.protocol.State.CLOSING:
+            self.__receive()
+            if self.__closing:
+                logging.info("Connection closed; stopping main loop.")
+                self.__fail_pending(
+                    OperationalError("Connection to SQL session closed")
+                )
+                return
+            if not self.__reconnect():
+                self.__fail_pending(OperationalError("Connection to SQL session lost"))
+                return
+
+    def __receive(self) -> None:
+        """Handles messages from the SQL session until the WebSocket is closed."""
+        while self.__ws.protocol.state < websockets.protocol.State.CLOSING:
+            if self.__reattach_deadlines:
+                self.__expire_reattached()
+            if self.__query_deadlines:
+                self.__expire_timed_out()
             try:
                 self.__listen()
             except TimeoutError:
                 # Expected, retry next time
+                self.__metrics.read_timeout()
                 continue
-            except websockets.exceptions.ConnectionClosedOK:
-                logging.info("Connection closed; stopping main loop.")
+            except websockets.exceptions.ConnectionClosed:
                 return
             except Exception as e:
                 logging.exception("Error handling message from SQL session", exc_info=e)
+            # Reset per message, so that a message that failed before it was
+            # received isn't timed from the previous one.
+            received_at, self.__received_at = self.__received_at, None
+            if received_at is not None:
+                self.__metrics.message_handled(time.perf_counter() - received_at)
+
+    def __reconnect(self) -> bool:
+        """Reconnects to the SQL session and reattaches the queries in flight.
+
+        Returns whether the connection was reestablished.
+        """
+        if self.__reconnect_fn is None or self.__reconnect_policy is None:
+            return False
+
+        logging.warning("Lost connection to SQL session; reconnecting...")
+        try:
+            ws = reconnect_retry(self.__reconnect_policy)(self.__reconnect_fn)()
+        except Exception as e:
+            logging.error("Could not reconnect to SQL session: %s", e)
+            return False
+        if self.__closing:
+            ws.close()
+            return False
+
+        self.__ws = ws
+        logging.info("Reconnected to SQL session.")
+        for query in list(self.__queries.values()):
+            try:
+                self.__reattach(query, self.__reconnect_policy.reattach_timeout)
+            except Exception as e:
+                logging.exception("Could not reattach query %s", query.execution_id)
+                self.__fail(query, OperationalError(f"Could not reattach query: {e}"))
+        return True
+
+    def __reattach(self, query: Query, timeout: float) -> None:
+        """Resumes tracking a query in flight on a new WebSocket.
+
+        A running query fails if no event about it is received within ``timeout``
+        seconds.
+        """
+        if query.state.is_terminal_state():
+            return
+        if query.stream is not None:
+            # The stream was partially consumed and can't be resumed.
+            self.__fail(
+                query,
+                OperationalError("Connection to SQL session lost while streaming"),
+            )
+        elif query.state in (
+            ExecutionState.SUCCEEDED,
+            ExecutionState.RESULTS_REQUESTED,
+        ):
+            logging.info("Requesting results of %s again.", query.execution_id)
+            self.__request_results(query.execution_id)
+        elif self.__protocol < REATTACH_PROTOCOL_VERSION:
+            self.__fail(
+                query,
+                OperationalError(
+                    f"Running query can't be reattached with protocol {self.__protocol}"
+                ),
+            )
+        else:
+            logging.info("Reattaching to query %s.", query.execution_id)
+            self.__send(
+                {
+                    "kind": RequestKind.REATTACH.value,
+                    "execution_id": query.execution_id,
+                }
+            )
+            self.__reattach_deadlines[query.execution_id] = time.monotonic() + timeout
+
+    def __expire_reattached(self) -> None:
+        """Fails the reattached queries the SQL session hasn't followed up on."""
+        now = time.monotonic()
+        for execution_id, deadline in list(self.__reattach_deadlines.items()):
+            if now < deadline:
+                continue
+            del self.__reattach_deadlines[execution_id]
+            query = self.__queries.get(execution_id)
+            if query is not None:
+                self.__fail(
+                    query, OperationalError("No response to reattaching the query")
+                )
+
+    def __expire_timed_out(self) -> None:
+        """Cancels the queries that haven't completed within their timeout."""
+        now = time.monotonic()
+        for execution_id, deadline in list(self.__query_deadlines.items()):
+            if now < deadline:
+                continue
+            self.__query_deadlines.pop(execution_id, None)
+            query = self.__queries.get(execution_id)
+            if query is not None:
+                self.__time_out(query)
+
+    def __time_out(self, query: Query) -> None:
+        """Cancels a query past its deadline, failing its cursor with a timeout.
+
+        The timeout error is handed over to the cursor right away, rather than
+        the (empty) results of the cancelled query, and also ends its stream if
+        its results were being streamed.
+        """
+        logging.warning(
+            "Query %s did not complete within %s seconds; cancelling it.",
+            query.execution_id,
+            query.timeout,
+        )
+        try:
+            self.__cancel_query(query.execution_id)
+        except OperationalError as e:
+            logging.warning("Could not cancel query %s: %s", query.execution_id, e)
+        error = query.time_out()
+        self.__metrics.query_timed_out()
+        self.__retire(query, error)
+        if query.stream is not None:
+            query.stream.finish(error)
+        else:
+            query.notify(ExecutionResult(error=error))
+
+    def __dispatch_progress(self, execution_id: str, message: Dict[str, Any]) -> None:
+        """Hands a progress event over to the handlers of its query, if any."""
+        query = self.__queries.get(execution_id)
+        handlers = [
+            handler
+            for handler in (
+                self.__progress_handler,
+                query.progress_handler if query else None,
+            )
+            if handler is not None
+        ]
+        if not handlers:
+            return
+        self.__progress.dispatch(
+            ProgressInfo(
+                execution_id=execution_id,
+                tasks_total=message.get("tasks_total", 0),
+                tasks_completed=message.get("tasks_completed", 0),
+                tasks_active=message.get("tasks_active", 0),
+            ),
+            handlers,
+        )
+        if query is None:
+            # Late progress of a finished query is delivered only once.
+            self.__progress.finish(execution_id)
+
+    def __retire(
+        self, query: Query, error: Exception | None = None, decoding: bool = False
+    ) -> None:
+        """Stops tracking a finished query, keeping its metadata in the history.
+
+        The query's span is ended here, unless its results are still to be
+        ``decoding`` by its cursor: it is then ended once they are decoded.
+        """
+        self.__query_deadlines.pop(query.execution_id, None)
+        if self.__queries.pop(query.execution_id, None) is not None:
+            self.__history.add(query.record(error))
+            self.__metrics.query_finished(query.state)
+            if error is not None:
+                query.stats.error = str(error)
+            if not decoding:
+                tracing.end_query_span(query.stats)
+        self.__progress.finish(query.execution_id)
+
+    def __fail(self, query: Query, error: Exception) -> None:
+        """Fails a query, unblocking its cursor with the given error."""
+        query.state = ExecutionState.FAILED
+        self.__retire(query, error)
+        if query.stream is not None:
+            query.stream.finish(error)
+        else:
+            query.notify(ExecutionResult(error=error))
+
+    def __fail_pending(self, error: Exception) -> None:
+        """Fails all queries in flight, which nothing will ever complete."""
+        for query in list(self.__queries.values()):
+            if not query.state.is_terminal_state():
+                self.__fail(query, error)
 
     def __listen(self) -> None:
         """Waits for the next message from the SQL session and processes it.
@@ -137,24 +624,12 @@ class Connection:
             return
 
         # Progress events are independent of the query state machine and don't
-        # require a tracked query — the handler is connection-level.
+        # require a tracked query; they are delivered off the listener thread.
         if kind == EventKind.EXECUTION_PROGRESS:
-            handler = self.__progress_handler
-            if handler is None:
-                return
-            try:
-                handler(
-                    ProgressInfo(
-                        execution_id=execution_id,
-                        tasks_total=message.get("tasks_total", 0),
-                        tasks_completed=message.get("tasks_completed", 0),
-                        tasks_active=message.get("tasks_active", 0),
-                    )
-                )
-            except Exception:
-                logging.exception("Progress handler raised an exception")
+            self.__dispatch_progress(execution_id, message)
             return
 
+        self.__reattach_deadlines.pop(execution_id, None)
         query = self.__queries.get(execution_id)
         if not query:
             logging.warning(
@@ -189,7 +664,8 @@ class Connection:
                             store_result.size,
                         )
                         query.state = ExecutionState.COMPLETED
-                        query.handler(ExecutionResult(store_result=store_result))
+                        self.__retire(query)
+                        query.notify(ExecutionResult(store_result=store_result))
                         return
 
                     if query.store is not None:
@@ -199,10 +675,12 @@ class Connection:
                             execution_id,
                         )
                         query.state = ExecutionState.COMPLETED
-                        query.handler(ExecutionResult())
+                        self.__retire(query)
+                        query.notify(ExecutionResult())
                         return
 
                     # No store configured, request results normally
+                    query.result_size = message.get("size")
                     self.__request_results(execution_id)
                     return
 
@@ -211,33 +689,53 @@ class Connection:
                 if not results or not isinstance(results, dict):
                     logging.warning("Got no results back from %s.", execution_id)
                     query.state = ExecutionState.COMPLETED
-                    query.handler(ExecutionResult())
+                    self.__retire(query)
+                    query.notify(ExecutionResult())
                     return
 
                 query.state = ExecutionState.COMPLETED
-                query.handler(
-                    ExecutionResult(results=self._handle_results(execution_id, results))
+                self.__retire(query, decoding=True)
+                query.notify(
+                    ExecutionResult(
+                        payload=self._handle_results(execution_id, results, query.stats)
+                    )
                 )
             elif query.state == ExecutionState.CANCELLED:
                 logging.info(
                     "Query %s has been cancelled; returning empty results.",
                     execution_id,
                 )
-                query.handler(ExecutionResult(results=pandas.DataFrame()))
-                self.__queries.pop(execution_id)
+                if query.stream is not None:
+                    query.stream.finish()
+                else:
+                    query.notify(ExecutionResult(results=pandas.DataFrame()))
+                self.__retire(query)
             elif query.state == ExecutionState.FAILED:
                 # Don't do anything here; the ERROR event is coming with more
                 # details.
                 pass
+        elif kind == EventKind.EXECUTION_RESULT_CHUNK:
+            self.__handle_result_chunk(query, message)
         elif kind == EventKind.ERROR:
             query.state = ExecutionState.FAILED
-            error = message.get("message")
-            query.handler(ExecutionResult(error=OperationalError(error)))
+            error = OperationalError(message.get("message"))
+            self.__retire(query, error)
+            if query.stream is not None:
+                # The cursor is already consuming the stream; fail it there.
+                query.stream.finish(error)
+            else:
+                query.notify(ExecutionResult(error=error))
         else:
             logging.warning("Received unknown %s event!", kind)
 
-    def _handle_results(self, execution_id: str, results: Dict[str, Any]) -> Any:
-        result_bytes = results.get("result_bytes")
+    def _handle_results(
+        self,
+        execution_id: str,
+        results: Dict[str, Any],
+        stats: QueryStats | None = None,
+    ) -> ResultsPayload:
+        """Wraps the received results for decoding by the consuming cursor."""
+        result_bytes: bytes = results["result_bytes"]
         result_format = results.get("format")
         result_compression = results.get("compression")
         logging.info(
@@ -247,39 +745,208 @@ class Connection:
             result_format,
             execution_id,
         )
+        self.__metrics.results_received(
+            result_format, result_compression, len(result_bytes)
+        )
+        observe = None
+        if (
+            isinstance(self.__data_compression, AdaptiveCompression)
+            and result_compression
+        ):
+            observe = functools.partial(
+                self.__data_compression.observe, result_compression, len(result_bytes)
+            )
 
-        if result_format == ResultsFormat.JSON:
-            return json.loads(result_bytes.decode("utf-8"))
-        elif result_format == ResultsFormat.ARROW:
-            buffer = pyarrow.py_buffer(result_bytes)
-            stream = pyarrow.input_stream(buffer, result_compression)
-            with pyarrow.ipc.open_stream(stream) as reader:
-                return reader.read_pandas()
-        else:
-            return OperationalError(f"Unsupported results format {result_format}")
+        def on_decoded(size: int, seconds: float) -> None:
+            self.__metrics.decoded(seconds)
+            if observe is not None:
+                observe(size, seconds)
+            if stats is not None:
+                # The span of the query covers the decoding of its results.
+                tracing.end_query_span(stats)
+
+        if stats is not None:
+            stats.bytes_received += len(result_bytes)
+            stats.frames_received += 1
+            stats.format = result_format
+            stats.compression = result_compression
+        return ResultsPayload(
+            result_bytes=result_bytes,
+            format=result_format,
+            compression=result_compression,
+            on_decoded=on_decoded,
+            stats=stats,
+        )
+
+    def __handle_result_chunk(self, query: Query, message: Dict[str, Any]) -> None:
+        """Feeds a chunk of streamed results to the query's cursor.
+
+        The cursor is handed the stream on the first chunk, so it can start
+        decoding while the following chunks are still being received.
+        """
+        results = message.get("results") or {}
+        if query.stream is None:
+            query.stream = ResultStream(
+                STREAM_QUEUE_SIZE,
+                compression=results.get("compression"),
+                format=results.get("format"),
+            )
+            query.stats.format = results.get("format")
+            query.stats.compression = results.get("compression")
+            query.notify(ExecutionResult(stream=query.stream))
+
+        chunk = results.get("result_bytes") or b""
+        self.__metrics.results_received(
+            query.stream.format, query.stream.compression, len(chunk)
+        )
+        query.stats.bytes_received += len(chunk)
+        query.stats.frames_received += 1
+        query.stream.put(chunk)
+        if message.get("last"):
+            logging.info("Received last result chunk from %s.", query.execution_id)
+            query.state = ExecutionState.COMPLETED
+            self.__retire(query)
+            query.stream.finish()
 
     def __send(self, message: Dict[str, Any]) -> None:
         request = json.dumps(message)
         logging.debug("Request: %s", request)
-        self.__ws.send(request)
+        try:
+            self.__ws.send(request)
+        except websockets.exceptions.ConnectionClosed as e:
+            raise OperationalError("Connection to SQL session lost") from e
+        if self.__recorder is not None:
+            self.__recorder.sent(message, len(request))
 
     def __recv(self) -> Dict[str, Any]:
         frame = self.__ws.recv(timeout=self.__read_timeout)
+        self.__received_at = received_at = time.perf_counter()
+        message: Dict[str, Any]
         if isinstance(frame, str):
+            encoding = "json"
             message = json.loads(frame)
         elif isinstance(frame, bytes):
+            encoding = "cbor"
             message = cbor2.loads(frame)
         else:
             raise ValueError("Unexpected frame type received")
+        self.__metrics.frame_received(encoding, len(frame))
+        if self.__recorder is not None:
+            self.__recorder.received(message, encoding, len(frame), received_at)
         return message
 
+    def __cache_key(self, sql: str) -> Hashable:
+        return (
+            self.__result_cache_scope,
+            sql,
+            self.__results_format and self.__results_format.value,
+            self.__geometry_representation and self.__geometry_representation.value,
+        )
+
     def __execute_sql(
         self,
         sql: str,
         handler: Callable[[Any], None],
         store: Store | None = None,
+        progress_handler: ProgressHandler | None = None,
+        timeout: float | None = None,
     ) -> str:
-        """Triggers the execution of the given SQL query."""
+        """Triggers the execution of the given SQL query, unless its results are cached.
+
+        Only the results of read-only statements are cached (see
+        :func:`wherobots.db.cache.is_read_only`): other statements are always
+        executed. Executed queries are cancelled if they don't complete within
+        ``timeout`` seconds.
+        """
+        cache = self.__result_cache
+        if cache is None or store is not None or not is_read_only(sql):
+            return self.__submit(sql, handler, store, progress_handler, timeout)
+
+        key = self.__cache_key(sql)
+        cached = cache.get(key)
+        if cached is None:
+
+            def on_result(result: ExecutionResult) -> None:
+                if result.payload is not None:
+                    result.on_decoded = lambda table: cache.put(key, table)
+                handler(result)
+
+            return self.__submit(
+                sql, on_result, progress_handler=progress_handler, timeout=timeout
+            )
+
+        table, fresh = cached
+        logging.info(
+            "Using %s cached results for: %s",
+            "fresh" if fresh else "stale",
+            textwrap.shorten(sql, width=60),
+        )
+        if not fresh:
+            self.__revalidate(cache, sql, key)
+        handler(ExecutionResult(table=table))
+        return str(uuid.uuid4())
+
+    def __revalidate(
+        self, cache: ResultCache | DiskResultCache, sql: str, key: Hashable
+    ) -> None:
+        """Executes a query again in the background to refresh its cached results."""
+        with self.__revalidating_lock:
+            if key in self.__revalidating:
+                return
+            self.__revalidating.add(key)
+
+        def done() -> None:
+            with self.__revalidating_lock:
+                self.__revalidating.discard(key)
+
+        def refresh(payload: ResultsPayload) -> None:
+            try:
+                results = decode_results(payload)
+                if isinstance(results, ArrowResults) and results.table is not None:
+                    cache.put(key, results.table)
+            except Exception:
+                logging.exception("Failed to refresh cached results")
+            finally:
+                done()
+
+        def on_result(result: ExecutionResult) -> None:
+            refreshing = False
+            try:
+                if result.stream is not None:
+                    # Streamed results are not cached.
+                    result.stream.close()
+                    if result.stats is not None:
+                        self.__cancel_query(result.stats.execution_id)
+                if result.payload is not None:
+                    # Decode off the listener thread; refresh() is then done.
+                    threading.Thread(
+                        target=refresh, args=(result.payload,), daemon=True
+                    ).start()
+                    refreshing = True
+            except Exception:
+                logging.exception("Failed to refresh cached results")
+            finally:
+                if not refreshing:
+                    done()
+
+        try:
+            self.__submit(sql, on_result, timeout=self.__query_timeout)
+        except Exception:
+            done()
+            logging.exception("Failed to refresh cached results")
+
+    def __submit(
+        self,
+        sql: str,
+        handler: Callable[[Any], None],
+        store: Store | None = None,
+        progress_handler: ProgressHandler | None = None,
+        timeout: float | None = None,
+    ) -> str:
+        """Sends the execution request of the given SQL query.
+
+        The query is cancelled if it doesn't complete within ``timeout`` seconds.
+        """
         execution_id = str(uuid.uuid4())
         request = {
             "kind": RequestKind.EXECUTE_SQL.value,
@@ -287,24 +954,42 @@ class Connection:
             "statement": sql,
         }
 
-        if self.__progress_handler is not None:
+        if self.__progress_handler is not None or progress_handler is not None:
             request["enable_progress_events"] = True
 
         if store:
             request["store"] = store.to_dict()
 
-        self.__queries[execution_id] = Query(
+        query = Query(
             sql=sql,
             execution_id=execution_id,
             state=ExecutionState.EXECUTION_REQUESTED,
             handler=handler,
             store=store,
+            progress_handler=progress_handler,
+            timeout=timeout,
         )
+        query.stats.span = tracing.start_query_span(execution_id, sql)
+        context = tracing.trace_context(query.stats.span)
+        if context:
+            request["trace_context"] = context
+        self.__queries[execution_id] = query
+        if timeout is not None:
+            self.__query_deadlines[execution_id] = time.monotonic() + timeout
+        self.__metrics.query_started()
 
         logging.info(
             "Executing SQL query %s: %s", execution_id, textwrap.shorten(sql, width=60)
         )
-        self.__send(request)
+        try:
+            self.__send(request)
+        except OperationalError as e:
+            self.__query_deadlines.pop(execution_id, None)
+            self.__queries.pop(execution_id, None)
+            self.__metrics.query_finished(ExecutionState.FAILED)
+            query.stats.error = str(e)
+            tracing.end_query_span(query.stats)
+            raise
         return execution_id
 
     def __request_results(self, execution_id: str) -> None:
@@ -318,10 +1003,15 @@ class Connection:
         }
         if self.__results_format:
             request["format"] = self.__results_format.value
-        if self.__data_compression:
-            request["compression"] = self.__data_compression.value
+        compression = self.__data_compression
+        if isinstance(compression, AdaptiveCompression):
+            compression = compression.select(query.result_size)
+        if compression:
+            request["compression"] = compression.value
         if self.__geometry_representation:
             request["geometry"] = self.__geometry_representation.value
+        if self.__stream_results:
+            request["stream"] = True
 
         query.state = ExecutionState.RESULTS_REQUESTED
         logging.info("Requesting results from %s ...", execution_id)
@@ -330,7 +1020,7 @@ class Connection:
     def __cancel_query(self, execution_id: str) -> None:
         """Cancels the query with the given execution ID."""
         query = self.__queries.get(execution_id)
-        if not query:
+        if not query or query.state.is_terminal_state():
             return
 
         request = {
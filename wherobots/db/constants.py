@@ -15,8 +15,39 @@ DEFAULT_SESSION_TYPE: SessionType = SessionType.MULTI
 DEFAULT_STORAGE_FORMAT: StorageFormat = StorageFormat.PARQUET
 DEFAULT_READ_TIMEOUT_SECONDS: float = 0.25
 DEFAULT_SESSION_WAIT_TIMEOUT_SECONDS: float = 900
+DEFAULT_CONNECT_TIMEOUT_SECONDS: float = 10
+DEFAULT_SESSION_CACHE_CONNECT_TIMEOUT_SECONDS: float = 5
+DEFAULT_SESSION_CACHE_MAX_AGE_SECONDS: float = 24 * 3600
+SESSION_POLL_MIN_INTERVAL_SECONDS: float = 0.25
+SESSION_POLL_MAX_INTERVAL_SECONDS: float = 5
 
 MAX_MESSAGE_SIZE: int = 100 * 2**20  # 100MiB
+MAX_STATEMENT_SIZE: int = 2**20  # 1MiB; bounds statements coalesced by executemany()
+TEMPLATE_CACHE_SIZE: int = 1024  # Compiled operation strings kept by the cursors
+STREAM_QUEUE_SIZE: int = 16  # Chunks of a streamed result kept in memory per cursor
+QUERY_HISTORY_SIZE: int = 1000  # Finished queries remembered by each connection
+QUERY_HISTORY_SQL_LENGTH: int = 1024  # Characters of their SQL kept in the history
+METRICS_DURATION_BUCKETS: tuple[float, ...] = (
+    0.001,
+    0.005,
+    0.01,
+    0.05,
+    0.1,
+    0.5,
+    1,
+    5,
+    10,
+)  # Seconds
+DEFAULT_RESULT_CACHE_MAX_BYTES: int = 256 * 2**20  # 256MiB
+DEFAULT_RESULT_CACHE_TTL_SECONDS: float = 300
+DEFAULT_DISK_RESULT_CACHE_MAX_BYTES: int = 4 * 2**30  # 4GiB
+ADAPTIVE_COMPRESSION_BANDWIDTH: float = 100e6  # Bytes per second
+ADAPTIVE_COMPRESSION_SMALL_RESULT_SIZE: int = 256 * 2**10  # 256KiB
+STORE_DOWNLOAD_PART_SIZE: int = 8 * 2**20  # 8MiB; size of each ranged request
+STORE_DOWNLOAD_WORKERS: int = 8  # Parallel ranged requests per download
+TRAFFIC_RECORDING_VERSION: int = 1
+DEFAULT_PROGRESS_MAX_RATE: float = 10  # Progress deliveries per second, per query
 PROTOCOL_VERSION: Version = Version("1.0.0")
+REATTACH_PROTOCOL_VERSION: Version = Version("1.1.0")  # First with reattach requests
 
 PARAM_STYLE = "pyformat"
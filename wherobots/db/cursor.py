@@ -1,160 +1,507 @@
+import datetime
+import decimal
+import functools
 import math
 import queue
 import re
-from typing import Any, List, Tuple, Dict
-
-from .errors import ProgrammingError
-from .models import ExecutionResult, Store, StoreResult
+import time
+from types import TracebackType
+from typing import Any, Callable, Iterable, Iterator, List, Tuple, Dict
+
+import pandas
+
+import pyarrow
+import pyarrow.dataset
+import pyarrow.fs
+
+from . import dataset, download, tracing
+from .constants import (
+    MAX_STATEMENT_SIZE,
+    STORE_DOWNLOAD_WORKERS,
+    TEMPLATE_CACHE_SIZE,
+)
+from .errors import NotSupportedError, ProgrammingError
+from .geometry import is_geometry_field, to_geoarrow, to_geodataframe
+from .models import ExecutionResult, QueryStats, Store, StoreResult
+from .progress import ProgressHandler
+from .results import ArrowResults, ResultStream, decode_results, peek_schema
+from .types import GEOMETRY, GeometryRepresentation
 
 # Matches pyformat parameter markers: %(name)s
 _PYFORMAT_RE = re.compile(r"%\(([^)]+)\)s")
 
 
+def _quote_float(value: float) -> str:
+    if math.isnan(value) or math.isinf(value):
+        raise ProgrammingError(f"Cannot convert float value {value!r} to SQL literal")
+    return repr(value)
+
+
+def _quote_decimal(value: decimal.Decimal) -> str:
+    if not value.is_finite():
+        raise ProgrammingError(f"Cannot convert decimal value {value!r} to SQL literal")
+    # Fixed-point notation, as exponents would make it a floating-point literal.
+    return format(value, "f")
+
+
+def _quote_string(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _quote_sequence(values: Iterable[Any]) -> str:
+    # Looks the encoders up directly, rather than through _quote_value(), as
+    # IN lists can hold thousands of values.
+    quoter = _QUOTERS.get
+    literals = ", ".join([(quoter(type(v)) or _quote_value)(v) for v in values])
+    # An empty list still makes a valid (never matching) IN list.
+    return "(" + (literals or "NULL") + ")"
+
+
+# Literal encoders by exact type, to quote the most common values with a single
+# dictionary lookup. Subclasses go through the checks in _quote_value().
+_QUOTERS: Dict[type, Callable[[Any], str]] = {
+    type(None): lambda value: "NULL",
+    bool: lambda value: "TRUE" if value else "FALSE",
+    int: int.__repr__,
+    float: _quote_float,
+    decimal.Decimal: _quote_decimal,
+    str: _quote_string,
+    bytes: lambda value: f"X'{value.hex()}'",
+    bytearray: lambda value: f"X'{value.hex()}'",
+    memoryview: lambda value: f"X'{value.hex()}'",
+    datetime.date: lambda value: f"DATE '{value.isoformat()}'",
+    datetime.datetime: lambda value: f"TIMESTAMP '{value.isoformat(sep=' ')}'",
+    list: _quote_sequence,
+    tuple: _quote_sequence,
+}
+
+
 def _quote_value(value: Any) -> str:
     """Convert a Python value to a SQL literal string.
 
     Handles quoting and escaping so that the interpolated SQL is syntactically
-    correct and safe from trivial injection.
+    correct and safe from trivial injection. Dates, datetimes and decimals
+    become typed literals, and lists and tuples become parenthesized lists of
+    literals, for use in ``IN`` predicates.
     """
-    if value is None:
-        return "NULL"
+    quoter = _QUOTERS.get(type(value))
+    if quoter is not None:
+        return quoter(value)
     # bool must be checked before int because bool is a subclass of int
     if isinstance(value, bool):
-        return "TRUE" if value else "FALSE"
-    if isinstance(value, (int, float)):
-        if isinstance(value, float) and (math.isnan(value) or math.isinf(value)):
-            raise ProgrammingError(
-                f"Cannot convert float value {value!r} to SQL literal"
-            )
-        return str(value)
-    if isinstance(value, bytes):
-        return "X'" + value.hex() + "'"
-    # Everything else (str, date, datetime, etc.) is treated as a string literal
-    return "'" + str(value).replace("'", "''") + "'"
+        return _QUOTERS[bool](value)
+    if isinstance(value, int):
+        return int.__repr__(value)
+    if isinstance(value, float):
+        return _quote_float(value)
+    # datetime must be checked before date because datetime is a subclass of date
+    for base in (decimal.Decimal, str, bytes, datetime.datetime, datetime.date):
+        if isinstance(value, base):
+            return _QUOTERS[base](value)
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return _quote_sequence(value)
+    # Everything else is treated as a string literal
+    return _quote_string(str(value))
+
+
+_BINARY_TYPES = (bytes, bytearray, memoryview)
+
+
+class _Template:
+    """An operation string split into literal segments and parameter names.
+
+    The parameters of the operation are bound by joining its segments with the
+    literals of the parameter values, without scanning the operation again.
+    """
+
+    def __init__(self, operation: str) -> None:
+        parts = _PYFORMAT_RE.split(operation)
+        # Literal segments and parameter names alternate.
+        self.segments: List[str] = parts[0::2]
+        self.names: List[str] = parts[1::2]
+
+    def render(self, parameters: Dict[str, Any]) -> str:
+        parts = [self.segments[0]]
+        for name, segment in zip(self.names, self.segments[1:]):
+            try:
+                value = parameters[name]
+            except KeyError:
+                raise ProgrammingError(
+                    f"Parameter '{name}' not found in provided parameters"
+                ) from None
+            if type(value) in _BINARY_TYPES:
+                # Avoids copying large binary literals (e.g. WKB geometries)
+                # once more to wrap them in quotes.
+                parts.extend(("X'", value.hex(), "'", segment))
+            else:
+                parts.append(_quote_value(value))
+                parts.append(segment)
+        return "".join(parts)
+
+
+@functools.lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def _compile(operation: str) -> _Template:
+    return _Template(operation)
 
 
 def _substitute_parameters(operation: str, parameters: Dict[str, Any] | None) -> str:
     """Substitute pyformat parameters into a SQL operation string.
 
-    Uses regex to match only %(name)s tokens, leaving literal percent
-    characters (e.g. SQL LIKE wildcards) untouched.  Values are quoted
-    according to their Python type so the resulting SQL is syntactically
-    correct (see :func:`_quote_value`).
+    Only %(name)s tokens are substituted, leaving literal percent characters
+    (e.g. SQL LIKE wildcards) untouched. Values are quoted according to their
+    Python type so the resulting SQL is syntactically correct (see
+    :func:`_quote_value`). Operations are compiled into templates once, and
+    cached, so that executing the same operation again doesn't parse it again.
     """
     if not parameters:
         return operation
+    return _compile(operation).render(parameters)
 
-    def replacer(match: re.Match) -> str:
-        key = match.group(1)
-        if key not in parameters:
-            raise ProgrammingError(
-                f"Parameter '{key}' not found in provided parameters"
-            )
-        return _quote_value(parameters[key])
 
-    return _PYFORMAT_RE.sub(replacer, operation)
+# Matches plain INSERT INTO statements, inserting the single row of a VALUES
+# clause into a table, optionally into a list of its columns.
+_INSERT_VALUES_RE = re.compile(
+    r"^(?P<head>\s*INSERT\s+INTO\s+[\w.`\"]+\s*(?:\([^()%]*\)\s*)?VALUES\s*)"
+    r"(?P<row>\(.*\))\s*;?\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
 
 
-_TYPE_MAP = {
-    "object": "STRING",
-    "int64": "NUMBER",
-    "float64": "NUMBER",
-    "datetime64[ns]": "DATETIME",
-    "timedelta[ns]": "DATETIME",
-    "bool": "NUMBER",  # Assuming boolean is stored as number
-    "bytes": "BINARY",
-}
+def _is_single_row(row: str) -> bool:
+    """Whether ``row`` is a single parenthesized tuple, e.g. not ``(1), (2)``.
+
+    Parentheses within string literals are ignored.
+    """
+    depth = 0
+    quoted = False
+    for i, char in enumerate(row):
+        if char == "'":
+            quoted = not quoted
+        elif quoted:
+            continue
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth == 0:
+                return i == len(row) - 1
+    return False
+
+
+def _coalesce_statements(
+    operation: str,
+    seq_of_parameters: Iterable[Dict[str, Any]],
+    max_statement_size: int = MAX_STATEMENT_SIZE,
+) -> Iterator[Tuple[str, int | None]]:
+    """Coalesce the executions of an operation into as few statements as possible.
+
+    Only plain ``INSERT INTO table [(columns)] VALUES (...)`` operations are
+    coalesced: the rows of consecutive parameter sets are combined into
+    multi-row ``VALUES`` statements, up to ``max_statement_size`` characters (a
+    single row larger than that is still sent on its own). Other operations
+    are executed once per parameter set.
+
+    Yields each statement with the number of rows it inserts, or None when that
+    number is not known.
+    """
+    match = _INSERT_VALUES_RE.match(operation)
+    if not match or not _is_single_row(match.group("row")):
+        for parameters in seq_of_parameters:
+            yield _substitute_parameters(operation, parameters), None
+        return
+
+    separator = ", "
+    head, row = match.group("head"), match.group("row")
+    rows: List[str] = []
+    size = len(head)
+    for parameters in seq_of_parameters:
+        values = _substitute_parameters(row, parameters)
+        if rows and size + len(separator) + len(values) > max_statement_size:
+            yield head + separator.join(rows), len(rows)
+            rows, size = [], len(head)
+        size += len(values) + (len(separator) if rows else 0)
+        rows.append(values)
+    if rows:
+        yield head + separator.join(rows), len(rows)
+
+
+def _affected_rows(results: Any, default: int | None) -> int | None:
+    """Number of rows affected by a statement, as reported in its results.
+
+    Falls back to ``default`` when the results don't report it.
+    """
+    if (
+        isinstance(results, ArrowResults)
+        and "num_affected_rows" in results.schema.names
+    ):
+        counts = results.take().column("num_affected_rows").to_pylist()
+        return sum(count or 0 for count in counts)
+    return default
+
+
+def _describe_field(field: pyarrow.Field) -> Tuple[Any, ...]:
+    """Builds the PEP-0249 description of a column, from its Arrow field.
+
+    The type code is the Arrow data type of the column, which compares equal to
+    the matching PEP-0249 type object (see :class:`DBAPITypeObject`), or
+    :data:`GEOMETRY` for GeoArrow geometry columns. The internal size is known
+    for fixed-width types, and the precision and scale for decimals.
+    """
+    data_type = field.type
+    try:
+        internal_size = (data_type.bit_width + 7) // 8
+    except ValueError:
+        internal_size = None
+    precision = scale = None
+    if pyarrow.types.is_decimal(data_type):
+        precision, scale = data_type.precision, data_type.scale
+    type_code = GEOMETRY if is_geometry_field(field) else data_type
+    return (
+        field.name,
+        type_code,
+        None,
+        internal_size,
+        precision,
+        scale,
+        field.nullable,
+    )
+
+
+def _describe_schema(schema: pyarrow.Schema | None) -> List[Tuple[Any, ...]] | None:
+    """Builds the PEP-0249 cursor description of results with the given schema."""
+    if not schema:
+        return None
+    return [_describe_field(field) for field in schema]
+
+
+def _to_pandas(table: pyarrow.Table, stats: QueryStats | None) -> pandas.DataFrame:
+    """Converts results to pandas, recording the time it takes in ``stats``."""
+    with tracing.child_span(stats, "wherobots.to_pandas"):
+        start = time.perf_counter()
+        frame: pandas.DataFrame = table.to_pandas()
+    if stats is not None:
+        stats.pandas_time = (stats.pandas_time or 0.0) + time.perf_counter() - start
+    return frame
 
 
 class Cursor:
-    def __init__(self, exec_fn, cancel_fn) -> None:
+    def __init__(
+        self,
+        exec_fn: Callable[..., str],
+        cancel_fn: Callable[[str], None],
+        geometry_representation: GeometryRepresentation | None = None,
+        timeout: float | None = None,
+    ) -> None:
         self.__exec_fn = exec_fn
         self.__cancel_fn = cancel_fn
-
-        self.__queue: queue.Queue = queue.Queue()
-        self.__results: list[Any] | None = None
+        self.__geometry_representation = geometry_representation
+        self.__timeout = timeout
+        self.__progress_handler: ProgressHandler | None = None
+
+        self.__queue: queue.Queue[Any] = queue.Queue()
+        self.__execution_result: ExecutionResult | None = None
+        self.__results: ArrowResults | List[Any] | None = None
+        self.__stream: ResultStream | None = None
+        self.__store: Store | None = None
         self.__store_result: StoreResult | None = None
         self.__current_execution_id: str | None = None
         self.__current_row: int = 0
 
         # Description and row count are set by the last executed operation.
         # Their default values are defined by PEP-0249.
-        self.__description: List[Tuple] | None = None
+        self.__description: List[Tuple[Any, ...]] | None = None
         self.__rowcount: int = -1
 
         # Array-size is also defined by PEP-0249 and is expected to be read/writable.
         self.arraysize: int = 1
 
     @property
-    def description(self) -> List[Tuple] | None:
+    def description(self) -> List[Tuple[Any, ...]] | None:
+        """The PEP-0249 description of the columns of the results.
+
+        Built from the Arrow schema of the results, without decoding their rows,
+        as soon as the first bytes of the results have been received. Reading it
+        never waits for the query to complete: it is None until then, and for
+        queries without results, or whose results are not in Arrow format.
+        """
+        if self.__description is None and self.__current_execution_id:
+            self.__description = _describe_schema(self.__schema())
         return self.__description
 
     @property
     def rowcount(self) -> int:
+        if self.__rowcount < 0 and isinstance(self.__results, ArrowResults):
+            # Unknown (-1) until the end of streamed results has been reached.
+            num_rows = self.__results.num_rows
+            return num_rows if num_rows is not None else -1
         return self.__rowcount
 
-    def __on_execution_result(self, result) -> None:
-        self.__queue.put(result)
+    @property
+    def last_query_stats(self) -> QueryStats | None:
+        """The timings and sizes of the execution of the last query.
 
-    def __get_results(self) -> List[Tuple[Any, ...]] | None:
+        None until the query has completed, or when its results were not
+        received from the SQL session (e.g. when they came from the cache).
+        The time spent decoding the results is recorded once they are fetched.
+        """
+        execution_result = self.__poll()
+        return execution_result.stats if execution_result is not None else None
+
+    def __poll(self) -> ExecutionResult | None:
+        """The execution result of the current query, if it has been received.
+
+        Unlike :meth:`__receive`, never waits for it.
+        """
+        if self.__execution_result is None and self.__current_execution_id:
+            try:
+                execution_result = self.__queue.get_nowait()
+            except queue.Empty:
+                return None
+            if isinstance(execution_result, ExecutionResult):
+                self.__execution_result = execution_result
+        return self.__execution_result
+
+    def __receive(self) -> ExecutionResult:
+        """Waits for the execution result of the current query.
+
+        The connection enforces the query's timeout: a query past its deadline
+        is cancelled and its execution result is a :class:`QueryTimeoutError`.
+        """
         if not self.__current_execution_id:
             raise ProgrammingError("No query has been executed yet")
+        if self.__execution_result is None:
+            execution_result = self.__queue.get()
+            if not isinstance(execution_result, ExecutionResult):
+                raise ProgrammingError("Unexpected result type")
+            self.__execution_result = execution_result
+        return self.__execution_result
+
+    def __schema(self) -> pyarrow.Schema | None:
+        """The Arrow schema of the results, decoding as little as possible.
+
+        None until the results of the query have started arriving.
+        """
+        if isinstance(self.__results, ArrowResults):
+            return self.__results.schema
+        if self.__results is not None:
+            return None
+        execution_result = self.__poll()
+        if execution_result is None or execution_result.error:
+            # Errors are raised when the results are fetched.
+            return None
+        if execution_result.payload is not None:
+            return peek_schema(execution_result.payload)
+        if execution_result.table is not None:
+            return execution_result.table.schema
+        if execution_result.stream is not None:
+            # Opening the stream's reader would wait for the start of the stream.
+            return execution_result.stream.peek_schema()
+        results = self.__get_results()
+        return results.schema if isinstance(results, ArrowResults) else None
+
+    def __get_results(self) -> ArrowResults | List[Any] | None:
         if self.__results is not None:
             return self.__results
 
-        execution_result = self.__queue.get()
-        if not isinstance(execution_result, ExecutionResult):
-            raise ProgrammingError("Unexpected result type")
-
+        execution_result = self.__receive()
         if execution_result.error:
             raise execution_result.error
 
         self.__store_result = execution_result.store_result
-        results = execution_result.results
+        results: Any = execution_result.results
+        if execution_result.stream is not None:
+            # Streamed results are decoded incrementally, as rows are fetched.
+            self.__stream = execution_result.stream
+            results = ArrowResults.from_stream(execution_result.stream)
+        elif execution_result.payload is not None:
+            # Results are decoded here, in the consumer's thread, rather than on
+            # the connection's listener thread.
+            results = decode_results(execution_result.payload)
+            if (
+                execution_result.on_decoded is not None
+                and isinstance(results, ArrowResults)
+                and results.table is not None
+            ):
+                execution_result.on_decoded(results.table)
+        elif execution_result.table is not None:
+            results = ArrowResults(table=execution_result.table)
 
         # Results is None when results are stored in cloud storage
         if results is None:
             return None
 
-        self.__rowcount = len(results)
+        if isinstance(results, pandas.DataFrame):
+            results = ArrowResults(
+                table=pyarrow.Table.from_pandas(results, preserve_index=False)
+            )
+        if not isinstance(results, ArrowResults):
+            self.__rowcount = len(results)
         self.__results = results
-        if not results.empty:
-            self.__description = [
-                (
-                    col_name,  # name
-                    _TYPE_MAP.get(str(results[col_name].dtype), "STRING"),  # type_code
-                    None,  # display_size
-                    results[col_name].memory_usage(),  # internal_size
-                    None,  # precision
-                    None,  # scale
-                    True,  # null_ok; Assuming all columns can accept NULL values
-                )
-                for col_name in results.columns
-            ]
-
         return self.__results
 
+    def __get_rows(self) -> ArrowResults | List[Any]:
+        """The results of the current query, which must have returned some."""
+        results = self.__get_results()
+        if results is None:
+            raise ProgrammingError("The last query did not return any results")
+        return results
+
     def execute(
         self,
         operation: str,
         parameters: Dict[str, Any] | None = None,
         store: Store | None = None,
+        timeout: float | None = None,
+        progress_handler: ProgressHandler | None = None,
     ) -> None:
+        """Execute an operation, binding the given parameters.
+
+        The query is cancelled by the connection if it doesn't complete within
+        ``timeout`` seconds (by default, the timeout of the connection), whether
+        or not its results are being fetched, and fetching its results then
+        raises :class:`QueryTimeoutError`.
+
+        The progress of the query is reported to ``progress_handler`` (by
+        default, the cursor's progress handler), in addition to the
+        connection's progress handler.
+        """
         if self.__current_execution_id:
             self.__cancel_fn(self.__current_execution_id)
+        if self.__stream is not None:
+            self.__stream.close()
 
+        self.__execution_result = None
         self.__results = None
+        self.__stream = None
+        self.__store = store
         self.__store_result = None
         self.__current_row = 0
         self.__rowcount = -1
         self.__description = None
 
+        timeout = timeout if timeout is not None else self.__timeout
+        # Each execution gets its own queue, so that the late result of a
+        # cancelled query can't be taken for the result of the next one.
+        self.__queue = queue.Queue()
+        progress_handler = progress_handler or self.__progress_handler
         self.__current_execution_id = self.__exec_fn(
             _substitute_parameters(operation, parameters),
-            self.__on_execution_result,
+            self.__queue.put,
             store,
+            **({"progress_handler": progress_handler} if progress_handler else {}),
+            **({"timeout": timeout} if timeout is not None else {}),
         )
 
+    def set_progress_handler(self, handler: ProgressHandler | None) -> None:
+        """Register a callback invoked for the progress of this cursor's queries.
+
+        The handler is called for the queries executed afterwards, in addition
+        to the connection's progress handler (see
+        :meth:`wherobots.db.Connection.set_progress_handler`). Pass ``None`` to
+        unregister it.
+        """
+        self.__progress_handler = handler
+
     def get_store_result(self) -> StoreResult | None:
         """Get the store result for the last executed query.
 
@@ -170,40 +517,278 @@ class Cursor:
         self.__get_results()
         return self.__store_result
 
+    def __stored(self) -> Tuple[StoreResult, Store]:
+        """The store result of the current query, and the store it was given."""
+        store_result = self.get_store_result()
+        if store_result is None or self.__store is None:
+            raise ProgrammingError("The last query did not store its results")
+        return store_result, self.__store
+
+    def __downloadable_store_result(self) -> Tuple[StoreResult, Store]:
+        store_result, store = self.__stored()
+        if not store_result.result_uri.startswith(("http://", "https://")):
+            raise NotSupportedError(
+                "Stored results can only be downloaded from a presigned URL; "
+                "see Store.for_download()"
+            )
+        return store_result, store
+
+    def fetch_store_arrow(
+        self, max_workers: int = STORE_DOWNLOAD_WORKERS
+    ) -> pyarrow.RecordBatchReader:
+        """Fetch the results stored in cloud storage as a stream of record batches.
+
+        The stored file is downloaded with up to ``max_workers`` parallel range
+        requests, and decoded into record batches as its parts are received,
+        without being held in memory as a whole.
+
+        Requires the query to have been executed with a presigned URL (see
+        :meth:`Store.for_download`). This method blocks until the query
+        completes.
+        """
+        store_result, store = self.__downloadable_store_result()
+        return download.read(
+            store_result.result_uri,
+            store.format,
+            size=store_result.size,
+            options=store.options,
+            max_workers=max_workers,
+        )
+
+    def download_store_result(
+        self, path: str, max_workers: int = STORE_DOWNLOAD_WORKERS
+    ) -> str:
+        """Download the results stored in cloud storage to a local file.
+
+        The stored file is downloaded with up to ``max_workers`` parallel range
+        requests, each written to the local file as it is received. Returns the
+        path of the local file.
+
+        Requires the query to have been executed with a presigned URL (see
+        :meth:`Store.for_download`). This method blocks until the query
+        completes.
+        """
+        store_result, _ = self.__downloadable_store_result()
+        download.download(
+            store_result.result_uri,
+            path,
+            size=store_result.size,
+            max_workers=max_workers,
+        )
+        return path
+
+    def fetch_store_dataset(
+        self,
+        columns: List[str] | None = None,
+        filter: pyarrow.dataset.Expression | None = None,
+        bbox: dataset.BBox | None = None,
+        filesystem: pyarrow.fs.FileSystem | None = None,
+        max_workers: int = STORE_DOWNLOAD_WORKERS,
+    ) -> pyarrow.RecordBatchReader:
+        """Fetch the files of results stored in cloud storage as record batches.
+
+        Reads the files written with ``Store(single=False)`` concurrently, up to
+        ``max_workers`` at a time. Only the given ``columns`` are read, and only
+        the rows matching ``filter`` and intersecting ``bbox`` (xmin, ymin,
+        xmax, ymax) are returned; files and Parquet row groups that can't match,
+        according to their statistics, are skipped.
+
+        The file system is inferred from the result URI unless ``filesystem``
+        is given. This method blocks until the query completes.
+        """
+        store_result, store = self.__stored()
+        if store_result.result_uri.startswith(("http://", "https://")):
+            raise NotSupportedError(
+                "Results stored with a presigned URL are a single file; "
+                "use fetch_store_arrow()"
+            )
+        stored = dataset.store_dataset(
+            store_result.result_uri, store.format, filesystem
+        )
+        return dataset.read_store_dataset(
+            stored, columns, filter, bbox, max_workers=max_workers
+        )
+
     def executemany(
-        self, operation: str, seq_of_parameters: List[Dict[str, Any]]
+        self,
+        operation: str,
+        seq_of_parameters: Iterable[Dict[str, Any]],
+        max_statement_size: int = MAX_STATEMENT_SIZE,
     ) -> None:
-        raise NotImplementedError
+        """Execute an operation for each of the given parameter sets.
+
+        Executions are coalesced into as few statements as possible (see
+        :func:`_coalesce_statements`), executed one after the other. This method
+        blocks until all of them have completed, and raises the error of the
+        first one that fails.
+
+        Afterwards, ``rowcount`` holds the total number of affected rows, or -1
+        if it can't be determined.
+        """
+        total: int | None = 0
+        for statement, inserted in _coalesce_statements(
+            operation, seq_of_parameters, max_statement_size
+        ):
+            self.execute(statement)
+            affected = _affected_rows(self.__get_results(), inserted)
+            total = None if total is None or affected is None else total + affected
+        self.__rowcount = total if total is not None else -1
+
+    @property
+    def rownumber(self) -> int | None:
+        """The 0-based index of the next row to be fetched (PEP-0249 extension).
+
+        None until the results of the executed query have been received.
+        """
+        if isinstance(self.__results, ArrowResults):
+            return self.__results.position
+        if self.__results is not None:
+            return self.__current_row
+        return None
+
+    def scroll(self, value: int, mode: str = "relative") -> None:
+        """Move to another row of the results (PEP-0249 extension).
+
+        With ``mode="relative"`` (the default), ``value`` is an offset from the
+        current position; with ``mode="absolute"``, it is the target position.
+        Raises IndexError when moving out of the results. Streamed results can
+        only be scrolled forward.
+        """
+        results = self.__get_rows()
+        if mode == "relative":
+            position = (self.rownumber or 0) + value
+        elif mode == "absolute":
+            position = value
+        else:
+            raise ProgrammingError(f"Invalid scroll mode {mode!r}")
+
+        if isinstance(results, ArrowResults):
+            results.seek(position)
+        elif 0 <= position <= len(results):
+            self.__current_row = position
+        else:
+            raise IndexError(f"Row position {position} is out of range")
 
     def fetchone(self) -> Any:
-        results = self.__get_results()[self.__current_row :]
+        """Fetch the next row of the results as a tuple, or None at the end."""
+        results = self.__get_rows()
+        if isinstance(results, ArrowResults):
+            return results.next_row()
+
+        results = results[self.__current_row :]
         if len(results) == 0:
             return None
         self.__current_row += 1
         return results[0]
 
-    def fetchmany(self, size: int = None) -> List[Any]:
+    def fetchmany(self, size: int | None = None) -> List[Any]:
+        """Fetch the next ``size`` rows (``arraysize`` by default) as tuples."""
         size = size or self.arraysize
-        results = self.__get_results()[self.__current_row : self.__current_row + size]
-        self.__current_row += size
+        results = self.__get_rows()
+        if isinstance(results, ArrowResults):
+            return results.rows(size)
+
+        results = results[self.__current_row : self.__current_row + size]
+        self.__current_row += len(results)
         return results
 
-    def fetchall(self) -> List[Any]:
-        return self.__get_results()[self.__current_row :]
+    def fetchall(self) -> Any:
+        """Fetch all remaining rows of the results as a pandas DataFrame."""
+        results = self.__get_rows()
+        if isinstance(results, ArrowResults):
+            return _to_pandas(results.take(), self.last_query_stats)
+
+        return results[self.__current_row :]
+
+    def fetch_arrow_table(self) -> pyarrow.Table:
+        """Fetch all remaining rows of the results as a ``pyarrow.Table``.
+
+        Unlike :meth:`fetchall`, no conversion to pandas takes place; the table
+        is made of the record batches decoded from the Arrow IPC stream.
+        """
+        results = self.__get_results()
+        if not isinstance(results, ArrowResults):
+            raise NotSupportedError("Results are not in Arrow format")
+        return results.take()
+
+    def fetch_record_batches(self) -> pyarrow.RecordBatchReader:
+        """Fetch the remaining rows of the results as a stream of record batches.
+
+        With streamed results, batches are yielded as they are received. Rows
+        read from the returned reader are consumed from the cursor.
+        """
+        results = self.__get_results()
+        if not isinstance(results, ArrowResults):
+            raise NotSupportedError("Results are not in Arrow format")
+        return results.to_reader()
+
+    def fetch_geoarrow(
+        self, geometry_columns: List[str] | None = None
+    ) -> pyarrow.Table:
+        """Fetch all remaining rows as a ``pyarrow.Table`` of GeoArrow geometries.
+
+        Geometry columns are tagged as ``geoarrow.wkb`` or ``geoarrow.wkt``
+        arrays, according to the connection's geometry representation, with
+        the CRS given by the SRID of EWKB and EWKT geometries. They are
+        detected from their values unless ``geometry_columns`` is given. See
+        :func:`wherobots.db.geometry.to_geoarrow`.
+        """
+        return to_geoarrow(
+            self.fetch_arrow_table(),
+            self.__geometry_representation,
+            geometry_columns,
+        )
+
+    def fetch_geodataframe(
+        self,
+        geometry_columns: List[str] | None = None,
+        geometry: str | None = None,
+    ) -> Any:
+        """Fetch all remaining rows as a ``geopandas.GeoDataFrame``.
+
+        Each geometry column is converted with a single vectorized shapely call
+        over the whole column, and ``geometry`` (by default, the first geometry
+        column) is made the active geometry. Requires the ``geopandas`` and
+        ``shapely`` packages. See :func:`wherobots.db.geometry.to_geodataframe`.
+        """
+        return to_geodataframe(
+            self.fetch_arrow_table(),
+            self.__geometry_representation,
+            geometry_columns,
+            geometry,
+        )
 
     def close(self) -> None:
         """Close the cursor."""
-        if self.__results is None and self.__current_execution_id:
+        if not self.__current_execution_id:
+            return
+        if (
+            self.__stream is not None
+            and isinstance(self.__results, ArrowResults)
+            and self.__results.num_rows is None
+        ):
+            # Stop receiving the rest of the streamed results.
+            self.__stream.close()
+            self.__cancel_fn(self.__current_execution_id)
+        elif self.__results is None and self.__execution_result is None:
             self.__cancel_fn(self.__current_execution_id)
 
-    def __iter__(self):
+    def __iter__(self) -> "Cursor":
         return self
 
-    def __next__(self) -> None:
-        raise StopIteration
+    def __next__(self) -> Any:
+        row = self.fetchone()
+        if row is None:
+            raise StopIteration
+        return row
 
-    def __enter__(self):
+    def __enter__(self) -> "Cursor":
         return self
 
-    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
         self.close()
@@ -0,0 +1,115 @@
+"""Reading of multi-file query results stored in cloud storage.
+
+Queries executed with ``Store(single=False)`` write their results as many
+files under a common prefix (see :class:`wherobots.db.Store`). They are read
+here as a ``pyarrow.dataset``: the files are read concurrently, and column
+projections and filters are pushed down to them, so that files, partitions and
+Parquet row groups that can't match a filter, according to their statistics,
+are skipped without being downloaded.
+"""
+
+import json
+from typing import List, Tuple
+
+import pyarrow
+import pyarrow.dataset
+import pyarrow.fs
+
+from .constants import STORE_DOWNLOAD_WORKERS
+from .errors import NotSupportedError, ProgrammingError
+from .types import StorageFormat
+
+BBox = Tuple[float, float, float, float]
+"""A bounding box, as (xmin, ymin, xmax, ymax)."""
+
+_DATASET_FORMATS = {
+    StorageFormat.PARQUET: "parquet",
+    StorageFormat.CSV: "csv",
+}
+
+
+def store_dataset(
+    uri: str,
+    format: StorageFormat = StorageFormat.PARQUET,
+    filesystem: pyarrow.fs.FileSystem | None = None,
+) -> pyarrow.dataset.Dataset:
+    """Opens the results stored under the given URI as a dataset.
+
+    The files under the URI are listed, skipping Spark's metadata files (such
+    as ``_SUCCESS``), and Hive-style partition directories become columns.
+    Without a ``filesystem``, it is inferred from the URI (e.g. S3 for
+    ``s3://`` URIs, using the default AWS credentials).
+    """
+    if format not in _DATASET_FORMATS:
+        raise NotSupportedError(f"Cannot read {format} results as a dataset")
+    if filesystem is None:
+        filesystem, path = pyarrow.fs.FileSystem.from_uri(uri)
+    else:
+        path = uri
+    return pyarrow.dataset.dataset(
+        path,
+        filesystem=filesystem,
+        format=_DATASET_FORMATS[format],
+        partitioning="hive",
+    )
+
+
+def bbox_filter(schema: pyarrow.Schema, bbox: BBox) -> pyarrow.dataset.Expression:
+    """Builds a filter on the geometries intersecting the given bounding box.
+
+    Relies on the bounding box covering column of GeoParquet files (GeoParquet
+    1.1), whose row group statistics allow skipping the row groups outside of
+    the bounding box. Its columns are looked up in the ``geo`` metadata of the
+    schema, or default to a ``bbox`` struct column.
+    """
+    covering = {key: ["bbox", key] for key in ("xmin", "ymin", "xmax", "ymax")}
+    metadata = (schema.metadata or {}).get(b"geo")
+    if metadata:
+        geo = json.loads(metadata)
+        column = geo.get("columns", {}).get(geo.get("primary_column"), {})
+        covering = column.get("covering", {}).get("bbox", covering)
+
+    for path in covering.values():
+        try:
+            schema.field(path[0])
+        except KeyError:
+            raise ProgrammingError(
+                "Results have no bounding box covering column to filter on"
+            ) from None
+
+    def field(key: str) -> pyarrow.dataset.Expression:
+        return pyarrow.dataset.field(*covering[key])
+
+    xmin, ymin, xmax, ymax = bbox
+    return (
+        (field("xmin") <= xmax)
+        & (field("xmax") >= xmin)
+        & (field("ymin") <= ymax)
+        & (field("ymax") >= ymin)
+    )
+
+
+def read_store_dataset(
+    dataset: pyarrow.dataset.Dataset,
+    columns: List[str] | None = None,
+    filter: pyarrow.dataset.Expression | None = None,
+    bbox: BBox | None = None,
+    max_workers: int = STORE_DOWNLOAD_WORKERS,
+) -> pyarrow.RecordBatchReader:
+    """Reads a dataset of stored results as a stream of record batches.
+
+    Only the given ``columns`` are read, and only the rows matching ``filter``
+    and intersecting ``bbox`` (see :func:`bbox_filter`) are returned. Up to
+    ``max_workers`` files are read concurrently, ahead of the batches being
+    consumed.
+    """
+    if bbox is not None:
+        expression = bbox_filter(dataset.schema, bbox)
+        filter = expression if filter is None else filter & expression
+    scanner = dataset.scanner(
+        columns=columns,
+        filter=filter,
+        fragment_readahead=max_workers,
+        use_threads=True,
+    )
+    return scanner.to_reader()
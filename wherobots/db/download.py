@@ -0,0 +1,380 @@
+"""Retrieval of query results stored in cloud storage.
+
+When a query's results are stored as a single file with a presigned URL (see
+:meth:`wherobots.db.Store.for_download`), the file is fetched with parallel
+HTTP range requests. It can either be downloaded to a local file, or decoded
+into Arrow record batches as its parts arrive, without the whole file ever
+being held in memory.
+"""
+
+import concurrent.futures
+import io
+import json
+import os
+import re
+import threading
+from typing import Any, Dict, Iterator, List
+
+import pyarrow
+import pyarrow.csv
+import pyarrow.parquet
+import requests
+import requests.adapters
+
+from .constants import STORE_DOWNLOAD_PART_SIZE, STORE_DOWNLOAD_WORKERS
+from .errors import NotSupportedError, OperationalError
+from .types import StorageFormat
+
+_CONTENT_RANGE_RE = re.compile(r"bytes \d+-\d+/(\d+)")
+
+GEOJSON_BATCH_SIZE = 10_000
+"""The number of GeoJSON features decoded into each record batch."""
+
+
+def _http_session(max_workers: int) -> requests.Session:
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=max_workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _object_size(session: requests.Session, url: str) -> int | None:
+    """Returns the size of the object at the given URL.
+
+    Returns None if the server doesn't support range requests.
+    """
+    with session.get(url, headers={"Range": "bytes=0-0"}, stream=True) as r:
+        r.raise_for_status()
+        match = _CONTENT_RANGE_RE.match(r.headers.get("Content-Range", ""))
+        if r.status_code != 206 or not match:
+            return None
+        return int(match.group(1))
+
+
+def _fetch_range(
+    session: requests.Session, url: str, offset: int, length: int
+) -> bytes:
+    """Fetches ``length`` bytes from ``offset`` with a range request."""
+    headers = {"Range": f"bytes={offset}-{offset + length - 1}"}
+    r = session.get(url, headers=headers)
+    r.raise_for_status()
+    if r.status_code != 206:
+        raise OperationalError("Server does not support HTTP range requests")
+    return r.content
+
+
+class RangedHttpFile(io.RawIOBase):
+    """A read-only, seekable file over an HTTP object, fetched by parts.
+
+    The object is split into ``part_size`` byte parts fetched with range
+    requests by a pool of ``max_workers`` threads. Reading a part prefetches
+    the following ones, so that sequential reads are served from parts
+    downloaded in parallel; only the parts around the current position are
+    held in memory.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        size: int,
+        part_size: int = STORE_DOWNLOAD_PART_SIZE,
+        max_workers: int = STORE_DOWNLOAD_WORKERS,
+        session: requests.Session | None = None,
+    ) -> None:
+        super().__init__()
+        self.url = url
+        self.size = size
+        self.part_size = part_size
+        self.__window = max_workers
+        self.__session = session or _http_session(max_workers)
+        self.__pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers, thread_name_prefix="wherobots-download"
+        )
+        self.__parts: Dict[int, concurrent.futures.Future[bytes]] = {}
+        self.__lock = threading.Lock()
+        self.__position = 0
+
+    @property
+    def num_parts(self) -> int:
+        return (self.size + self.part_size - 1) // self.part_size
+
+    def fetch(self, offset: int, length: int) -> bytes:
+        """Fetches ``length`` bytes from ``offset`` with a range request."""
+        return _fetch_range(self.__session, self.url, offset, length)
+
+    def __part(self, index: int) -> bytes:
+        """Returns the given part, scheduling the download of the next ones."""
+        with self.__lock:
+            for i in range(index, min(index + self.__window, self.num_parts)):
+                if i not in self.__parts:
+                    offset = i * self.part_size
+                    length = min(self.part_size, self.size - offset)
+                    self.__parts[i] = self.__pool.submit(self.fetch, offset, length)
+            # Forget the parts behind, except the last one, often read again
+            # (e.g. Parquet footers).
+            for i in [i for i in self.__parts if i < index - 1]:
+                if i != self.num_parts - 1:
+                    del self.__parts[i]
+            future = self.__parts[index]
+        return future.result()
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.__position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self.__position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError("Negative seek position")
+        self.__position = offset
+        return offset
+
+    def readinto(self, b: Any) -> int:
+        view = memoryview(b).cast("B")
+        filled = 0
+        while filled < len(view) and self.__position < self.size:
+            index, start = divmod(self.__position, self.part_size)
+            part = self.__part(index)
+            n = min(len(view) - filled, len(part) - start)
+            view[filled : filled + n] = part[start : start + n]
+            filled += n
+            self.__position += n
+        return filled
+
+    def close(self) -> None:
+        if not self.closed:
+            with self.__lock:
+                for future in self.__parts.values():
+                    future.cancel()
+                self.__parts.clear()
+            self.__pool.shutdown(wait=False)
+        super().close()
+
+
+def download(
+    url: str,
+    path: str | os.PathLike[str],
+    size: int | None = None,
+    part_size: int = STORE_DOWNLOAD_PART_SIZE,
+    max_workers: int = STORE_DOWNLOAD_WORKERS,
+) -> None:
+    """Downloads the object at the given URL to a local file.
+
+    The object is fetched with up to ``max_workers`` parallel range requests
+    of ``part_size`` bytes, each written to its place in the file as it is
+    received. Servers not supporting range requests are downloaded from in a
+    single request.
+    """
+    session = _http_session(max_workers)
+    try:
+        if size is None:
+            size = _object_size(session, url)
+        _download(session, url, path, size, part_size, max_workers)
+    finally:
+        session.close()
+
+
+def _download(
+    session: requests.Session,
+    url: str,
+    path: str | os.PathLike[str],
+    size: int | None,
+    part_size: int,
+    max_workers: int,
+) -> None:
+    try:
+        with open(path, "wb") as f:
+            if size is None:
+                with session.get(url, stream=True) as r:
+                    r.raise_for_status()
+                    for chunk in r.iter_content(part_size):
+                        f.write(chunk)
+                return
+            f.truncate(size)
+
+        def fetch_part(offset: int) -> None:
+            data = _fetch_range(session, url, offset, min(part_size, size - offset))
+            with open(path, "r+b") as f:
+                f.seek(offset)
+                f.write(data)
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers, thread_name_prefix="wherobots-download"
+        ) as pool:
+            for future in [
+                pool.submit(fetch_part, offset) for offset in range(0, size, part_size)
+            ]:
+                future.result()
+    except BaseException:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+        raise
+
+
+def _geojson_batches(lines: Iterator[bytes]) -> Iterator[List[Dict[str, Any]]]:
+    """Converts GeoJSON features into rows of their properties and geometry.
+
+    Accepts line-delimited features, as written by the SQL session, as well as
+    a single FeatureCollection document. Geometries are kept as GeoJSON text.
+    """
+    rows: List[Dict[str, Any]] = []
+    for line in lines:
+        line = line.strip().rstrip(b",")
+        if not line:
+            continue
+        try:
+            features = [json.loads(line)]
+        except ValueError:
+            # Not line-delimited; read the rest as a single document.
+            features = json.loads(line + b"".join(lines)).get("features", [])
+        if features and features[0].get("type") == "FeatureCollection":
+            features = features[0].get("features", [])
+        for feature in features:
+            row = dict(feature.get("properties") or {})
+            geometry = feature.get("geometry")
+            row["geometry"] = json.dumps(geometry) if geometry is not None else None
+            rows.append(row)
+        if len(rows) >= GEOJSON_BATCH_SIZE:
+            yield rows
+            rows = []
+    if rows:
+        yield rows
+
+
+def _geojson_batch(
+    rows: List[Dict[str, Any]], schema: pyarrow.Schema | None = None
+) -> pyarrow.RecordBatch:
+    """Converts rows of GeoJSON features into a record batch.
+
+    Each property of any of the features is a column, typed from all its values.
+    Given the schema of the first batch, the rows must fit it: properties
+    missing from the rows, or only null in them, are null, but new properties
+    and properties of another type are an error.
+    """
+    names = list(dict.fromkeys(name for row in rows for name in row))
+    names.sort(key=lambda name: name == "geometry")
+    try:
+        batch = pyarrow.RecordBatch.from_pydict(
+            {name: [row.get(name) for row in rows] for name in names}
+        )
+        if schema is None or batch.schema.equals(schema):
+            return batch
+        unified = pyarrow.unify_schemas(
+            [schema, batch.schema], promote_options="permissive"
+        )
+    except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError) as e:
+        raise OperationalError(f"Inconsistent GeoJSON feature properties: {e}") from e
+    if not unified.equals(schema):
+        changed = [
+            field.name
+            for field in unified
+            if schema.get_field_index(field.name) < 0
+            or not schema.field(field.name).type.equals(field.type)
+        ]
+        raise OperationalError(
+            f"Inconsistent GeoJSON feature properties: {', '.join(changed)} "
+            f"differ from those of the first {GEOJSON_BATCH_SIZE} features"
+        )
+    return pyarrow.RecordBatch.from_pydict(
+        {field.name: [row.get(field.name) for row in rows] for field in schema},
+        schema=schema,
+    )
+
+
+def _read_geojson(source: io.RawIOBase) -> pyarrow.RecordBatchReader:
+    """Reads GeoJSON features as record batches.
+
+    The schema is that of the first batch of features, which the next ones
+    are checked against as they are read.
+    """
+    batches = _geojson_batches(iter(io.BufferedReader(source)))
+    first = _geojson_batch(next(batches, []))
+
+    def generate() -> Iterator[pyarrow.RecordBatch]:
+        if first.num_rows:
+            yield first
+        for rows in batches:
+            yield _geojson_batch(rows, first.schema)
+
+    return pyarrow.RecordBatchReader.from_batches(first.schema, generate())
+
+
+def _open(
+    source: io.RawIOBase, format: StorageFormat, options: Dict[str, str]
+) -> pyarrow.RecordBatchReader:
+    if format == StorageFormat.PARQUET:
+        parquet = pyarrow.parquet.ParquetFile(source)
+        return pyarrow.RecordBatchReader.from_batches(
+            parquet.schema_arrow, parquet.iter_batches()
+        )
+    elif format == StorageFormat.CSV:
+        return pyarrow.csv.open_csv(
+            io.BufferedReader(source),
+            read_options=pyarrow.csv.ReadOptions(
+                autogenerate_column_names=options.get("header", "true") == "false"
+            ),
+            parse_options=pyarrow.csv.ParseOptions(
+                delimiter=options.get("delimiter", options.get("sep", ","))
+            ),
+        )
+    elif format == StorageFormat.GEOJSON:
+        return _read_geojson(source)
+    raise NotSupportedError(f"Unsupported storage format {format}")
+
+
+def read(
+    url: str,
+    format: StorageFormat,
+    size: int | None = None,
+    options: Dict[str, str] | None = None,
+    part_size: int = STORE_DOWNLOAD_PART_SIZE,
+    max_workers: int = STORE_DOWNLOAD_WORKERS,
+) -> pyarrow.RecordBatchReader:
+    """Reads the object at the given URL as a stream of Arrow record batches.
+
+    ``format`` and ``options`` are those the results were stored with (see
+    :class:`wherobots.db.Store`). Record batches are decoded as the parts of
+    the object are received: Parquet files row group by row group, CSV and
+    GeoJSON files block by block. The downloads stop, and their connections
+    are released, once the batches are exhausted or the reader is garbage
+    collected.
+    """
+    session = _http_session(max_workers)
+    try:
+        if size is None:
+            size = _object_size(session, url)
+            if size is None:
+                raise NotSupportedError("Server does not support HTTP range requests")
+        source = RangedHttpFile(url, size, part_size, max_workers, session)
+    except BaseException:
+        session.close()
+        raise
+
+    def close() -> None:
+        source.close()
+        session.close()
+
+    try:
+        reader = _open(source, format, options or {})
+    except BaseException:
+        close()
+        raise
+
+    def generate() -> Iterator[pyarrow.RecordBatch]:
+        try:
+            yield from reader
+        finally:
+            close()
+
+    return pyarrow.RecordBatchReader.from_batches(reader.schema, generate())
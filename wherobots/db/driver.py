@@ -3,7 +3,11 @@
 A PEP-0249 compatible driver for interfacing with Wherobots DB.
 """
 
+import functools
+import socket
 import ssl
+import threading
+import time
 from importlib import metadata
 from importlib.metadata import PackageNotFoundError
 import logging
@@ -11,14 +15,20 @@ from packaging.version import Version
 import platform
 import requests
 import tenacity
-from typing import Final, Union, Dict
+from typing import Any, Callable, Dict, Final, ParamSpec, TypeVar, Union
 import urllib.parse
+import urllib.request
+import websockets.extensions.permessage_deflate
 import websockets.sync.client
 import certifi
 
+from .cache import DiskResultCache, ResultCache, cache_scope
+from .compression import AdaptiveCompression
 from .connection import Connection
 from .constants import (
+    DEFAULT_CONNECT_TIMEOUT_SECONDS,
     DEFAULT_ENDPOINT,
+    DEFAULT_PROGRESS_MAX_RATE,
     DEFAULT_REGION,
     DEFAULT_RUNTIME,
     DEFAULT_READ_TIMEOUT_SECONDS,
@@ -27,13 +37,18 @@ from .constants import (
     MAX_MESSAGE_SIZE,
     PARAM_STYLE,
     PROTOCOL_VERSION,
+    SESSION_POLL_MAX_INTERVAL_SECONDS,
+    SESSION_POLL_MIN_INTERVAL_SECONDS,
 )
 from .errors import (
     InterfaceError,
     OperationalError,
 )
+from .models import ConnectTimings, ReconnectPolicy
+from .recording import TrafficRecorder
 from .region import Region
 from .runtime import Runtime
+from .session_cache import SessionCache
 from .session_type import SessionType
 from .types import (
     AppStatus,
@@ -50,8 +65,18 @@ paramstyle: Final[str] = PARAM_STYLE
 # This follows the industry-standard set used by urllib3.util.Retry's status_forcelist.
 TRANSIENT_HTTP_STATUS_CODES = {429, 502, 503, 504}
 
+_P = ParamSpec("_P")
+_R = TypeVar("_R")
 
-def gen_user_agent_header():
+PerMessageDeflate = Union[
+    bool, websockets.extensions.permessage_deflate.ClientPerMessageDeflateFactory
+]
+
+# requests.Session is not thread-safe: each thread gets its own.
+_http_sessions = threading.local()
+
+
+def gen_user_agent_header() -> Dict[str, str]:
     try:
         package_version = metadata.version("wherobots-python-dbapi")
     except PackageNotFoundError:
@@ -76,9 +101,125 @@ def connect(
     force_new: bool = False,
     shutdown_after_inactive_seconds: Union[int, None] = None,
     results_format: Union[ResultsFormat, None] = None,
-    data_compression: Union[DataCompression, None] = None,
+    data_compression: Union[DataCompression, AdaptiveCompression, None] = None,
     geometry_representation: Union[GeometryRepresentation, None] = None,
+    stream_results: bool = False,
+    session_cache: Union[SessionCache, bool, None] = None,
+    reconnect: Union[ReconnectPolicy, None] = None,
+    result_cache: Union[ResultCache, DiskResultCache, None] = None,
+    permessage_deflate: PerMessageDeflate = True,
+    query_timeout: Union[float, None] = None,
+    recorder: Union[TrafficRecorder, None] = None,
+    progress_max_rate: Union[float, None] = DEFAULT_PROGRESS_MAX_RATE,
 ) -> Connection:
+    started = time.perf_counter()
+    timings = ConnectTimings()
+    headers = auth_headers(token, api_key)
+    # Cached results are shared by the connections of the same credentials to
+    # equivalent sessions, like cached sessions are.
+    scope = SessionCache.key(
+        host, token or api_key or "", runtime, region, version, session_type
+    )
+
+    def connect_to(uri: str, open_timeout: float) -> Connection:
+        conn = connect_direct(
+            uri=uri,
+            headers=headers,
+            read_timeout=read_timeout,
+            results_format=results_format,
+            data_compression=data_compression,
+            geometry_representation=geometry_representation,
+            stream_results=stream_results,
+            open_timeout=open_timeout,
+            timings=timings,
+            reconnect=reconnect,
+            result_cache=result_cache,
+            result_cache_scope=scope,
+            permessage_deflate=permessage_deflate,
+            query_timeout=query_timeout,
+            recorder=recorder,
+            progress_max_rate=progress_max_rate,
+        )
+        timings.total = time.perf_counter() - started
+        logging.info("Connected to SQL session: %s", timings)
+        return conn
+
+    cache = resolve_session_cache(session_cache)
+    cache_key = None
+    if cache:
+        cache_key = cache.key(
+            host, token or api_key or "", runtime, region, version, session_type
+        )
+        cached_uri = None if force_new else cache.get(cache_key)
+        if cached_uri:
+            try:
+                timings.session_cache_hit = True
+                return connect_to(cached_uri, cache.connect_timeout)
+            except InterfaceError:
+                logging.info("Cached SQL session is unavailable; reconnecting.")
+                timings = ConnectTimings()
+                cache.invalidate(cache_key)
+
+    start = time.perf_counter()
+    session_id_url = create_session(
+        host=host,
+        headers=headers,
+        runtime=runtime,
+        region=region,
+        version=version,
+        session_type=session_type,
+        force_new=force_new,
+        shutdown_after_inactive_seconds=shutdown_after_inactive_seconds,
+    )
+    timings.create_session = time.perf_counter() - start
+
+    @session_status_retry(wait_timeout)
+    def get_session_uri() -> str:
+        poll_start = time.perf_counter()
+        r = http_session().get(session_id_url, headers=headers)
+        timings.session_polls.append(time.perf_counter() - poll_start)
+        r.raise_for_status()
+        return session_uri_from_status(r.json())
+
+    try:
+        logging.info("Getting SQL session status from %s ...", session_id_url)
+        start = time.perf_counter()
+        session_uri = get_session_uri()
+        timings.session_wait = time.perf_counter() - start
+        logging.debug("SQL session URI from app status: %s", session_uri)
+    except Exception as e:
+        raise InterfaceError("Could not acquire SQL session!", e)
+
+    conn = connect_to(http_to_ws(session_uri), DEFAULT_CONNECT_TIMEOUT_SECONDS)
+    if cache and cache_key:
+        cache.put(cache_key, http_to_ws(session_uri))
+    return conn
+
+
+def http_session() -> requests.Session:
+    """Returns the current thread's HTTP session for requests to the Wherobots API.
+
+    Reusing the session keeps connections to the API alive between requests,
+    saving a TCP and TLS handshake on each SQL session status poll. Sessions
+    are not safe to share between threads, so each thread has its own.
+    """
+    session: Union[requests.Session, None] = getattr(_http_sessions, "session", None)
+    if session is None:
+        session = _http_sessions.session = requests.Session()
+    return session
+
+
+def resolve_session_cache(
+    session_cache: Union[SessionCache, bool, None],
+) -> Union[SessionCache, None]:
+    """Returns the session cache to use; ``True`` selects the default one."""
+    if session_cache is True:
+        return SessionCache()
+    return session_cache or None
+
+
+def auth_headers(token: Union[str, None], api_key: Union[str, None]) -> Dict[str, str]:
+    """Builds the HTTP headers authenticating requests with the given credentials."""
     if not token and not api_key:
         raise ValueError("At least one of `token` or `api_key` is required")
     if token and api_key:
@@ -89,7 +230,20 @@ def connect(
         headers["Authorization"] = f"Bearer {token}"
     elif api_key:
         headers["X-API-Key"] = api_key
+    return headers
 
+
+def create_session(
+    host: str,
+    headers: Dict[str, str],
+    runtime: Union[Runtime, None] = None,
+    region: Union[Region, None] = None,
+    version: Union[str, None] = None,
+    session_type: Union[SessionType, None] = None,
+    force_new: bool = False,
+    shutdown_after_inactive_seconds: Union[int, None] = None,
+) -> str:
+    """Requests a SQL session and returns the URL to poll for its status."""
     host = host or DEFAULT_ENDPOINT
     runtime = runtime or DEFAULT_RUNTIME
     region = region or DEFAULT_REGION
@@ -109,7 +263,7 @@ def connect(
         host = f"https://{host}"
 
     try:
-        resp = requests.post(
+        resp = http_session().post(
             url=f"{host}/sql/session",
             params={"region": region.value, "force_new": force_new},
             json={
@@ -134,11 +288,23 @@ def connect(
 
     # At this point we've been redirected to /sql/session/{session_id}, which we'll need to keep polling until the
     # session is in READY state.
-    session_id_url = resp.url
+    return resp.url
+
+
+def session_status_retry(
+    wait_timeout: float,
+) -> Callable[[Callable[_P, _R]], Callable[_P, _R]]:
+    """Retry policy for polling the SQL session status until it is ready.
 
-    @tenacity.retry(
+    Works for both regular and ``async`` polling functions.
+    """
+    return tenacity.retry(
         stop=tenacity.stop_after_delay(wait_timeout),
-        wait=tenacity.wait_exponential(multiplier=1, min=1, max=5),
+        wait=tenacity.wait_exponential(
+            multiplier=SESSION_POLL_MIN_INTERVAL_SECONDS,
+            min=SESSION_POLL_MIN_INTERVAL_SECONDS,
+            max=SESSION_POLL_MAX_INTERVAL_SECONDS,
+        ),
         retry=(
             tenacity.retry_if_exception(
                 lambda e: (
@@ -150,35 +316,23 @@ def connect(
         ),
         reraise=True,
     )
-    def get_session_uri() -> str:
-        r = requests.get(session_id_url, headers=headers)
-        r.raise_for_status()
-        payload = r.json()
-        status = AppStatus(payload.get("status"))
-        logging.info(" ... %s", status)
-        if status.is_starting():
-            raise tenacity.TryAgain("SQL Session is not ready yet")
-        elif status == AppStatus.READY:
-            return payload["appMeta"]["url"]
-        else:
-            logging.error("SQL session creation failed: %s; should not retry.", status)
-            raise OperationalError(f"Failed to create SQL session: {status}")
 
-    try:
-        logging.info("Getting SQL session status from %s ...", session_id_url)
-        session_uri = get_session_uri()
-        logging.debug("SQL session URI from app status: %s", session_uri)
-    except Exception as e:
-        raise InterfaceError("Could not acquire SQL session!", e)
 
-    return connect_direct(
-        uri=http_to_ws(session_uri),
-        headers=headers,
-        read_timeout=read_timeout,
-        results_format=results_format,
-        data_compression=data_compression,
-        geometry_representation=geometry_representation,
-    )
+def session_uri_from_status(payload: Dict[str, Any]) -> str:
+    """Extracts the SQL session URI from a session status payload.
+
+    Raises tenacity.TryAgain while the session is still starting.
+    """
+    status = AppStatus(payload.get("status", ""))
+    logging.info(" ... %s", status)
+    if status.is_starting():
+        raise tenacity.TryAgain("SQL Session is not ready yet")
+    elif status == AppStatus.READY:
+        uri: str = payload["appMeta"]["url"]
+        return uri
+    else:
+        logging.error("SQL session creation failed: %s; should not retry.", status)
+        raise OperationalError(f"Failed to create SQL session: {status}")
 
 
 def http_to_ws(uri: str) -> str:
@@ -190,29 +344,140 @@ def http_to_ws(uri: str) -> str:
     return str(urllib.parse.urlunparse(parsed))
 
 
+def ssl_context(uri: str) -> Union[ssl.SSLContext, None]:
+    """Returns the TLS configuration for the given WebSocket URI.
+
+    Plain ``ws://`` URIs (e.g. a local SQL session) don't use TLS.
+    """
+    if not uri.startswith("wss:"):
+        return None
+    return _default_ssl_context()
+
+
+@functools.lru_cache(maxsize=None)
+def _default_ssl_context() -> ssl.SSLContext:
+    """The TLS configuration shared by all connections, built only once."""
+    context = ssl.create_default_context()
+    context.load_verify_locations(certifi.where())
+    return context
+
+
+def websocket_compression(permessage_deflate: PerMessageDeflate) -> Dict[str, Any]:
+    """WebSocket connection options for the permessage-deflate extension.
+
+    With ``True``, the extension is negotiated with the default settings of the
+    ``websockets`` library, compressing the JSON control messages (requests
+    and state updates) on the wire. With ``False``, messages are sent as is,
+    which saves the CPU time spent deflating results that are already
+    compressed with a ``DataCompression`` codec. A
+    ``ClientPerMessageDeflateFactory`` negotiates the extension with the given
+    settings (e.g. smaller window bits, to save memory).
+    """
+    if permessage_deflate is True:
+        return {}
+    if permessage_deflate is False:
+        return {"compression": None}
+    return {"compression": None, "extensions": [permessage_deflate]}
+
+
+def open_socket(
+    uri: str, timeout: Union[float, None], timings: ConnectTimings
+) -> Union[socket.socket, None]:
+    """Opens the TCP connection to a SQL session, timing each step.
+
+    Returns None when a proxy is configured, leaving it to websockets to
+    connect through the proxy. The TLS handshake is left to websockets too,
+    so it is timed as part of the WebSocket handshake.
+    """
+    if urllib.request.getproxies():
+        return None
+    parsed = urllib.parse.urlparse(uri)
+    port = parsed.port or (443 if parsed.scheme == "wss" else 80)
+
+    start = time.perf_counter()
+    addresses = socket.getaddrinfo(parsed.hostname, port, type=socket.SOCK_STREAM)
+    timings.dns = time.perf_counter() - start
+
+    start = time.perf_counter()
+    error: Union[OSError, None] = None
+    for family, kind, proto, _, address in addresses:
+        sock = socket.socket(family, kind, proto)
+        try:
+            sock.settimeout(timeout)
+            sock.connect(address)
+        except OSError as e:
+            sock.close()
+            error = e
+            continue
+        sock.settimeout(None)
+        timings.tcp_connect = time.perf_counter() - start
+        return sock
+    raise error or OSError(f"Could not resolve {parsed.hostname}")
+
+
 def connect_direct(
     uri: str,
     protocol: Version = PROTOCOL_VERSION,
     headers: Union[Dict[str, str], None] = None,
     read_timeout: float = DEFAULT_READ_TIMEOUT_SECONDS,
     results_format: Union[ResultsFormat, None] = None,
-    data_compression: Union[DataCompression, None] = None,
+    data_compression: Union[DataCompression, AdaptiveCompression, None] = None,
     geometry_representation: Union[GeometryRepresentation, None] = None,
+    stream_results: bool = False,
+    open_timeout: Union[float, None] = DEFAULT_CONNECT_TIMEOUT_SECONDS,
+    timings: Union[ConnectTimings, None] = None,
+    reconnect: Union[ReconnectPolicy, None] = None,
+    result_cache: Union[ResultCache, DiskResultCache, None] = None,
+    permessage_deflate: PerMessageDeflate = True,
+    query_timeout: Union[float, None] = None,
+    recorder: Union[TrafficRecorder, None] = None,
+    progress_max_rate: Union[float, None] = DEFAULT_PROGRESS_MAX_RATE,
+    result_cache_scope: Union[str, None] = None,
 ) -> Connection:
+    """Connects to the SQL session at the given WebSocket URI.
+
+    The time spent connecting is recorded in ``timings``, when given, and
+    available as the connection's ``connect_timings``.
+
+    If the connection is lost, it is reestablished following the ``reconnect``
+    policy, when given. Running queries are only reattached if the SQL session
+    speaks a ``protocol`` supporting it (``REATTACH_PROTOCOL_VERSION``);
+    otherwise they fail with an :class:`OperationalError`.
+
+    Query results are cached in ``result_cache``, when given (see
+    :class:`wherobots.db.cache.ResultCache` and
+    :class:`wherobots.db.cache.DiskResultCache`), and only shared with the
+    connections of the same ``result_cache_scope``; by default, connections
+    to the same URI with the same credentials.
+
+    ``permessage_deflate`` configures the compression of WebSocket messages
+    (see :func:`websocket_compression`). Pass an
+    :class:`wherobots.db.compression.AdaptiveCompression` as
+    ``data_compression`` to select the codec of each query's results adaptively.
+
+    Queries that don't complete within ``query_timeout`` seconds are cancelled
+    (see :meth:`wherobots.db.Cursor.execute`).
+
+    The traffic of the connection is recorded with ``recorder``, when given (see
+    :class:`wherobots.db.recording.TrafficRecorder`).
+
+    Progress is delivered to progress handlers at most ``progress_max_rate``
+    times per second per query (see :meth:`Connection.set_progress_handler`).
+    """
     uri_with_protocol = f"{uri}/{protocol}"
+    started = time.perf_counter()
+    if timings is None:
+        timings = ConnectTimings()
+    if result_cache_scope is None:
+        credentials = {
+            k: v for k, v in (headers or {}).items() if k.lower() != "user-agent"
+        }
+        result_cache_scope = cache_scope(uri, sorted(credentials.items()))
 
-    try:
-        logging.info("Connecting to SQL session at %s ...", uri_with_protocol)
-        ssl_context = ssl.create_default_context()
-        ssl_context.load_verify_locations(certifi.where())
-        ws = websockets.sync.client.connect(
-            uri=uri_with_protocol,
-            additional_headers=headers,
-            max_size=MAX_MESSAGE_SIZE,
-            ssl=ssl_context,
-        )
-    except Exception as e:
-        raise InterfaceError("Failed to connect to SQL session!") from e
+    ws = open_websocket(
+        uri_with_protocol, headers, open_timeout, timings, permessage_deflate
+    )
+    timings.total = time.perf_counter() - started
 
     return Connection(
         ws,
@@ -220,4 +485,53 @@ def connect_direct(
         results_format=results_format,
         data_compression=data_compression,
         geometry_representation=geometry_representation,
+        stream_results=stream_results,
+        connect_timings=timings,
+        reconnect=functools.partial(
+            open_websocket,
+            uri_with_protocol,
+            headers,
+            open_timeout,
+            permessage_deflate=permessage_deflate,
+        ),
+        reconnect_policy=reconnect,
+        result_cache=result_cache,
+        result_cache_scope=result_cache_scope,
+        query_timeout=query_timeout,
+        recorder=recorder,
+        progress_max_rate=progress_max_rate,
+        protocol=protocol,
     )
+
+
+def open_websocket(
+    uri: str,
+    headers: Union[Dict[str, str], None],
+    open_timeout: Union[float, None],
+    timings: Union[ConnectTimings, None] = None,
+    permessage_deflate: PerMessageDeflate = True,
+) -> websockets.sync.client.ClientConnection:
+    """Opens the WebSocket to the SQL session at the given URI."""
+    if timings is None:
+        timings = ConnectTimings()
+
+    sock = None
+    try:
+        logging.info("Connecting to SQL session at %s ...", uri)
+        sock = open_socket(uri, open_timeout, timings)
+        start = time.perf_counter()
+        ws: websockets.sync.client.ClientConnection = websockets.sync.client.connect(
+            uri=uri,
+            additional_headers=headers,
+            max_size=MAX_MESSAGE_SIZE,
+            ssl=ssl_context(uri),
+            open_timeout=open_timeout,
+            sock=sock,
+            **websocket_compression(permessage_deflate),
+        )
+        timings.websocket_handshake = time.perf_counter() - start
+    except Exception as e:
+        if sock is not None:
+            sock.close()
+        raise InterfaceError("Failed to connect to SQL session!") from e
+    return ws
@@ -24,3 +24,7 @@ class ProgrammingError(DatabaseError):
 
 class NotSupportedError(DatabaseError):
     pass
+
+
+class QueryTimeoutError(OperationalError):
+    """A query did not complete within its timeout, and was cancelled."""
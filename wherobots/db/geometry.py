@@ -0,0 +1,279 @@
+"""Vectorized handling of the geometry columns of query results.
+
+Geometries are received in the representation requested from the SQL session
+(see :class:`wherobots.db.types.GeometryRepresentation`): WKB or EWKB binary
+values, or WKT, EWKT or GeoJSON strings. Rather than converting them one value
+at a time, this module keeps them in their Arrow arrays, and either tags them
+as GeoArrow extension arrays, or converts them to shapely geometries with a
+single vectorized call per column.
+
+The conversion to GeoPandas requires the optional ``geopandas`` and
+``shapely`` packages (``pip install wherobots-python-dbapi[geo]``).
+"""
+
+import json
+import logging
+import re
+from typing import Any, List
+
+import numpy
+import pyarrow
+import pyarrow.compute
+
+from .types import GEOMETRY, GeometryRepresentation
+
+EXTENSION_NAME = b"ARROW:extension:name"
+EXTENSION_METADATA = b"ARROW:extension:metadata"
+GEOARROW_WKB = "geoarrow.wkb"
+GEOARROW_WKT = "geoarrow.wkt"
+
+# The representation the SQL session sends geometries in, by default.
+DEFAULT_GEOMETRY_REPRESENTATION = GeometryRepresentation.EWKT
+
+_EWKB_SRID_FLAG = 0x20000000
+_EWKT_SRID_RE = r"^SRID=(?P<srid>\d+);"
+_WKT_RE = re.compile(
+    r"^\s*(SRID=\d+;\s*)?(POINT|LINESTRING|POLYGON|MULTIPOINT|MULTILINESTRING|"
+    r"MULTIPOLYGON|GEOMETRYCOLLECTION|TRIANGLE|TIN|POLYHEDRALSURFACE)\b",
+    re.IGNORECASE,
+)
+_GEOJSON_TYPES = {
+    "Point",
+    "LineString",
+    "Polygon",
+    "MultiPoint",
+    "MultiLineString",
+    "MultiPolygon",
+    "GeometryCollection",
+}
+
+
+def is_geometry_field(field: pyarrow.Field) -> bool:
+    """Whether the field is tagged as a GeoArrow geometry column."""
+    extension = (field.metadata or {}).get(EXTENSION_NAME, b"")
+    return bool(extension.startswith(b"geoarrow.") or field.type == GEOMETRY)
+
+
+def _first_value(column: pyarrow.ChunkedArray) -> Any:
+    for chunk in column.chunks:
+        valid = chunk.drop_null()
+        if len(valid):
+            return valid[0].as_py()
+    return None
+
+
+def _is_geometry(value: Any, representation: GeometryRepresentation) -> bool:
+    """Whether the given value looks like a geometry in the given representation."""
+    if representation in (GeometryRepresentation.WKB, GeometryRepresentation.EWKB):
+        return (
+            isinstance(value, bytes)
+            and len(value) >= 5
+            and value[0] in (0, 1)
+            and int.from_bytes(value[1:5], "little" if value[0] else "big") & 0xFFFF
+            < 4000
+        )
+    if not isinstance(value, str):
+        return False
+    if representation == GeometryRepresentation.GEOJSON:
+        try:
+            return json.loads(value).get("type") in _GEOJSON_TYPES
+        except (ValueError, AttributeError):
+            return False
+    return _WKT_RE.match(value) is not None
+
+
+def geometry_columns(
+    table: pyarrow.Table, representation: GeometryRepresentation | None = None
+) -> List[str]:
+    """Names the columns of the table that hold geometries.
+
+    Columns already tagged as GeoArrow arrays are geometry columns; others are
+    recognized by their type and their first value.
+    """
+    representation = representation or DEFAULT_GEOMETRY_REPRESENTATION
+    binary = representation in (GeometryRepresentation.WKB, GeometryRepresentation.EWKB)
+    names = []
+    for field, column in zip(table.schema, table.columns):
+        if binary:
+            candidate = pyarrow.types.is_binary(
+                field.type
+            ) or pyarrow.types.is_large_binary(field.type)
+        else:
+            candidate = pyarrow.types.is_string(
+                field.type
+            ) or pyarrow.types.is_large_string(field.type)
+        if is_geometry_field(field) or (
+            candidate and _is_geometry(_first_value(column), representation)
+        ):
+            names.append(field.name)
+    return names
+
+
+def _ewkb_srids(chunk: pyarrow.Array) -> numpy.ndarray:
+    """Extracts the SRIDs of EWKB values from their headers, 0 when absent."""
+    srids = numpy.zeros(len(chunk), dtype=numpy.int64)
+    if chunk.null_count == len(chunk):
+        # Also covers empty chunks; the buffers of all-null chunks may be missing.
+        return srids
+    _, offsets_buffer, data_buffer = chunk.buffers()
+    if offsets_buffer is None or data_buffer is None:
+        return srids
+    offset_type: type[numpy.signedinteger[Any]] = (
+        numpy.int64 if pyarrow.types.is_large_binary(chunk.type) else numpy.int32
+    )
+    offsets = numpy.frombuffer(offsets_buffer, dtype=offset_type)[
+        chunk.offset : chunk.offset + len(chunk) + 1
+    ]
+    data = numpy.frombuffer(data_buffer, dtype=numpy.uint8)
+    starts = offsets[:-1]
+    # A header with an SRID is made of the byte order, type and SRID (9 bytes).
+    rows = numpy.flatnonzero(
+        (offsets[1:] - starts >= 9) & chunk.is_valid().to_numpy(zero_copy_only=False)
+    )
+    starts = starts[rows].astype(numpy.int64)
+
+    def uint32(at: numpy.ndarray, little: numpy.ndarray) -> numpy.ndarray:
+        b = [data[at + i].astype(numpy.uint32) for i in range(4)]
+        value: numpy.ndarray = numpy.where(
+            little,
+            b[0] | b[1] << 8 | b[2] << 16 | b[3] << 24,
+            b[3] | b[2] << 8 | b[1] << 16 | b[0] << 24,
+        )
+        return value
+
+    little = data[starts] == 1
+    has_srid = (uint32(starts + 1, little) & _EWKB_SRID_FLAG) != 0
+    srids[rows[has_srid]] = uint32(starts[has_srid] + 5, little[has_srid]).astype(
+        numpy.int32
+    )
+    return srids
+
+
+def _crs(srids: numpy.ndarray, column: str) -> str | None:
+    """The CRS of a column, from the SRIDs of its geometries."""
+    unique = numpy.unique(srids[srids != 0])
+    if len(unique) > 1:
+        logging.warning(
+            "Geometries of column %s have different SRIDs %s; ignoring them.",
+            column,
+            unique.tolist(),
+        )
+        return None
+    return f"EPSG:{unique[0]}" if len(unique) else None
+
+
+def _geoarrow_column(
+    name: str,
+    column: pyarrow.ChunkedArray,
+    representation: GeometryRepresentation,
+) -> tuple[pyarrow.Field, pyarrow.ChunkedArray]:
+    """Tags a geometry column as a GeoArrow array, with its CRS if known."""
+    crs = None
+    if representation == GeometryRepresentation.EWKB:
+        srids = [_ewkb_srids(chunk) for chunk in column.chunks]
+        crs = _crs(numpy.concatenate(srids) if srids else numpy.zeros(0), name)
+    elif representation == GeometryRepresentation.EWKT:
+        extracted = pyarrow.compute.extract_regex(column, _EWKT_SRID_RE)
+        srids = pyarrow.compute.cast(
+            pyarrow.compute.struct_field(extracted, [0]), pyarrow.int64()
+        )
+        crs = _crs(srids.fill_null(0).to_numpy(), name)
+        column = pyarrow.compute.replace_substring_regex(column, _EWKT_SRID_RE, "")
+
+    extension = (
+        GEOARROW_WKB
+        if representation in (GeometryRepresentation.WKB, GeometryRepresentation.EWKB)
+        else GEOARROW_WKT
+    )
+    extension_metadata = {"crs": crs, "crs_type": "authority_code"} if crs else {}
+    metadata = {
+        EXTENSION_NAME: extension.encode(),
+        EXTENSION_METADATA: json.dumps(extension_metadata).encode(),
+    }
+    return pyarrow.field(name, column.type, metadata=metadata), column
+
+
+def to_geoarrow(
+    table: pyarrow.Table,
+    representation: GeometryRepresentation | None = None,
+    columns: List[str] | None = None,
+) -> pyarrow.Table:
+    """Tags the geometry columns of the table as GeoArrow arrays.
+
+    WKB and EWKB columns become ``geoarrow.wkb`` arrays and WKT and EWKT
+    columns ``geoarrow.wkt`` arrays, without copying the geometries (except to
+    strip the SRID prefix of EWKT values). The CRS of EWKB and EWKT columns is
+    derived from the SRID of their geometries. GeoJSON columns, which have no
+    GeoArrow encoding, are left as they are. ``columns`` are the geometry
+    columns, detected with :func:`geometry_columns` when not given.
+    """
+    representation = representation or DEFAULT_GEOMETRY_REPRESENTATION
+    if columns is None:
+        columns = geometry_columns(table, representation)
+    if representation == GeometryRepresentation.GEOJSON:
+        return table
+    for name in columns:
+        index = table.schema.get_field_index(name)
+        if (table.schema.field(index).metadata or {}).get(EXTENSION_NAME):
+            continue
+        field, column = _geoarrow_column(name, table.column(index), representation)
+        table = table.set_column(index, field, column)
+    return table
+
+
+def _import_geopandas() -> Any:
+    try:
+        import geopandas
+        import shapely
+    except ImportError as e:
+        raise ImportError(
+            "GeoPandas and shapely are required to fetch GeoDataFrames; "
+            "install them with: pip install wherobots-python-dbapi[geo]"
+        ) from e
+    return geopandas, shapely
+
+
+def to_geodataframe(
+    table: pyarrow.Table,
+    representation: GeometryRepresentation | None = None,
+    columns: List[str] | None = None,
+    geometry: str | None = None,
+) -> Any:
+    """Converts the table to a ``geopandas.GeoDataFrame``.
+
+    Each geometry column is converted to shapely geometries with a single
+    vectorized call over the whole column (``shapely.from_wkb``,
+    ``shapely.from_wkt`` or ``shapely.from_geojson``). The active geometry
+    column is ``geometry``, by default the first geometry column.
+    """
+    geopandas, shapely = _import_geopandas()
+    representation = representation or DEFAULT_GEOMETRY_REPRESENTATION
+    if columns is None:
+        columns = geometry_columns(table, representation)
+    table = to_geoarrow(table, representation, columns)
+
+    geometries = {}
+    for name in columns:
+        field = table.schema.field(name)
+        metadata = field.metadata or {}
+        extension = metadata.get(EXTENSION_NAME, b"").decode()
+        values = table.column(name).to_numpy(zero_copy_only=False)
+        if extension == GEOARROW_WKB:
+            shapes = shapely.from_wkb(values)
+        elif extension == GEOARROW_WKT:
+            shapes = shapely.from_wkt(values)
+        else:
+            shapes = shapely.from_geojson(values)
+        crs = json.loads(metadata.get(EXTENSION_METADATA) or "{}").get("crs")
+        if representation == GeometryRepresentation.GEOJSON:
+            # GeoJSON coordinates are always WGS84 longitudes and latitudes.
+            crs = "OGC:CRS84"
+        geometries[name] = geopandas.GeoSeries(shapes, crs=crs)
+
+    frame = table.drop_columns(columns).to_pandas()
+    for index, name in enumerate(table.column_names):
+        if name in geometries:
+            frame.insert(index, name, geometries[name])
+    if not geometries:
+        return geopandas.GeoDataFrame(frame)
+    return geopandas.GeoDataFrame(frame, geometry=geometry or columns[0])
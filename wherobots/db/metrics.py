@@ -0,0 +1,276 @@
+"""Operational metrics of connections to Wherobots SQL sessions.
+
+Each connection aggregates metrics about the queries it executes and the
+frames it receives in a :class:`ConnectionMetrics` registry. The registry is
+pulled with :meth:`wherobots.db.Connection.metrics`, which returns an immutable
+:class:`MetricsSnapshot`; :func:`to_prometheus` renders snapshots in the
+Prometheus text exposition format, to be served to a Prometheus scraper.
+"""
+
+import bisect
+import math
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Mapping, Sequence, Tuple
+
+from .constants import METRICS_DURATION_BUCKETS
+from .types import ExecutionState
+
+
+@dataclass(frozen=True)
+class HistogramSnapshot:
+    """A snapshot of a histogram of durations, in seconds.
+
+    Attributes:
+        buckets: The upper bounds of the buckets, the last one being infinite.
+        counts: The cumulative number of observations in each bucket.
+        sum: The sum of all observations.
+    """
+
+    buckets: Tuple[float, ...]
+    counts: Tuple[int, ...]
+    sum: float
+
+    @property
+    def count(self) -> int:
+        """The number of observations."""
+        return self.counts[-1] if self.counts else 0
+
+
+class Histogram:
+    """A thread-safe histogram of durations, with fixed buckets."""
+
+    def __init__(self, buckets: Sequence[float] = METRICS_DURATION_BUCKETS) -> None:
+        self.__buckets = tuple(sorted(buckets)) + (math.inf,)
+        self.__counts = [0] * len(self.__buckets)
+        self.__sum = 0.0
+        self.__lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.__buckets, value)
+        with self.__lock:
+            self.__counts[index] += 1
+            self.__sum += value
+
+    def snapshot(self) -> HistogramSnapshot:
+        with self.__lock:
+            counts = list(self.__counts)
+            total = self.__sum
+        for i in range(1, len(counts)):
+            counts[i] += counts[i - 1]
+        return HistogramSnapshot(self.__buckets, tuple(counts), total)
+
+
+@dataclass(frozen=True)
+class MetricsSnapshot:
+    """A snapshot of the metrics of a connection.
+
+    Attributes:
+        queries_started: The number of queries submitted to the SQL session.
+        queries_completed: The number of queries whose results were received.
+        queries_failed: The number of failed queries.
+        queries_cancelled: The number of cancelled queries.
+        queries_timed_out: The number of queries cancelled for not completing
+            within their timeout (also counted as cancelled).
+        queries_in_flight: The number of queries that haven't finished yet.
+        frames_received: The number of WebSocket frames received, by encoding
+            (``json`` or ``cbor``).
+        frame_bytes_received: The size of the frames received, by encoding
+            (in characters for JSON frames).
+        results_received: The number of result messages (or chunks) received,
+            by results format and compression codec (``none`` if uncompressed).
+        result_bytes_received: The size of the results received, by results
+            format and compression codec.
+        read_timeouts: The number of times the listener waited for a message
+            for the whole read timeout without receiving any.
+        decode_time: The time spent decoding complete results, whatever their
+            format (Arrow or JSON).
+        message_handling_time: The time the listener spent handling each
+            message, from its receipt until the listener is ready for the
+            next one. It bounds how long the following messages wait, but
+            doesn't include the time they spent queued in the WebSocket.
+    """
+
+    queries_started: int = 0
+    queries_completed: int = 0
+    queries_failed: int = 0
+    queries_cancelled: int = 0
+    queries_timed_out: int = 0
+    queries_in_flight: int = 0
+    frames_received: Dict[str, int] = field(default_factory=dict)
+    frame_bytes_received: Dict[str, int] = field(default_factory=dict)
+    results_received: Dict[Tuple[str, str], int] = field(default_factory=dict)
+    result_bytes_received: Dict[Tuple[str, str], int] = field(default_factory=dict)
+    read_timeouts: int = 0
+    decode_time: HistogramSnapshot = field(
+        default_factory=lambda: Histogram().snapshot()
+    )
+    message_handling_time: HistogramSnapshot = field(
+        default_factory=lambda: Histogram().snapshot()
+    )
+
+
+class ConnectionMetrics:
+    """The thread-safe registry of the metrics of a connection."""
+
+    def __init__(self) -> None:
+        self.__lock = threading.Lock()
+        self.__queries_started = 0
+        self.__queries_finished: Dict[ExecutionState, int] = {}
+        self.__queries_timed_out = 0
+        self.__frames: Dict[str, int] = {}
+        self.__frame_bytes: Dict[str, int] = {}
+        self.__results: Dict[Tuple[str, str], int] = {}
+        self.__result_bytes: Dict[Tuple[str, str], int] = {}
+        self.__read_timeouts = 0
+        self.__decode_time = Histogram()
+        self.__message_handling_time = Histogram()
+
+    def query_started(self) -> None:
+        with self.__lock:
+            self.__queries_started += 1
+
+    def query_finished(self, state: ExecutionState) -> None:
+        with self.__lock:
+            self.__queries_finished[state] = self.__queries_finished.get(state, 0) + 1
+
+    def query_timed_out(self) -> None:
+        with self.__lock:
+            self.__queries_timed_out += 1
+
+    def frame_received(self, encoding: str, size: int) -> None:
+        with self.__lock:
+            self.__frames[encoding] = self.__frames.get(encoding, 0) + 1
+            self.__frame_bytes[encoding] = self.__frame_bytes.get(encoding, 0) + size
+
+    def results_received(
+        self, format: str | None, compression: str | None, size: int
+    ) -> None:
+        key = (format or "unknown", compression or "none")
+        with self.__lock:
+            self.__results[key] = self.__results.get(key, 0) + 1
+            self.__result_bytes[key] = self.__result_bytes.get(key, 0) + size
+
+    def read_timeout(self) -> None:
+        with self.__lock:
+            self.__read_timeouts += 1
+
+    def decoded(self, seconds: float) -> None:
+        self.__decode_time.observe(seconds)
+
+    def message_handled(self, seconds: float) -> None:
+        self.__message_handling_time.observe(seconds)
+
+    def snapshot(self, queries_in_flight: int = 0) -> MetricsSnapshot:
+        with self.__lock:
+            finished = dict(self.__queries_finished)
+            return MetricsSnapshot(
+                queries_started=self.__queries_started,
+                queries_completed=finished.get(ExecutionState.COMPLETED, 0),
+                queries_failed=finished.get(ExecutionState.FAILED, 0),
+                queries_cancelled=finished.get(ExecutionState.CANCELLED, 0),
+                queries_timed_out=self.__queries_timed_out,
+                queries_in_flight=queries_in_flight,
+                frames_received=dict(self.__frames),
+                frame_bytes_received=dict(self.__frame_bytes),
+                results_received=dict(self.__results),
+                result_bytes_received=dict(self.__result_bytes),
+                read_timeouts=self.__read_timeouts,
+                decode_time=self.__decode_time.snapshot(),
+                message_handling_time=self.__message_handling_time.snapshot(),
+            )
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: Mapping[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = (f'{name}="{_escape(value)}"' for name, value in labels.items())
+    return "{" + ",".join(pairs) + "}"
+
+
+def _float(value: float) -> str:
+    return "+Inf" if value == math.inf else repr(float(value))
+
+
+def to_prometheus(
+    snapshots: MetricsSnapshot | Mapping[str, MetricsSnapshot],
+    label: str = "connection",
+    prefix: str = "wherobots_db",
+) -> str:
+    """Renders metrics snapshots in the Prometheus text exposition format.
+
+    ``snapshots`` is a single snapshot, or snapshots of several connections by
+    name, told apart by their ``label`` label.
+    """
+    if isinstance(snapshots, MetricsSnapshot):
+        snapshots = {"": snapshots}
+    lines: List[str] = []
+
+    def family(name: str, kind: str, help: str) -> str:
+        name = f"{prefix}_{name}"
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {kind}")
+        return name
+
+    def base(connection: str) -> Dict[str, str]:
+        return {label: connection} if connection else {}
+
+    for attr, kind, help in (
+        ("queries_started", "counter", "Queries submitted to the SQL session."),
+        ("queries_completed", "counter", "Queries whose results were received."),
+        ("queries_failed", "counter", "Failed queries."),
+        ("queries_cancelled", "counter", "Cancelled queries."),
+        ("queries_timed_out", "counter", "Queries cancelled by their timeout."),
+        ("queries_in_flight", "gauge", "Queries that haven't finished yet."),
+        ("read_timeouts", "counter", "Read timeouts of the connection listener."),
+    ):
+        name = family(
+            f"{attr}_total" if kind == "counter" else attr,
+            kind,
+            help,
+        )
+        for connection, snapshot in snapshots.items():
+            lines.append(f"{name}{_labels(base(connection))} {getattr(snapshot, attr)}")
+
+    for attr, help in (
+        ("frames_received", "WebSocket frames received, by encoding."),
+        ("frame_bytes_received", "Bytes of WebSocket frames received, by encoding."),
+    ):
+        name = family(f"{attr}_total", "counter", help)
+        for connection, snapshot in snapshots.items():
+            for encoding, value in sorted(getattr(snapshot, attr).items()):
+                labels = {**base(connection), "encoding": encoding}
+                lines.append(f"{name}{_labels(labels)} {value}")
+
+    for attr, help in (
+        ("results_received", "Result messages received, by format and codec."),
+        ("result_bytes_received", "Bytes of results received, by format and codec."),
+    ):
+        name = family(f"{attr}_total", "counter", help)
+        for connection, snapshot in snapshots.items():
+            for (format, codec), value in sorted(getattr(snapshot, attr).items()):
+                labels = {**base(connection), "format": format, "codec": codec}
+                lines.append(f"{name}{_labels(labels)} {value}")
+
+    for attr, help in (
+        ("decode_time", "Time spent decoding results."),
+        (
+            "message_handling_time",
+            "Time the connection listener spent handling a message.",
+        ),
+    ):
+        name = family(f"{attr}_seconds", "histogram", help)
+        for connection, snapshot in snapshots.items():
+            histogram: HistogramSnapshot = getattr(snapshot, attr)
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                labels = {**base(connection), "le": _float(bound)}
+                lines.append(f"{name}_bucket{_labels(labels)} {count}")
+            labels = base(connection)
+            lines.append(f"{name}_sum{_labels(labels)} {_float(histogram.sum)}")
+            lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+
+    return "\n".join(lines) + "\n"
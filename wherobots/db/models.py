@@ -1,10 +1,15 @@
-from dataclasses import dataclass
-from typing import Any, Dict
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Dict, List
 
 import pandas
+import pyarrow
 
 from .constants import DEFAULT_STORAGE_FORMAT
-from .types import StorageFormat
+from .types import ExecutionState, StorageFormat
+
+if TYPE_CHECKING:
+    from .results import ResultStream
 
 
 @dataclass(frozen=True)
@@ -94,6 +99,99 @@ class Store:
         return d
 
 
+@dataclass
+class QueryStats:
+    """Timings and sizes of the execution of a query, to analyze its latency.
+
+    The time a query spends on the SQL session, on the wire, and decoding its
+    results in the client can be told apart from the times at which it reached
+    each state of its execution.
+
+    Attributes:
+        execution_id: The execution ID of the query.
+        submitted_at: When the query was submitted, as a POSIX timestamp.
+        states: The seconds from the submission of the query until it reached
+            each of the states of its execution.
+        bytes_received: The size of the (compressed) results received.
+        frames_received: The number of WebSocket frames of the results.
+        format: The format of the results.
+        compression: The compression codec of the results, if any.
+        decompression_time: The seconds spent decompressing the results.
+        decode_time: The seconds spent decoding the decompressed results.
+        pandas_time: The seconds spent converting the results to pandas.
+        error: The error the query failed with, if any.
+        span: The OpenTelemetry span of the query, when tracing is enabled.
+    """
+
+    execution_id: str
+    submitted_at: float = field(default_factory=time.time)
+    states: Dict[ExecutionState, float] = field(default_factory=dict)
+    bytes_received: int = 0
+    frames_received: int = 0
+    format: str | None = None
+    compression: str | None = None
+    decompression_time: float | None = None
+    decode_time: float | None = None
+    pandas_time: float | None = None
+    error: str | None = None
+    span: Any = field(default=None, repr=False, compare=False)
+    started: float = field(default_factory=time.perf_counter, repr=False)
+
+    def mark(self, state: ExecutionState) -> None:
+        """Records the time at which the query reached the given state."""
+        if state in self.states:
+            return
+        self.states[state] = time.perf_counter() - self.started
+        if self.span is not None:
+            self.span.add_event(f"wherobots.{state.value}")
+
+    def elapsed(self, start: ExecutionState, end: ExecutionState) -> float | None:
+        """The seconds between two states of the query, if it reached both."""
+        if start not in self.states or end not in self.states:
+            return None
+        return self.states[end] - self.states[start]
+
+    @property
+    def execution_time(self) -> float | None:
+        """The seconds from the submission of the query until it succeeded."""
+        return self.elapsed(
+            ExecutionState.EXECUTION_REQUESTED, ExecutionState.SUCCEEDED
+        )
+
+    @property
+    def transfer_time(self) -> float | None:
+        """The seconds from the request of the results until they were received."""
+        return self.elapsed(ExecutionState.RESULTS_REQUESTED, ExecutionState.COMPLETED)
+
+    @property
+    def total_time(self) -> float | None:
+        """The seconds from the submission of the query until it finished."""
+        return max(self.states.values()) if len(self.states) > 1 else None
+
+
+@dataclass(frozen=True)
+class ResultsPayload:
+    """Query results as received from the SQL session, not yet decoded.
+
+    Decoding is left to the consumer of the results (the cursor), so that the
+    connection's listener thread is not held up by large result sets.
+
+    Attributes:
+        result_bytes: The encoded, possibly compressed, results.
+        format: The results format (see :class:`ResultsFormat`).
+        compression: The compression codec applied to the results, if any.
+        on_decoded: Called with the decoded size of the results and the
+            seconds spent decoding them, once decoded.
+        stats: The statistics of the query, completed with the decoding times.
+    """
+
+    result_bytes: bytes
+    format: str | None = None
+    compression: str | None = None
+    on_decoded: Callable[[int, float], None] | None = None
+    stats: QueryStats | None = None
+
+
 @dataclass
 class ExecutionResult:
     """Result of a query execution.
@@ -106,11 +204,22 @@ class ExecutionResult:
         results: The query results as a pandas DataFrame, or None if an error occurred.
         error: The error that occurred during execution, or None if successful.
         store_result: The store result if results were written to cloud storage.
+        payload: The undecoded query results, to be decoded by the consumer.
+        stream: The stream of result chunks, when results are streamed.
+        table: The results as an Arrow table, when already decoded (e.g. cached).
+        on_decoded: Called with the results table once the consumer has decoded
+            the complete results from the payload.
+        stats: The timings and sizes of the execution of the query.
     """
 
     results: pandas.DataFrame | None = None
     error: Exception | None = None
     store_result: StoreResult | None = None
+    payload: ResultsPayload | None = None
+    stream: "ResultStream | None" = None
+    table: pyarrow.Table | None = None
+    on_decoded: Callable[[pyarrow.Table], None] | None = None
+    stats: QueryStats | None = None
 
 
 @dataclass(frozen=True)
@@ -124,3 +233,77 @@ class ProgressInfo:
     tasks_total: int
     tasks_completed: int
     tasks_active: int
+
+
+@dataclass
+class ConnectTimings:
+    """Breakdown of the time spent connecting to a SQL session, in seconds.
+
+    Phases that did not take place, for example requesting a SQL session when
+    connecting directly to it, are left as None.
+
+    Attributes:
+        create_session: The HTTP request for a SQL session.
+        session_polls: The duration of each request for the SQL session status.
+        session_wait: The time until the SQL session was ready, including the
+            status requests and the waits between them.
+        dns: The resolution of the SQL session's host name.
+        tcp_connect: The establishment of the TCP connection.
+        websocket_handshake: The TLS handshake and the WebSocket upgrade.
+        session_cache_hit: Whether the SQL session URI came from the session cache.
+        total: The total time spent connecting.
+    """
+
+    create_session: float | None = None
+    session_polls: List[float] = field(default_factory=list)
+    session_wait: float | None = None
+    dns: float | None = None
+    tcp_connect: float | None = None
+    websocket_handshake: float | None = None
+    session_cache_hit: bool = False
+    total: float | None = None
+
+
+@dataclass(frozen=True)
+class ReconnectPolicy:
+    """How to reconnect to the SQL session after losing the connection to it.
+
+    Attributes:
+        max_attempts: The number of reconnection attempts before giving up.
+        min_delay: The delay before the second attempt, in seconds; the delay
+            doubles after every failed attempt.
+        max_delay: The maximum delay between two attempts, in seconds.
+        reattach_timeout: How long a reattached query may go without any event
+            from the SQL session before it fails, in seconds.
+    """
+
+    max_attempts: int = 5
+    min_delay: float = 0.5
+    max_delay: float = 10.0
+    reattach_timeout: float = 30.0
+
+
+@dataclass(frozen=True)
+class QueryRecord:
+    """Metadata of a query executed on a connection, kept for debugging.
+
+    Attributes:
+        execution_id: The execution ID of the query.
+        sql: The SQL statement, truncated to ``QUERY_HISTORY_SQL_LENGTH``
+            characters.
+        state: The state of the query when the record was taken.
+        submitted_at: When the query was submitted, as a POSIX timestamp.
+        duration: The seconds from the submission of the query until it
+            finished, or None while it is in flight.
+        error: The error the query failed with, if any.
+        timed_out: Whether the query was cancelled for not completing within
+            its timeout.
+    """
+
+    execution_id: str
+    sql: str
+    state: ExecutionState
+    submitted_at: float
+    duration: float | None = None
+    error: str | None = None
+    timed_out: bool = False
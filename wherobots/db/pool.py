@@ -0,0 +1,348 @@
+"""Connection pooling for Wherobots DB.
+
+Creating or attaching to a SQL session can take minutes when the session has
+to start. A :class:`ConnectionPool` keeps connections to the SQL session(s)
+open and ready, so that acquiring one is taken off the request path.
+"""
+
+import concurrent.futures
+import contextlib
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from types import TracebackType
+from typing import Callable, Iterator, List, Sequence
+
+from .connection import Connection
+from .errors import InterfaceError, OperationalError
+
+ConnectionFactory = Callable[[], Connection]
+"""A callable returning a new connection, e.g. a ``functools.partial`` of ``connect``."""
+
+
+@dataclass(frozen=True)
+class PoolStats:
+    """A snapshot of the state and statistics of a connection pool.
+
+    Attributes:
+        size: The number of open connections, idle or in use.
+        idle: The number of connections available for checkout.
+        in_use: The number of connections checked out.
+        checkouts: The number of successful checkouts.
+        timeouts: The number of checkouts that timed out.
+        wait_time_total: The total time spent waiting for checkouts, in seconds.
+        wait_time_max: The longest time spent waiting for a checkout, in seconds.
+        connections_created: The number of connections opened by the pool.
+        connections_replaced: The number of dead connections discarded.
+    """
+
+    size: int
+    idle: int
+    in_use: int
+    checkouts: int
+    timeouts: int
+    wait_time_total: float
+    wait_time_max: float
+    connections_created: int
+    connections_replaced: int
+
+    @property
+    def wait_time_avg(self) -> float:
+        """The average time spent waiting for a checkout, in seconds."""
+        return self.wait_time_total / self.checkouts if self.checkouts else 0.0
+
+
+class ConnectionPool:
+    """A thread-safe pool of connections to Wherobots SQL sessions.
+
+    The pool keeps between ``min_size`` and ``max_size`` connections open. A
+    background thread opens connections until there are ``min_size`` of them
+    (prewarming the pool when it is created), and replaces the ones found dead.
+    When all connections are in use, new ones are opened on demand up to
+    ``max_size``; beyond that, checkouts wait for a connection to be returned.
+
+    Connections are created by calling ``factory``, typically a
+    ``functools.partial`` of :func:`wherobots.db.connect`. When a sequence of
+    factories is given, for example connecting to several distinct sessions,
+    new connections are spread over them in turn.
+
+    Before being handed out, idle connections are checked for liveness with a
+    WebSocket ping, bounded by ``ping_timeout`` (pass ``None`` to only check
+    that the connection is still open).
+    """
+
+    def __init__(
+        self,
+        factory: ConnectionFactory | Sequence[ConnectionFactory],
+        min_size: int = 1,
+        max_size: int = 4,
+        ping_timeout: float | None = 5.0,
+        retry_delay: float = 5.0,
+    ) -> None:
+        if callable(factory):
+            factory = [factory]
+        if not factory:
+            raise ValueError("At least one connection factory is required")
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size")
+
+        self.__factories = list(factory)
+        self.__min_size = min_size
+        self.__max_size = max_size
+        self.__ping_timeout = ping_timeout
+        self.__retry_delay = retry_delay
+
+        self.__lock = threading.Condition()
+        self.__idle: List[Connection] = []
+        self.__in_use: set[Connection] = set()
+        self.__pending = 0  # Connections being opened
+        self.__next_factory = 0
+        self.__closed = False
+
+        self.__checkouts = 0
+        self.__timeouts = 0
+        self.__wait_time_total = 0.0
+        self.__wait_time_max = 0.0
+        self.__created = 0
+        self.__replaced = 0
+
+        self.__thread = threading.Thread(
+            target=self.__maintain, daemon=True, name="wherobots-pool"
+        )
+        self.__thread.start()
+
+    def __enter__(self) -> "ConnectionPool":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def __size(self) -> int:
+        return len(self.__idle) + len(self.__in_use) + self.__pending
+
+    def __open(self) -> Connection:
+        """Opens a new connection; the caller must have reserved a pending slot."""
+        with self.__lock:
+            factory = self.__factories[self.__next_factory % len(self.__factories)]
+            self.__next_factory += 1
+        try:
+            conn = factory()
+        except Exception:
+            with self.__lock:
+                self.__pending -= 1
+                self.__lock.notify_all()
+            raise
+        with self.__lock:
+            self.__created += 1
+        return conn
+
+    def __open_until(self, deadline: float | None) -> Connection:
+        """Opens a new connection, giving up at ``deadline``.
+
+        The caller must have reserved a pending slot. If the deadline passes
+        first, the connection keeps being opened in the background and is
+        added to the idle connections once it is.
+        """
+        if deadline is None:
+            return self.__open()
+
+        future: concurrent.futures.Future[Connection] = concurrent.futures.Future()
+
+        def run() -> None:
+            try:
+                future.set_result(self.__open())
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, daemon=True, name="wherobots-pool-open").start()
+        try:
+            return future.result(max(0.0, deadline - time.monotonic()))
+        except concurrent.futures.TimeoutError:
+            future.add_done_callback(self.__adopt)
+            with self.__lock:
+                self.__timeouts += 1
+            raise OperationalError("Timed out opening a pooled connection") from None
+
+    def __adopt(self, future: "concurrent.futures.Future[Connection]") -> None:
+        """Adds a connection whose checkout timed out to the idle connections."""
+        if future.exception() is not None:
+            logging.warning("Failed to open pooled connection: %s", future.exception())
+            return
+        conn = future.result()
+        with self.__lock:
+            self.__pending -= 1
+            closed = self.__closed
+            if not closed:
+                self.__idle.append(conn)
+            self.__lock.notify_all()
+        if closed:
+            conn.close()
+
+    def __maintain(self) -> None:
+        """Background loop keeping at least ``min_size`` connections open."""
+        while True:
+            with self.__lock:
+                while not self.__closed and self.__size() >= self.__min_size:
+                    self.__lock.wait()
+                if self.__closed:
+                    return
+                self.__pending += 1
+
+            try:
+                conn = self.__open()
+            except Exception:
+                logging.exception(
+                    "Failed to open pooled connection; retrying in %.1fs",
+                    self.__retry_delay,
+                )
+                with self.__lock:
+                    self.__lock.wait_for(lambda: self.__closed, self.__retry_delay)
+                continue
+
+            with self.__lock:
+                self.__pending -= 1
+                closed = self.__closed
+                if not closed:
+                    self.__idle.append(conn)
+                    self.__lock.notify_all()
+            if closed:
+                conn.close()
+                return
+
+    def __is_alive(self, conn: Connection) -> bool:
+        if self.__ping_timeout is None:
+            return not conn.closed
+        return conn.ping(self.__ping_timeout)
+
+    def __discard(self, conn: Connection) -> None:
+        """Discards a dead connection; the maintenance thread replaces it.
+
+        Must be called without holding the pool lock: closing the connection
+        can block on its network I/O.
+        """
+        logging.info("Discarding dead pooled connection.")
+        with self.__lock:
+            self.__replaced += 1
+            self.__lock.notify_all()
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def getconn(self, timeout: float | None = None) -> Connection:
+        """Checks out a connection from the pool.
+
+        Waits up to ``timeout`` seconds (forever if ``None``) for a connection
+        to be available, or to be opened when the pool is below ``max_size``,
+        and raises OperationalError if none was.
+        """
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+        while True:
+            with self.__lock:
+                conn = None
+                while conn is None:
+                    if self.__closed:
+                        raise InterfaceError("Connection pool is closed")
+                    if self.__idle:
+                        conn = self.__idle.pop()
+                    elif self.__size() < self.__max_size:
+                        self.__pending += 1
+                        break
+                    else:
+                        remaining = None
+                        if deadline is not None:
+                            remaining = deadline - time.monotonic()
+                            if remaining <= 0:
+                                self.__timeouts += 1
+                                raise OperationalError(
+                                    "Timed out waiting for a pooled connection"
+                                )
+                        self.__lock.wait(remaining)
+                if conn is not None:
+                    # Reserve it while checking its liveness outside the lock.
+                    self.__in_use.add(conn)
+
+            if conn is None:
+                conn = self.__open_until(deadline)
+                with self.__lock:
+                    self.__pending -= 1
+                    self.__in_use.add(conn)
+            elif not self.__is_alive(conn):
+                with self.__lock:
+                    self.__in_use.discard(conn)
+                self.__discard(conn)
+                continue
+
+            waited = time.monotonic() - start
+            with self.__lock:
+                self.__checkouts += 1
+                self.__wait_time_total += waited
+                self.__wait_time_max = max(self.__wait_time_max, waited)
+            return conn
+
+    def putconn(self, conn: Connection) -> None:
+        """Returns a connection to the pool."""
+        with self.__lock:
+            if conn not in self.__in_use:
+                raise InterfaceError("Connection does not belong to this pool")
+            self.__in_use.remove(conn)
+            closed = self.__closed
+            if not closed and not conn.closed:
+                self.__idle.append(conn)
+            self.__lock.notify_all()
+        if closed:
+            conn.close()
+        elif conn.closed:
+            self.__discard(conn)
+
+    @contextlib.contextmanager
+    def connection(self, timeout: float | None = None) -> Iterator[Connection]:
+        """Checks out a connection for the duration of a ``with`` block."""
+        conn = self.getconn(timeout)
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def stats(self) -> PoolStats:
+        """Returns a snapshot of the pool's state and statistics."""
+        with self.__lock:
+            return PoolStats(
+                size=len(self.__idle) + len(self.__in_use),
+                idle=len(self.__idle),
+                in_use=len(self.__in_use),
+                checkouts=self.__checkouts,
+                timeouts=self.__timeouts,
+                wait_time_total=self.__wait_time_total,
+                wait_time_max=self.__wait_time_max,
+                connections_created=self.__created,
+                connections_replaced=self.__replaced,
+            )
+
+    def wait_ready(self, timeout: float | None = None) -> bool:
+        """Waits until the pool holds at least ``min_size`` open connections."""
+        with self.__lock:
+            return self.__lock.wait_for(
+                lambda: len(self.__idle) + len(self.__in_use) >= self.__min_size,
+                timeout,
+            )
+
+    def close(self) -> None:
+        """Closes the pool and its idle connections.
+
+        Connections in use, or still being opened, are closed when they are
+        returned to the pool.
+        """
+        with self.__lock:
+            self.__closed = True
+            idle, self.__idle = self.__idle, []
+            self.__lock.notify_all()
+        for conn in idle:
+            conn.close()
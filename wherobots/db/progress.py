@@ -0,0 +1,133 @@
+"""Delivery of execution progress events to their handlers.
+
+Progress handlers often do slow work, like updating a user interface or a
+database. A :class:`ProgressDispatcher` calls them from its own thread so
+that they never delay the connection's listener, and the delivery of results
+to the other queries with it. Bursts of progress events are coalesced: only
+the latest progress of each execution is delivered, at most ``max_rate``
+times per second.
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from .constants import DEFAULT_PROGRESS_MAX_RATE
+from .models import ProgressInfo
+
+ProgressHandler = Callable[[ProgressInfo], None]
+"""A callable invoked with a :class:`ProgressInfo` on progress events."""
+
+
+@dataclass
+class _Slot:
+    """The progress of an execution waiting to be delivered."""
+
+    info: ProgressInfo | None = None
+    handlers: Sequence[ProgressHandler] = ()
+    scheduled: bool = False
+    delivered_at: float = float("-inf")
+    finished: bool = False
+    delivering: bool = False
+
+
+class ProgressDispatcher:
+    """Calls progress handlers from a dedicated thread, coalescing bursts.
+
+    The progress of an execution received while its previous progress is
+    waiting to be delivered, or being delivered, replaces it. Successive
+    deliveries for an execution are at least ``1 / max_rate`` seconds apart;
+    pass a ``max_rate`` of None to deliver progress as fast as the handlers
+    allow. The thread is started on the first progress event.
+    """
+
+    def __init__(self, max_rate: float | None = DEFAULT_PROGRESS_MAX_RATE) -> None:
+        self.__interval = 1 / max_rate if max_rate else 0.0
+        self.__slots: Dict[str, _Slot] = {}
+        self.__due: List[Tuple[float, int, str]] = []
+        self.__counter = itertools.count()
+        self.__condition = threading.Condition()
+        self.__thread: threading.Thread | None = None
+        self.__closed = False
+
+    def dispatch(self, info: ProgressInfo, handlers: Sequence[ProgressHandler]) -> None:
+        """Schedules the delivery of ``info`` to the given handlers."""
+        with self.__condition:
+            if self.__closed:
+                return
+            slot = self.__slots.setdefault(info.execution_id, _Slot())
+            slot.info = info
+            slot.handlers = handlers
+            if not slot.scheduled and not slot.delivering:
+                self.__schedule(info.execution_id, slot)
+            if self.__thread is None:
+                self.__thread = threading.Thread(
+                    target=self.__run, daemon=True, name="wherobots-progress"
+                )
+                self.__thread.start()
+
+    def finish(self, execution_id: str) -> None:
+        """Forgets an execution, once its pending progress has been delivered."""
+        with self.__condition:
+            slot = self.__slots.get(execution_id)
+            if slot is None:
+                return
+            slot.finished = True
+            if not slot.scheduled and not slot.delivering:
+                del self.__slots[execution_id]
+
+    def close(self) -> None:
+        """Stops the delivery of progress; pending progress is dropped."""
+        with self.__condition:
+            self.__closed = True
+            self.__slots.clear()
+            self.__due.clear()
+            self.__condition.notify()
+
+    def __schedule(self, execution_id: str, slot: _Slot) -> None:
+        slot.scheduled = True
+        due = max(time.monotonic(), slot.delivered_at + self.__interval)
+        heapq.heappush(self.__due, (due, next(self.__counter), execution_id))
+        self.__condition.notify()
+
+    def __run(self) -> None:
+        while True:
+            with self.__condition:
+                while not self.__closed and (
+                    not self.__due or self.__due[0][0] > time.monotonic()
+                ):
+                    timeout = (
+                        self.__due[0][0] - time.monotonic() if self.__due else None
+                    )
+                    self.__condition.wait(timeout)
+                if self.__closed:
+                    return
+                _, _, execution_id = heapq.heappop(self.__due)
+                slot = self.__slots.get(execution_id)
+                if slot is None:
+                    continue
+                info, handlers = slot.info, slot.handlers
+                slot.info = None
+                slot.scheduled = False
+                slot.delivering = True
+                slot.delivered_at = time.monotonic()
+
+            for handler in handlers:
+                try:
+                    if info is not None:
+                        handler(info)
+                except Exception:
+                    logging.exception("Progress handler raised an exception")
+
+            with self.__condition:
+                slot.delivering = False
+                if self.__closed:
+                    return
+                if slot.info is not None:
+                    self.__schedule(execution_id, slot)
+                elif slot.finished:
+                    self.__slots.pop(execution_id, None)
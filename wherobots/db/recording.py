@@ -0,0 +1,500 @@
+"""Recording and replay of the traffic of a connection.
+
+A :class:`TrafficRecorder` attached to a connection writes the requests it
+sends and the frames it receives to a file, with the time at which they were
+sent or received, so that the traffic of a real workload can be reproduced
+locally. The results of queries can be redacted, or truncated beyond a given
+size, to keep the recording small or free of sensitive data.
+
+A :class:`ReplayServer` plays a recording back to the connections made to it,
+for example with :func:`wherobots.db.connect_direct`: each request is answered
+with the frames that followed the corresponding recorded request, after the
+same delay (or a fraction of it, to replay faster than recorded).
+
+Recordings are JSON Lines files: a header, then one line per frame, whose
+binary payloads are base64-encoded.
+"""
+
+import base64
+import heapq
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from types import TracebackType
+from typing import Any, Dict, List, TextIO, Tuple, Union
+
+import cbor2
+import pyarrow
+import pyarrow.ipc
+import websockets.exceptions
+import websockets.sync.server
+
+from .constants import TRAFFIC_RECORDING_VERSION
+from .types import EventKind, RequestKind, ResultsFormat
+
+SENT = "sent"
+RECEIVED = "received"
+
+
+@dataclass(frozen=True)
+class RedactedPayload:
+    """A binary payload that was redacted or truncated in a recording.
+
+    Attributes:
+        size: The original size of the payload, in bytes.
+        prefix: The recorded beginning of the payload, if it was truncated.
+    """
+
+    size: int
+    prefix: bytes = b""
+
+
+@dataclass(frozen=True)
+class RecordedFrame:
+    """A request sent, or a frame received, by a recorded connection.
+
+    Attributes:
+        at: When the frame was sent or received, in seconds since the start of
+            the recording.
+        direction: ``"sent"`` or ``"received"``.
+        message: The decoded message.
+        encoding: The encoding of received frames, ``"json"`` or ``"cbor"``.
+        size: The size of the frame on the wire, in bytes.
+    """
+
+    at: float
+    direction: str
+    message: Dict[str, Any]
+    encoding: str = "json"
+    size: int = 0
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, (bytes, bytearray)):
+        return {"$bytes": base64.b64encode(value).decode("ascii")}
+    if isinstance(value, RedactedPayload):
+        return {
+            "$bytes": base64.b64encode(value.prefix).decode("ascii"),
+            "$size": value.size,
+        }
+    if isinstance(value, dict):
+        return {k: _encode(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(v) for v in value]
+    return value
+
+
+def _decode(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "$bytes" in value:
+            data = base64.b64decode(value["$bytes"])
+            if "$size" in value:
+                return RedactedPayload(value["$size"], data)
+            return data
+        return {k: _decode(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    return value
+
+
+class TrafficRecorder:
+    """Records the traffic of one or more connections to a file.
+
+    With ``redact_results``, the bytes of query results are left out of the
+    recording; results larger than ``max_result_size`` bytes are truncated to
+    that size. Only the size of the results is then recorded, and the replay
+    server sends synthetic results of the same size in their place. With
+    ``redact_sql``, the SQL statements of queries are left out too.
+
+    The recorder is safe to share between connections, but the recording of a
+    single connection is what the replay server expects. Each frame is written
+    out as it is recorded; close the recorder to close the file.
+    """
+
+    def __init__(
+        self,
+        file: Union[str, os.PathLike[str], TextIO],
+        redact_results: bool = False,
+        max_result_size: int | None = None,
+        redact_sql: bool = False,
+    ) -> None:
+        if isinstance(file, (str, os.PathLike)):
+            self.__file: TextIO = open(file, "w", encoding="utf-8")
+            self.__owned = True
+        else:
+            self.__file = file
+            self.__owned = False
+        self.__redact_results = redact_results
+        self.__max_result_size = max_result_size
+        self.__redact_sql = redact_sql
+        self.__lock = threading.Lock()
+        self.__started = time.perf_counter()
+        self.__write({"version": TRAFFIC_RECORDING_VERSION, "recorded_at": time.time()})
+
+    def __enter__(self) -> "TrafficRecorder":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self.__lock:
+            if self.__owned:
+                self.__file.close()
+            else:
+                self.__file.flush()
+
+    def __write(self, line: Dict[str, Any]) -> None:
+        data = json.dumps(line, separators=(",", ":")) + "\n"
+        with self.__lock:
+            if self.__file.closed:
+                return
+            self.__file.write(data)
+            self.__file.flush()
+
+    def __redact(self, results: Any) -> Any:
+        if not isinstance(results, dict):
+            return results
+        data = results.get("result_bytes")
+        if not isinstance(data, (bytes, bytearray)):
+            return results
+        if self.__redact_results:
+            return {**results, "result_bytes": RedactedPayload(len(data))}
+        if self.__max_result_size is not None and len(data) > self.__max_result_size:
+            prefix = bytes(data[: self.__max_result_size])
+            return {**results, "result_bytes": RedactedPayload(len(data), prefix)}
+        return results
+
+    def sent(self, message: Dict[str, Any], size: int) -> None:
+        """Records a request sent on the connection."""
+        at = time.perf_counter() - self.__started
+        if self.__redact_sql and "statement" in message:
+            message = {**message, "statement": None}
+        self.__write(
+            {"at": at, "direction": SENT, "size": size, "message": _encode(message)}
+        )
+
+    def received(
+        self, message: Dict[str, Any], encoding: str, size: int, at: float
+    ) -> None:
+        """Records a frame received at ``at`` (a ``time.perf_counter()`` value)."""
+        if "results" in message:
+            message = {**message, "results": self.__redact(message["results"])}
+        self.__write(
+            {
+                "at": at - self.__started,
+                "direction": RECEIVED,
+                "encoding": encoding,
+                "size": size,
+                "message": _encode(message),
+            }
+        )
+
+
+def load_recording(file: Union[str, os.PathLike[str], TextIO]) -> List[RecordedFrame]:
+    """Reads the frames of a recording written by a :class:`TrafficRecorder`."""
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, encoding="utf-8") as f:
+            return load_recording(f)
+
+    header = json.loads(file.readline() or "{}")
+    if header.get("version") != TRAFFIC_RECORDING_VERSION:
+        raise ValueError(f"Unsupported recording version: {header.get('version')}")
+    frames = []
+    for line in file:
+        if not line.strip():
+            continue
+        entry = json.loads(line)
+        frames.append(
+            RecordedFrame(
+                at=entry["at"],
+                direction=entry["direction"],
+                message=_decode(entry["message"]),
+                encoding=entry.get("encoding", "json"),
+                size=entry.get("size", 0),
+            )
+        )
+    return frames
+
+
+def _filler(size: int, results: Dict[str, Any]) -> bytes:
+    """Synthetic results of about ``size`` bytes in the format of ``results``."""
+    if results.get("format") == ResultsFormat.JSON:
+        return json.dumps([["x" * max(0, size - 8)]]).encode("utf-8")
+
+    # Random bytes don't compress, so that compressed results keep their size.
+    table = pyarrow.table({"filler": pyarrow.array([os.urandom(size)])})
+    sink = pyarrow.BufferOutputStream()
+    compression = results.get("compression")
+    stream = pyarrow.CompressedOutputStream(sink, compression) if compression else sink
+    with pyarrow.ipc.new_stream(stream, table.schema) as writer:
+        writer.write_table(table)
+    if compression:
+        stream.close()
+    data: bytes = sink.getvalue().to_pybytes()
+    return data
+
+
+def _fill_redacted(frames: List[RecordedFrame]) -> List[RecordedFrame]:
+    """Replaces redacted results with synthetic ones that can be decoded.
+
+    Streamed results are regenerated as a whole, and split into chunks of the
+    recorded sizes, when any of their chunks was redacted.
+    """
+    chunks: Dict[str, List[int]] = {}
+    redacted = set()
+    for i, frame in enumerate(frames):
+        results = frame.message.get("results")
+        if frame.direction != RECEIVED or not isinstance(results, dict):
+            continue
+        if frame.message.get("kind") == EventKind.EXECUTION_RESULT_CHUNK:
+            execution_id: str = frame.message["execution_id"]
+            chunks.setdefault(execution_id, []).append(i)
+            if isinstance(results.get("result_bytes"), RedactedPayload):
+                redacted.add(execution_id)
+
+    def replace(i: int, data: bytes) -> None:
+        frame = frames[i]
+        results = {**frame.message["results"], "result_bytes": data}
+        frames[i] = RecordedFrame(
+            frame.at,
+            frame.direction,
+            {**frame.message, "results": results},
+            frame.encoding,
+            frame.size,
+        )
+
+    frames = list(frames)
+    for execution_id in redacted:
+        indices = chunks[execution_id]
+        sizes = []
+        for i in indices:
+            data = frames[i].message["results"]["result_bytes"]
+            sizes.append(data.size if isinstance(data, RedactedPayload) else len(data))
+        data = _filler(sum(sizes), frames[indices[0]].message["results"])
+        offset = 0
+        for n, (i, size) in enumerate(zip(indices, sizes)):
+            end = len(data) if n == len(indices) - 1 else offset + size
+            replace(i, data[offset:end])
+            offset = end
+
+    for i, frame in enumerate(frames):
+        results = frame.message.get("results")
+        if isinstance(results, dict) and isinstance(
+            results.get("result_bytes"), RedactedPayload
+        ):
+            replace(i, _filler(results["result_bytes"].size, results))
+    return frames
+
+
+class _Replay:
+    """The replay of a recording to one client connection.
+
+    Each received frame of the recording is anchored to the request that
+    preceded it for the same execution (or to the preceding request, for frames
+    of no execution). When the client sends the matching request, the frames
+    anchored to it are scheduled after their recorded delays, divided by the
+    replay speed. Executions are matched by SQL statement, or else in order,
+    and their execution IDs are rewritten to those chosen by the client.
+    """
+
+    def __init__(
+        self,
+        ws: websockets.sync.server.ServerConnection,
+        frames: List[RecordedFrame],
+        speed: float,
+    ) -> None:
+        self.ws = ws
+        self.speed = speed
+        self.requests: List[RecordedFrame] = []
+        self.anchored: Dict[int, List[Tuple[float, RecordedFrame]]] = {}
+        last_request: Dict[Any, int] = {}
+        for frame in frames:
+            execution_id = frame.message.get("execution_id")
+            if frame.direction == SENT:
+                last_request[execution_id] = last_request[None] = len(self.requests)
+                self.requests.append(frame)
+                continue
+            anchor = last_request.get(execution_id, last_request.get(None))
+            if anchor is None:
+                continue
+            delay = frame.at - self.requests[anchor].at
+            self.anchored.setdefault(anchor, []).append((delay, frame))
+
+        self.consumed: set[int] = set()
+        self.live_ids: Dict[Any, Any] = {}
+        self.recorded_ids: Dict[Any, Any] = {}
+
+        self.schedule: List[Tuple[float, int, RecordedFrame]] = []
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.closed = False
+
+    def __match(self, request: Dict[str, Any]) -> int | None:
+        kind = request.get("kind")
+        if kind == RequestKind.EXECUTE_SQL:
+            candidates = [
+                i
+                for i, frame in enumerate(self.requests)
+                if i not in self.consumed and frame.message.get("kind") == kind
+            ]
+            for i in candidates:
+                if self.requests[i].message.get("statement") == request.get(
+                    "statement"
+                ):
+                    return i
+            return candidates[0] if candidates else None
+
+        recorded_id = self.recorded_ids.get(request.get("execution_id"))
+        for i, frame in enumerate(self.requests):
+            if (
+                i not in self.consumed
+                and frame.message.get("kind") == kind
+                and frame.message.get("execution_id") == recorded_id
+            ):
+                return i
+        return None
+
+    def handle(self, request: Dict[str, Any]) -> None:
+        i = self.__match(request)
+        live_id = request.get("execution_id")
+        if i is None:
+            logging.warning("No recorded %s request to replay.", request.get("kind"))
+            if request.get("kind") in (
+                RequestKind.EXECUTE_SQL,
+                RequestKind.RETRIEVE_RESULTS,
+            ):
+                self.send(
+                    {
+                        "kind": EventKind.ERROR.value,
+                        "execution_id": live_id,
+                        "message": "No more recorded queries to replay",
+                    },
+                    "json",
+                )
+            return
+
+        self.consumed.add(i)
+        recorded_id = self.requests[i].message.get("execution_id")
+        if request.get("kind") == RequestKind.EXECUTE_SQL:
+            self.live_ids[recorded_id] = live_id
+            self.recorded_ids[live_id] = recorded_id
+
+        now = time.monotonic()
+        with self.condition:
+            for delay, frame in self.anchored.get(i, []):
+                due = now + (delay / self.speed if self.speed else 0)
+                heapq.heappush(self.schedule, (due, next(self.counter), frame))
+            self.condition.notify()
+
+    def send(self, message: Dict[str, Any], encoding: str) -> None:
+        if encoding == "cbor":
+            self.ws.send(cbor2.dumps(message))
+        else:
+            self.ws.send(json.dumps(message))
+
+    def run(self) -> None:
+        """Sends the scheduled frames when they are due, until closed."""
+        while True:
+            with self.condition:
+                while not self.closed and (
+                    not self.schedule or self.schedule[0][0] > time.monotonic()
+                ):
+                    timeout = (
+                        self.schedule[0][0] - time.monotonic()
+                        if self.schedule
+                        else None
+                    )
+                    self.condition.wait(timeout)
+                if self.closed:
+                    return
+                _, _, frame = heapq.heappop(self.schedule)
+
+            message = frame.message
+            execution_id = message.get("execution_id")
+            if execution_id is not None:
+                message = {
+                    **message,
+                    "execution_id": self.live_ids.get(execution_id, execution_id),
+                }
+            try:
+                self.send(message, frame.encoding)
+            except websockets.exceptions.ConnectionClosed:
+                return
+
+    def close(self) -> None:
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+
+
+class ReplayServer:
+    """A local WebSocket server replaying a recording to its clients.
+
+    Each connection to the server gets a replay of the whole recording. Frames
+    are sent after their recorded delays divided by ``speed``; pass a ``speed``
+    of 0 to send them as soon as their request is received. Results that were
+    redacted in the recording are replaced with synthetic results of the same
+    size.
+    """
+
+    def __init__(
+        self,
+        recording: Union[str, os.PathLike[str], List[RecordedFrame]],
+        speed: float = 1.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        if isinstance(recording, (str, os.PathLike)):
+            recording = load_recording(recording)
+        self.frames = _fill_redacted(recording)
+        self.speed = speed
+        self.__server = websockets.sync.server.serve(
+            self.__handle, host, port, compression=None, max_size=None
+        )
+        self.__thread = threading.Thread(
+            target=self.__server.serve_forever, daemon=True, name="wherobots-replay"
+        )
+        self.__thread.start()
+
+    @property
+    def uri(self) -> str:
+        host, port = self.__server.socket.getsockname()[:2]
+        return f"ws://{host}:{port}"
+
+    def close(self) -> None:
+        self.__server.shutdown()
+        self.__thread.join()
+
+    def __enter__(self) -> "ReplayServer":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def __handle(self, ws: websockets.sync.server.ServerConnection) -> None:
+        replay = _Replay(ws, self.frames, self.speed)
+        sender = threading.Thread(target=replay.run, daemon=True)
+        sender.start()
+        try:
+            for frame in ws:
+                replay.handle(json.loads(frame))
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            replay.close()
+            sender.join()
@@ -0,0 +1,443 @@
+"""Decoding of query results received from the SQL session."""
+
+import collections
+import io
+import json
+import logging
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from typing import IO, Any, Deque, Iterator, List, Tuple
+
+import pyarrow
+
+from . import tracing
+from .errors import NotSupportedError, OperationalError
+from .models import ResultsPayload
+from .types import ResultsFormat
+
+
+def decode_results(payload: ResultsPayload) -> Any:
+    """Decodes the results of an ``execution_result`` event.
+
+    Arrow results are returned as :class:`ArrowResults`, without any conversion
+    to pandas; JSON results are returned as the deserialized JSON document.
+
+    The decompression and decoding times are recorded in the payload's stats.
+    The payload's ``on_decoded`` callback is called once the results have been
+    decoded; if decoding fails, the query's span is ended with the error.
+    """
+    try:
+        return _decode_results(payload)
+    except Exception as e:
+        if payload.stats is not None:
+            payload.stats.error = str(e)
+            tracing.end_query_span(payload.stats)
+        raise
+
+
+def _decode_results(payload: ResultsPayload) -> Any:
+    stats = payload.stats
+    if payload.format == ResultsFormat.JSON:
+        with tracing.child_span(stats, "wherobots.decode"):
+            start = time.perf_counter()
+            results = json.loads(payload.result_bytes.decode("utf-8"))
+        end = time.perf_counter()
+        if stats is not None:
+            stats.decode_time = end - start
+        if payload.on_decoded is not None:
+            payload.on_decoded(len(payload.result_bytes), end - start)
+        return results
+    elif payload.format == ResultsFormat.ARROW:
+        with tracing.child_span(stats, "wherobots.decode"):
+            start = time.perf_counter()
+            buffer = _decompress(payload)
+            decompressed = time.perf_counter()
+            results = ArrowResults.from_buffer(buffer)
+            end = time.perf_counter()
+        if stats is not None:
+            stats.decompression_time = decompressed - start
+            stats.decode_time = end - decompressed
+        if payload.on_decoded is not None:
+            table = results.table
+            payload.on_decoded(table.nbytes if table is not None else 0, end - start)
+        return results
+    else:
+        raise OperationalError(f"Unsupported results format {payload.format}")
+
+
+def _decompress(payload: ResultsPayload) -> pyarrow.Buffer:
+    """The decompressed Arrow IPC stream of the results.
+
+    The decoded record batches reference the decompressed buffer without
+    copying it, so decompressing it upfront doesn't take more memory than
+    decompressing it as it is read.
+    """
+    buffer = pyarrow.py_buffer(payload.result_bytes)
+    if not payload.compression:
+        return buffer
+    return pyarrow.input_stream(buffer, payload.compression).read_buffer()
+
+
+def peek_schema(payload: ResultsPayload) -> pyarrow.Schema | None:
+    """Reads the schema of Arrow results, without decoding their rows.
+
+    Returns None for results in other formats.
+    """
+    if payload.format != ResultsFormat.ARROW:
+        return None
+    return _read_schema(pyarrow.py_buffer(payload.result_bytes), payload.compression)
+
+
+def _read_schema(buffer: pyarrow.Buffer, compression: str | None) -> pyarrow.Schema:
+    """Reads the schema at the start of a (possibly compressed) Arrow IPC stream."""
+    with pyarrow.ipc.open_stream(pyarrow.input_stream(buffer, compression)) as reader:
+        return reader.schema
+
+
+_EOF = object()
+
+
+@dataclass(frozen=True)
+class _Spilled:
+    """A chunk written to the stream's spill file."""
+
+    offset: int
+    length: int
+
+
+class ResultStream(io.RawIOBase):
+    """A file-like view over the chunks of a streamed Arrow IPC result.
+
+    The connection's listener thread feeds the chunks received from the SQL
+    session with :meth:`put`, and the consuming cursor reads them back as one
+    continuous (possibly compressed) byte stream. Up to ``maxsize`` chunks are
+    buffered in memory; when the consumer falls behind, the following chunks
+    are spilled to a temporary file until it catches up. :meth:`put` never
+    blocks, so a slow consumer doesn't hold up the delivery of events to the
+    connection's other cursors.
+    """
+
+    def __init__(
+        self, maxsize: int, compression: str | None = None, format: str | None = None
+    ) -> None:
+        super().__init__()
+        self.compression = compression
+        self.format = format
+        self.__maxsize = maxsize
+        self.__items: Deque[Any] = collections.deque()
+        self.__in_memory = 0
+        self.__spill: IO[bytes] | None = None
+        self.__spill_size = 0
+        self.__spill_pending = 0
+        self.__spilled = 0
+        self.__ready = threading.Condition()
+        self.__chunk = memoryview(b"")
+        self.__started = False
+        self.__abandoned = False
+
+    @property
+    def spilled(self) -> int:
+        """The number of chunks spilled to disk so far."""
+        return self.__spilled
+
+    def put(self, chunk: bytes) -> None:
+        """Adds a chunk to the stream, spilling it to disk if the buffer is full.
+
+        Chunks are dropped once the consumer has closed the stream.
+        """
+        with self.__ready:
+            if not chunk or self.__abandoned:
+                return
+            if self.__in_memory < self.__maxsize:
+                self.__items.append(chunk)
+                self.__in_memory += 1
+            else:
+                if self.__spill is None:
+                    logging.info("Consumer of streamed results is behind; spilling.")
+                    self.__spill = tempfile.TemporaryFile(prefix="wherobots-stream-")
+                self.__spill.seek(self.__spill_size)
+                self.__spill.write(chunk)
+                self.__items.append(_Spilled(self.__spill_size, len(chunk)))
+                self.__spill_size += len(chunk)
+                self.__spill_pending += 1
+                self.__spilled += 1
+            self.__ready.notify()
+
+    def finish(self, error: Exception | None = None) -> None:
+        """Marks the end of the stream, or its failure with the given error."""
+        with self.__ready:
+            if not self.__abandoned:
+                self.__items.append(error if error is not None else _EOF)
+                self.__ready.notify()
+
+    def peek_schema(self) -> pyarrow.Schema | None:
+        """Reads the Arrow schema from the chunks buffered so far, without waiting.
+
+        The chunks are left in the stream. Returns None until enough of the
+        stream has been received (for compressed streams, usually a whole
+        compressed block), and once it has started being read.
+        """
+        with self.__ready:
+            if self.__started:
+                return None
+            chunks = []
+            for item in self.__items:
+                if item is _EOF or isinstance(item, (Exception, _Spilled)):
+                    break
+                chunks.append(item)
+        if not chunks:
+            return None
+        try:
+            return _read_schema(pyarrow.py_buffer(b"".join(chunks)), self.compression)
+        except (pyarrow.ArrowException, OSError):
+            # The start of the stream is truncated.
+            return None
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b: Any) -> int:
+        """Reads into ``b``, blocking until it is full or the stream has ended.
+
+        Unlike most raw streams, short reads only happen at the end of the
+        stream, as the Arrow IPC reader expects.
+        """
+        view = memoryview(b).cast("B")
+        filled = 0
+        while filled < len(view):
+            if not self.__chunk:
+                item = self.__next()
+                if item is _EOF:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                self.__chunk = memoryview(item)
+
+            n = min(len(view) - filled, len(self.__chunk))
+            view[filled : filled + n] = self.__chunk[:n]
+            self.__chunk = self.__chunk[n:]
+            filled += n
+        return filled
+
+    def __next(self) -> Any:
+        """The next chunk, or the end marker, waiting for it if needed."""
+        with self.__ready:
+            while not self.__items:
+                self.__ready.wait()
+            item = self.__items[0]
+            if item is _EOF or isinstance(item, Exception):
+                # Keep the end marker around for subsequent reads.
+                return item
+            self.__items.popleft()
+            self.__started = True
+            if not isinstance(item, _Spilled):
+                self.__in_memory -= 1
+                return item
+            assert self.__spill is not None
+            self.__spill.seek(item.offset)
+            data = self.__spill.read(item.length)
+            self.__spill_pending -= 1
+            if not self.__spill_pending:
+                # Everything spilled has been read back; reuse the file.
+                self.__spill.seek(0)
+                self.__spill.truncate()
+                self.__spill_size = 0
+            return data
+
+    def close(self) -> None:
+        """Abandons the stream, dropping the buffered and spilled chunks."""
+        with self.__ready:
+            self.__abandoned = True
+            self.__items.clear()
+            self.__in_memory = 0
+            if self.__spill is not None:
+                self.__spill.close()
+                self.__spill = None
+        super().close()
+
+
+def _to_rows(table: pyarrow.Table) -> List[Tuple[Any, ...]]:
+    """Converts a table to a list of row tuples, column by column."""
+    return list(zip(*(column.to_pylist() for column in table.columns)))
+
+
+class ArrowResults:
+    """Arrow query results, consumed incrementally.
+
+    Complete results are held as a single table. Streamed results are read
+    from their record batch reader only as rows are fetched, so the first rows
+    are available before the rest of the results has been received; only the
+    batch being consumed is held in memory.
+
+    Rows are addressed by their position in the results. Fetching single rows
+    converts them from Arrow ahead of time, :data:`ROW_BUFFER_SIZE` at a time,
+    so that iterating over results row by row costs constant time per row.
+    """
+
+    ROW_BUFFER_SIZE = 1024
+
+    def __init__(
+        self,
+        reader: pyarrow.RecordBatchReader | None = None,
+        table: pyarrow.Table | None = None,
+    ) -> None:
+        if reader is not None:
+            schema = reader.schema
+        elif table is not None:
+            schema = table.schema
+        else:
+            raise ValueError("Either a reader or a table is required")
+        self.__reader = reader
+        self.__schema = schema
+        # The rows currently held in memory, and the position of the first one.
+        self.__table = table if table is not None else self.__schema.empty_table()
+        self.__start = 0
+        self.__position = 0
+        # Rows converted ahead of time, and the position of the first one.
+        self.__rows: List[Tuple[Any, ...]] = []
+        self.__rows_start = 0
+
+    @classmethod
+    def from_stream(cls, stream: ResultStream) -> "ArrowResults":
+        """Results decoded incrementally from a stream of result chunks."""
+        return cls(
+            reader=pyarrow.ipc.open_stream(
+                pyarrow.input_stream(stream, stream.compression)
+            )
+        )
+
+    @classmethod
+    def from_payload(cls, payload: ResultsPayload) -> "ArrowResults":
+        """Results decoded from a complete Arrow IPC stream."""
+        return cls.from_buffer(_decompress(payload))
+
+    @classmethod
+    def from_buffer(cls, buffer: pyarrow.Buffer) -> "ArrowResults":
+        """Results decoded from a complete, decompressed Arrow IPC stream."""
+        with pyarrow.ipc.open_stream(buffer) as reader:
+            return cls(table=reader.read_all())
+
+    @property
+    def schema(self) -> pyarrow.Schema:
+        return self.__schema
+
+    @property
+    def table(self) -> pyarrow.Table | None:
+        """All the rows, when the complete results are held in memory."""
+        if self.__reader is not None or self.__start:
+            return None
+        return self.__table
+
+    @property
+    def position(self) -> int:
+        """Position of the next row to be fetched."""
+        return self.__position
+
+    @property
+    def num_rows(self) -> int | None:
+        """Total number of rows, or None while it is not known yet."""
+        if self.__reader is not None:
+            return None
+        num_rows: int = self.__start + self.__table.num_rows
+        return num_rows
+
+    def __available(self) -> int:
+        available: int = self.__start + self.__table.num_rows - self.__position
+        return available
+
+    def __load(self) -> bool:
+        """Replaces the consumed rows in memory with the next record batch."""
+        if self.__reader is None:
+            return False
+        try:
+            batch = self.__reader.read_next_batch()
+        except StopIteration:
+            self.__reader = None
+            return False
+        self.__start += self.__table.num_rows
+        self.__table = pyarrow.Table.from_batches([batch])
+        return True
+
+    def __slice(self, size: int | None) -> pyarrow.Table:
+        """Returns up to ``size`` rows from the current position.
+
+        Only the rows in memory are returned, unless there are none left, in
+        which case the next record batch is loaded.
+        """
+        while not self.__available() and self.__load():
+            pass
+        return self.__table.slice(self.__position - self.__start, size)
+
+    def take(self, size: int | None = None) -> pyarrow.Table:
+        """Returns the next ``size`` rows (all remaining rows if ``None``)."""
+        parts: List[pyarrow.Table] = []
+        remaining = size
+        while remaining is None or remaining > 0:
+            part = self.__slice(remaining)
+            if not part.num_rows:
+                break
+            parts.append(part)
+            self.__position += part.num_rows
+            if remaining is not None:
+                remaining -= part.num_rows
+        if not parts:
+            return self.__schema.empty_table()
+        return pyarrow.concat_tables(parts)
+
+    def batches(self) -> Iterator[pyarrow.RecordBatch]:
+        """Yields the remaining rows, batch by batch."""
+        while True:
+            part = self.__slice(None)
+            if not part.num_rows:
+                return
+            self.__position += part.num_rows
+            yield from part.to_batches()
+
+    def to_reader(self) -> pyarrow.RecordBatchReader:
+        """Returns a reader over the remaining rows."""
+        return pyarrow.RecordBatchReader.from_batches(self.__schema, self.batches())
+
+    def next_row(self) -> Tuple[Any, ...] | None:
+        """Returns the next row as a tuple, or None at the end of the results."""
+        index = self.__position - self.__rows_start
+        if not 0 <= index < len(self.__rows):
+            self.__rows = _to_rows(self.__slice(self.ROW_BUFFER_SIZE))
+            self.__rows_start = self.__position
+            index = 0
+            if not self.__rows:
+                return None
+        self.__position += 1
+        return self.__rows[index]
+
+    def rows(self, size: int | None = None) -> List[Tuple[Any, ...]]:
+        """Returns the next ``size`` rows (all remaining rows if ``None``).
+
+        Only the requested rows are converted from Arrow.
+        """
+        index = self.__position - self.__rows_start
+        rows: List[Tuple[Any, ...]] = []
+        if 0 <= index < len(self.__rows):
+            rows = self.__rows[index : None if size is None else index + size]
+            self.__position += len(rows)
+        if size is None or len(rows) < size:
+            rows.extend(_to_rows(self.take(None if size is None else size - len(rows))))
+        return rows
+
+    def seek(self, position: int) -> None:
+        """Moves to the given row position.
+
+        Streamed results can only be moved forward, as the rows already
+        consumed are no longer held in memory.
+        """
+        num_rows = self.num_rows
+        if position < 0 or (num_rows is not None and position > num_rows):
+            raise IndexError(f"Row position {position} is out of range")
+        if position < self.__start:
+            raise NotSupportedError("Cannot scroll backwards in streamed results")
+        if position > self.__position:
+            self.take(position - self.__position)
+            if self.__position < position:
+                raise IndexError(f"Row position {position} is out of range")
+        self.__position = position
@@ -0,0 +1,154 @@
+"""Persistent cache of SQL session URIs.
+
+Connecting with :func:`wherobots.db.connect` requests a SQL session from the
+Wherobots API and polls its status until it is ready, which takes a few
+seconds even when the session is already running. A :class:`SessionCache`
+remembers the WebSocket URI of the sessions previously connected to, so that
+short-lived processes can connect to them directly.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Union
+
+from .constants import (
+    DEFAULT_ENDPOINT,
+    DEFAULT_REGION,
+    DEFAULT_RUNTIME,
+    DEFAULT_SESSION_CACHE_CONNECT_TIMEOUT_SECONDS,
+    DEFAULT_SESSION_CACHE_MAX_AGE_SECONDS,
+    DEFAULT_SESSION_TYPE,
+)
+from .region import Region
+from .runtime import Runtime
+from .session_type import SessionType
+
+SESSION_CACHE_PATH_ENV = "WHEROBOTS_SESSION_CACHE"
+
+
+def cache_home() -> Path:
+    """The directory of the driver's caches, following the XDG convention."""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "wherobots"
+
+
+def default_session_cache_path() -> Path:
+    """The default location of the session cache file.
+
+    Can be overridden with the ``WHEROBOTS_SESSION_CACHE`` environment
+    variable.
+    """
+    path = os.environ.get(SESSION_CACHE_PATH_ENV)
+    if path:
+        return Path(path)
+    return cache_home() / "sessions.json"
+
+
+class SessionCache:
+    """A file-backed cache of SQL session URIs.
+
+    Entries are keyed by everything that determines which SQL session the
+    Wherobots API hands out: host, region, runtime, version, session type, and
+    a fingerprint of the credentials (the credentials themselves are never
+    stored). Entries older than ``max_age`` seconds are ignored.
+
+    ``connect_timeout`` bounds the WebSocket handshake with a cached URI, so
+    that a session that went away is detected quickly and the regular
+    connection flow can take over.
+
+    The cache file is replaced atomically on every update, so it can be shared
+    by concurrent processes; concurrent updates may overwrite each other, which
+    at worst costs a later process a regular connection.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, os.PathLike[str], None] = None,
+        max_age: Union[float, None] = DEFAULT_SESSION_CACHE_MAX_AGE_SECONDS,
+        connect_timeout: float = DEFAULT_SESSION_CACHE_CONNECT_TIMEOUT_SECONDS,
+    ) -> None:
+        self.path = Path(path) if path is not None else default_session_cache_path()
+        self.max_age = max_age
+        self.connect_timeout = connect_timeout
+
+    @staticmethod
+    def key(
+        host: Union[str, None],
+        credential: str,
+        runtime: Union[Runtime, None] = None,
+        region: Union[Region, None] = None,
+        version: Union[str, None] = None,
+        session_type: Union[SessionType, None] = None,
+    ) -> str:
+        """Computes the cache key of a SQL session request."""
+        fingerprint = hashlib.sha256(credential.encode("utf-8")).hexdigest()
+        parts = [
+            host or DEFAULT_ENDPOINT,
+            (region or DEFAULT_REGION).value,
+            (runtime or DEFAULT_RUNTIME).value,
+            version or "",
+            (session_type or DEFAULT_SESSION_TYPE).value,
+            fingerprint,
+        ]
+        return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()
+
+    def __load(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError):
+            logging.warning("Ignoring unreadable session cache %s", self.path)
+            return {}
+        return entries if isinstance(entries, dict) else {}
+
+    def __save(self, entries: Dict[str, Any]) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(
+                dir=self.path.parent, prefix=f".{self.path.name}."
+            )
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(entries, f)
+                os.replace(tmp, self.path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        except OSError:
+            logging.warning("Could not write session cache %s", self.path)
+
+    def get(self, key: str) -> Union[str, None]:
+        """Returns the cached SQL session URI for the given key, if any."""
+        entry = self.__load().get(key)
+        if not isinstance(entry, dict) or "uri" not in entry:
+            return None
+        if (
+            self.max_age is not None
+            and time.time() - entry.get("stored_at", 0) > self.max_age
+        ):
+            return None
+        uri = entry["uri"]
+        return uri if isinstance(uri, str) else None
+
+    def put(self, key: str, uri: str) -> None:
+        """Records the SQL session URI for the given key."""
+        entries = self.__load()
+        entries[key] = {"uri": uri, "stored_at": time.time()}
+        self.__save(entries)
+
+    def invalidate(self, key: str) -> None:
+        """Forgets the SQL session URI for the given key."""
+        entries = self.__load()
+        if entries.pop(key, None) is not None:
+            self.__save(entries)
+
+    def clear(self) -> None:
+        """Forgets all cached SQL session URIs."""
+        self.__save({})
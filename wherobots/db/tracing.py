@@ -0,0 +1,89 @@
+"""Optional OpenTelemetry tracing of queries.
+
+When the ``opentelemetry-api`` package is installed
+(``pip install wherobots-python-dbapi[tracing]``) and a tracer provider is
+configured by the application, each query is traced as a ``wherobots.query``
+span, from its submission until its results have been decoded, with an event
+for each state it reaches. The decoding of its results, and their conversion
+to pandas, are traced as child spans. The context of the query's span is
+propagated to the SQL session in the ``execute_sql`` request.
+
+Without OpenTelemetry, all the functions of this module do nothing.
+"""
+
+import contextlib
+import textwrap
+from typing import Any, Dict, Iterator
+
+try:
+    from opentelemetry import propagate, trace
+except ImportError:
+    propagate = None
+    trace = None
+
+from .models import QueryStats
+
+TRACER_NAME = "wherobots.db"
+
+
+def start_query_span(execution_id: str, sql: str) -> Any:
+    """Starts the span of a query, or returns None when tracing is unavailable."""
+    if trace is None:
+        return None
+    return trace.get_tracer(TRACER_NAME).start_span(
+        "wherobots.query",
+        kind=trace.SpanKind.CLIENT,
+        attributes={
+            "db.system": "wherobots",
+            "db.statement": textwrap.shorten(sql, width=1024),
+            "wherobots.execution_id": execution_id,
+        },
+    )
+
+
+def trace_context(span: Any) -> Dict[str, str]:
+    """The W3C trace context headers of the given span, to propagate it."""
+    carrier: Dict[str, str] = {}
+    if span is not None and propagate is not None:
+        propagate.inject(carrier, context=trace.set_span_in_context(span))
+    return carrier
+
+
+def end_query_span(stats: QueryStats) -> None:
+    """Ends the span of a query, recording the statistics of its execution.
+
+    Does nothing if the span has already been ended.
+    """
+    span = stats.span
+    if span is None or not span.is_recording():
+        return
+    attributes: Dict[str, int | str] = {
+        "wherobots.bytes_received": stats.bytes_received,
+        "wherobots.frames_received": stats.frames_received,
+    }
+    if stats.format:
+        attributes["wherobots.results.format"] = stats.format
+    if stats.compression:
+        attributes["wherobots.results.compression"] = stats.compression
+    span.set_attributes(attributes)
+    if stats.error is not None:
+        span.set_status(trace.Status(trace.StatusCode.ERROR, stats.error))
+    span.end()
+
+
+@contextlib.contextmanager
+def child_span(
+    stats: QueryStats | None, name: str, attributes: Dict[str, Any] | None = None
+) -> Iterator[Any]:
+    """Traces a step of the processing of a query's results as a child span."""
+    if stats is None or stats.span is None:
+        yield None
+        return
+    context = trace.set_span_in_context(stats.span)
+    span = trace.get_tracer(TRACER_NAME).start_span(
+        name, context=context, attributes=attributes
+    )
+    try:
+        yield span
+    finally:
+        span.end()
@@ -1,4 +1,7 @@
 from enum import auto
+from typing import Callable
+
+import pyarrow
 from strenum import LowercaseStrEnum, StrEnum
 
 
@@ -39,11 +42,13 @@ class RequestKind(LowercaseStrEnum):
     EXECUTE_SQL = auto()
     RETRIEVE_RESULTS = auto()
     CANCEL = auto()
+    REATTACH = auto()
 
 
 class EventKind(LowercaseStrEnum):
     STATE_UPDATED = auto()
     EXECUTION_RESULT = auto()
+    EXECUTION_RESULT_CHUNK = auto()
     ERROR = auto()
     EXECUTION_PROGRESS = auto()
 
@@ -55,6 +60,8 @@ class ResultsFormat(LowercaseStrEnum):
 
 class DataCompression(LowercaseStrEnum):
     BROTLI = auto()
+    ZSTD = auto()
+    LZ4 = auto()
 
 
 class GeometryRepresentation(LowercaseStrEnum):
@@ -105,3 +112,74 @@ class AppStatus(StrEnum):
             AppStatus.DESTROY_FAILED,
             AppStatus.DESTROYED,
         )
+
+
+class DBAPITypeObject:
+    """A PEP-0249 type object, comparing equal to the type codes it describes.
+
+    The type codes of the columns of a cursor's ``description`` are their Arrow
+    data types, and each type object compares equal to the Arrow data types of
+    its kind: ``description[0][1] == NUMBER`` for an integer column.
+    """
+
+    def __init__(self, name: str, *predicates: Callable[[pyarrow.DataType], bool]):
+        self.name = name
+        self.__predicates = predicates
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, DBAPITypeObject):
+            return self is other
+        if isinstance(other, pyarrow.DataType):
+            return any(predicate(other) for predicate in self.__predicates)
+        if isinstance(other, str):
+            # The type codes of earlier versions of the driver.
+            return other == self.name
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(self.name)
+
+    def __repr__(self) -> str:
+        return self.name
+
+
+def _view_type(name: str) -> Callable[[pyarrow.DataType], bool]:
+    # View types are only known to recent versions of pyarrow.
+    return getattr(pyarrow.types, name, lambda data_type: False)
+
+
+def _is_geoarrow(data_type: pyarrow.DataType) -> bool:
+    return isinstance(data_type, pyarrow.BaseExtensionType) and (
+        data_type.extension_name.startswith("geoarrow.")
+    )
+
+
+STRING = DBAPITypeObject(
+    "STRING",
+    pyarrow.types.is_string,
+    pyarrow.types.is_large_string,
+    _view_type("is_string_view"),
+)
+BINARY = DBAPITypeObject(
+    "BINARY",
+    pyarrow.types.is_binary,
+    pyarrow.types.is_large_binary,
+    pyarrow.types.is_fixed_size_binary,
+    _view_type("is_binary_view"),
+)
+NUMBER = DBAPITypeObject(
+    "NUMBER",
+    pyarrow.types.is_integer,
+    pyarrow.types.is_floating,
+    pyarrow.types.is_decimal,
+    pyarrow.types.is_boolean,
+)
+DATETIME = DBAPITypeObject(
+    "DATETIME",
+    pyarrow.types.is_timestamp,
+    pyarrow.types.is_date,
+    pyarrow.types.is_time,
+    pyarrow.types.is_duration,
+)
+ROWID = DBAPITypeObject("ROWID")  # Wherobots DB has no row IDs.
+GEOMETRY = DBAPITypeObject("GEOMETRY", _is_geoarrow)